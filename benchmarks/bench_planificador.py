@@ -0,0 +1,109 @@
+"""
+Benchmark de planificar_filas_na y calcular_estabilizacion_diaria sobre lotes sintéticos.
+
+    python -m benchmarks.bench_planificador --tamanos 100 1000 10000 100000
+
+Por cada tamaño registra tiempo de pared, pico de memoria (tracemalloc, en una pasada aparte)
+y nº de lotes sin asignar, y añade una línea JSON por medición a --resultados para poder
+comparar entre commits (por defecto benchmarks/resultados.jsonl, fuera de git por .gitignore).
+"""
+import argparse
+import json
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from planificador import calcular_estabilizacion_diaria, planificar_filas_na
+
+from .generador import generar_lotes
+
+# Local a cada máquina: ignorado en .gitignore
+RESULTADOS_DEFECTO = Path(__file__).with_name("resultados.jsonl")
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ejecutar(df, config):
+    t0 = time.perf_counter()
+    df_plan, df_sug = planificar_filas_na(df, config)
+    t1 = time.perf_counter()
+    calcular_estabilizacion_diaria(df_plan, config.estab_cap, config.estab_cap_overrides)
+    t2 = time.perf_counter()
+    return df_plan, df_sug, t1 - t0, t2 - t1
+
+
+def medir(n_lotes, medir_memoria=True, **kwargs_generador):
+    """Genera n_lotes sintéticos, los planifica y devuelve un dict con las métricas."""
+    df, config = generar_lotes(n_lotes=n_lotes, **kwargs_generador)
+
+    df_plan, df_sug, t_plan, t_estab = _ejecutar(df, config)
+
+    pico_mb = None
+    if medir_memoria:
+        tracemalloc.start()
+        _ejecutar(df, config)
+        pico_mb = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+
+    return {
+        "n_lotes": n_lotes,
+        "dias_horizonte": int((df["DIA"].max() - df["DIA"].min()).days) + 1,
+        "t_planificar_s": round(t_plan, 4),
+        "t_estabilizacion_s": round(t_estab, 4),
+        "pico_memoria_mb": pico_mb,
+        "no_encajan": int((df_plan["LOTE_NO_ENCAJA"] == "Sí").sum()),
+        "sugerencias": int(len(df_sug)),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.bench_planificador", description=__doc__.strip().splitlines()[0])
+    p.add_argument("--tamanos", nargs="+", type=int, default=[100, 1000, 10000], help="Nº de lotes por medición")
+    p.add_argument("--lotes-por-dia", type=float, default=25, help="Densidad de recepciones (define el horizonte)")
+    p.add_argument("--holgura", type=float, default=1.10, help="Capacidad / carga media diaria")
+    p.add_argument("--densidad-festivos", type=float, default=0.03)
+    p.add_argument("--semilla", type=int, default=0)
+    p.add_argument("--sin-memoria", action="store_true", help="No medir pico de memoria (ahorra una pasada)")
+    p.add_argument("--resultados", type=Path, default=RESULTADOS_DEFECTO, help="Fichero JSONL donde añadir resultados")
+    p.add_argument("--etiqueta", default="", help="Texto libre para identificar la ejecución")
+    args = p.parse_args(argv)
+
+    comun = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "etiqueta": args.etiqueta,
+        "holgura": args.holgura,
+        "densidad_festivos": args.densidad_festivos,
+        "semilla": args.semilla,
+    }
+    print(f"{'lotes':>8} {'días':>6} {'plan (s)':>10} {'estab (s)':>10} {'pico MB':>9} {'no encajan':>11}")
+    args.resultados.parent.mkdir(parents=True, exist_ok=True)
+    with args.resultados.open("a", encoding="utf-8") as f:
+        for n in args.tamanos:
+            r = medir(
+                n,
+                medir_memoria=not args.sin_memoria,
+                dias_horizonte=max(14, int(round(n / args.lotes_por_dia))),
+                holgura_capacidad=args.holgura,
+                densidad_festivos=args.densidad_festivos,
+                semilla=args.semilla,
+            )
+            f.write(json.dumps({**comun, **r}, ensure_ascii=False) + "\n")
+            f.flush()
+            print(f"{r['n_lotes']:>8} {r['dias_horizonte']:>6} {r['t_planificar_s']:>10.3f} "
+                  f"{r['t_estabilizacion_s']:>10.3f} {str(r['pico_memoria_mb']):>9} {r['no_encajan']:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""
+Generador de ficheros de lotes sintéticos (realistas) para benchmarks del planificador.
+
+    from benchmarks.generador import generar_lotes
+    df, config = generar_lotes(n_lotes=5000, dias_horizonte=180, holgura_capacidad=1.05)
+"""
+import numpy as np
+import pandas as pd
+
+from planificador import ConfigPlanificacion
+
+# Mezcla por defecto de PRODUCTO, incluye los grupos de entrada común (JBSPRCLC-MEX, *CIVRPORCISAN)
+MEZCLA_PRODUCTOS = {
+    "JBCPRCLC": 0.24,
+    "PBCPRCLC": 0.20,
+    "JIBPRCLC": 0.18,
+    "PIBPRCLC": 0.18,
+    "JBSPRCLC-MEX": 0.04,
+    "JCIVRPORCISAN": 0.04,
+    "PCIVRPORCISAN": 0.04,
+    "JCIVRROD-MEX": 0.04,
+    "JBCPRCLC-MEX": 0.04,
+}
+
+# Distribución por defecto de DIAS_SAL_OPTIMOS
+DIST_DIAS_SAL = {7: 0.10, 10: 0.20, 12: 0.25, 14: 0.25, 15: 0.10, 21: 0.10}
+
+
+def _elegir(rng, dist, n):
+    claves = list(dist)
+    pesos = np.array([dist[k] for k in claves], dtype=float)
+    return np.array(claves, dtype=object)[rng.choice(len(claves), size=n, p=pesos / pesos.sum())]
+
+
+def generar_lotes(
+    n_lotes=1000,
+    dias_horizonte=None,
+    inicio="2025-01-07",
+    mezcla_productos=None,
+    dist_dias_sal=None,
+    densidad_festivos=0.03,
+    holgura_capacidad=1.10,
+    unds_min=200,
+    unds_max=1500,
+    semilla=0,
+):
+    """
+    Devuelve (df_lotes, config):
+      - n_lotes, dias_horizonte (por defecto ~25 lotes por día natural), inicio
+      - mezcla_productos: {PRODUCTO: peso}; dist_dias_sal: {DIAS_SAL_OPTIMOS: peso}
+      - densidad_festivos: fracción de días laborables del horizonte que son festivo
+      - holgura_capacidad: capacidad / carga media diaria (≈1 → muy ajustado, >1.5 → holgado)
+    Las recepciones (DIA) caen solo en días laborables, como en planta.
+    """
+    rng = np.random.default_rng(semilla)
+    mezcla_productos = mezcla_productos or MEZCLA_PRODUCTOS
+    dist_dias_sal = dist_dias_sal or DIST_DIAS_SAL
+    if dias_horizonte is None:
+        dias_horizonte = max(14, int(np.ceil(n_lotes / 25)))
+
+    dias = pd.date_range(inicio, periods=int(dias_horizonte), freq="D")
+    laborables = dias[dias.weekday < 5]
+    n_festivos = int(round(len(laborables) * densidad_festivos))
+    festivos = pd.DatetimeIndex(sorted(rng.choice(laborables, size=n_festivos, replace=False))) if n_festivos else pd.DatetimeIndex([])
+    recepcion = laborables.difference(festivos)
+
+    df = pd.DataFrame({
+        "LOTE": [f"L{i:06d}" for i in range(n_lotes)],
+        "PRODUCTO": _elegir(rng, mezcla_productos, n_lotes).astype(str),
+        "DIA": recepcion[rng.integers(0, len(recepcion), n_lotes)],
+        "UNDS": rng.integers(unds_min, unds_max + 1, n_lotes),
+        "DIAS_SAL_OPTIMOS": _elegir(rng, dist_dias_sal, n_lotes).astype(int),
+        "NITRIF": rng.integers(1, 4, n_lotes),
+        "ENTRADA_SAL": pd.NaT,
+        "SALIDA_SAL": pd.NaT,
+    })
+    df.insert(5, "TIPO NITRIF", np.where(df["PRODUCTO"].str[1:3].isin(["IB", "CI"]), "IBERICO", "BLANCO"))
+    df["ENTRADA_SAL"] = pd.to_datetime(df["ENTRADA_SAL"])
+    df["SALIDA_SAL"] = pd.to_datetime(df["SALIDA_SAL"])
+    df = df.sort_values(["DIA", "LOTE"], kind="stable").reset_index(drop=True)
+
+    # Capacidades proporcionales a la carga media por día de recepción
+    carga_dia = df["UNDS"].sum() / max(len(recepcion), 1)
+    cap = int(round(carga_dia * holgura_capacidad, -2))
+    config = ConfigPlanificacion(
+        cap_ent_1=cap, cap_ent_2=int(cap * 1.13),
+        cap_sal_1=cap, cap_sal_2=int(cap * 1.13),
+        estab_cap=int(round(carga_dia * holgura_capacidad * 1.5, -2)),
+        dias_festivos=[d.strftime("%Y-%m-%d") for d in festivos],
+    )
+    return df, config
@@ -0,0 +1,90 @@
+"""
+Núcleo de planificación de lotes de salazón, sin dependencia de Streamlit.
+Lo usan la app (app.py) y la línea de comandos (python -m planificador).
+"""
+from .busqueda_local import MejoraLocal
+from .cache_planes import guardar_plan, huella_plan, limpiar_cache_planes, obtener_plan
+from .calendario import CalendarioHabil, horizonte_plan
+from .capacidad import ArbolMaxRango, CapacidadDiaria, IndiceEstabilizacion, IndiceIntervalos, LineaTemporal
+from .componentes import componentes_independientes, intervalos_lotes
+from .config import (
+    FESTIVOS_DEFECTO, MOTORES_ASIGNACION, REGLAS_ENTRADA_COMUN_DEFECTO, ConfigPlanificacion, ReglaEntradaComun
+)
+from .cuellos import COLS_CUELLOS, aumentos_capacidad, cuellos_botella
+from .entrada_comun import entradas_comunes_factibles
+from .escenarios import aplicar_escenario, comparar_escenarios, metricas_plan, rejilla_escenarios
+from .estabilizacion import COLS_DETALLE_DIA, OcupacionEstabilizacion, calcular_estabilizacion_diaria
+from .estado import EstadoPlanificacion
+from .exportar import excel_bytes, exportador_excel, generar_excel, generar_excel_multihoja, huella_df
+from .graficos import AGREGACIONES, MAX_LOTES_DETALLE, figura_entradas_salidas
+from .horizonte import DIAS_VENTANA_DEFECTO, filas_ventana, planificar_horizonte_rodante, ventanas_horizonte
+from .instrumentacion import Instrumentacion
+from .ingesta import ALIAS_COLUMNAS, leer_lotes_bytes, leer_lotes_excel, limpiar_cache_lotes, normalizar_lotes
+from .lotes import LotesCompactos
+from .motor import asignar_voraz, liberar_lotes, lotes_a_replanificar, planificar_filas_na
+from .optimizacion import ModeloAsignacion, solver_disponible
+from .salidas import TablaSalidas
+from .sugerencias import COLS_SUGERENCIAS, ordenar_sugerencias, sugerencias_no_encajan
+
+__all__ = [
+    "AGREGACIONES",
+    "ALIAS_COLUMNAS",
+    "COLS_CUELLOS",
+    "COLS_DETALLE_DIA",
+    "COLS_SUGERENCIAS",
+    "ArbolMaxRango",
+    "CalendarioHabil",
+    "CapacidadDiaria",
+    "ConfigPlanificacion",
+    "DIAS_VENTANA_DEFECTO",
+    "EstadoPlanificacion",
+    "FESTIVOS_DEFECTO",
+    "IndiceEstabilizacion",
+    "IndiceIntervalos",
+    "Instrumentacion",
+    "LineaTemporal",
+    "LotesCompactos",
+    "MAX_LOTES_DETALLE",
+    "MejoraLocal",
+    "MOTORES_ASIGNACION",
+    "ModeloAsignacion",
+    "OcupacionEstabilizacion",
+    "REGLAS_ENTRADA_COMUN_DEFECTO",
+    "ReglaEntradaComun",
+    "TablaSalidas",
+    "aplicar_escenario",
+    "asignar_voraz",
+    "aumentos_capacidad",
+    "calcular_estabilizacion_diaria",
+    "comparar_escenarios",
+    "componentes_independientes",
+    "cuellos_botella",
+    "entradas_comunes_factibles",
+    "excel_bytes",
+    "exportador_excel",
+    "figura_entradas_salidas",
+    "filas_ventana",
+    "generar_excel",
+    "generar_excel_multihoja",
+    "guardar_plan",
+    "horizonte_plan",
+    "huella_df",
+    "huella_plan",
+    "intervalos_lotes",
+    "leer_lotes_bytes",
+    "leer_lotes_excel",
+    "limpiar_cache_lotes",
+    "limpiar_cache_planes",
+    "liberar_lotes",
+    "lotes_a_replanificar",
+    "metricas_plan",
+    "normalizar_lotes",
+    "obtener_plan",
+    "ordenar_sugerencias",
+    "planificar_filas_na",
+    "planificar_horizonte_rodante",
+    "rejilla_escenarios",
+    "solver_disponible",
+    "sugerencias_no_encajan",
+    "ventanas_horizonte",
+]
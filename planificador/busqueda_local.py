@@ -0,0 +1,283 @@
+"""Mejora local tras la asignación: recupera lotes que el orden voraz deja sin encajar y reduce mezclas."""
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from .lotes import SIN_NITRIF
+
+# Lotes asignados que se prueban a mover para hacer hueco a cada lote sin encajar
+MAX_BLOQUEADORES = 40
+# Cada cuántos movimientos evaluados se informa del progreso
+PASO_PROGRESO = 50
+
+
+class MejoraLocal:
+    """
+    Búsqueda local sobre una asignación ya hecha (estado y LotesCompactos, que se modifican).
+    Movimientos, evaluados por deltas sobre la ventana del lote (cargas de ENTRADA/SALIDA,
+    estabilización y perfil TIPO/NITRIF del EstadoPlanificacion, sin replanificar nada):
+      - insertar: el lote sin encajar cabe ya en alguna fecha (otro movimiento liberó hueco)
+      - expulsar: se retira un lote asignado que comparte ENTRADA, SALIDA o estabilización con
+        el lote sin encajar, se inserta este y se recoloca el retirado en otra fecha válida;
+        si alguno de los dos no cabe se deshace el movimiento.
+    Cuando ya no se recuperan lotes, con el presupuesto restante se reduce el coste de perfil
+    (por día de ENTRADA, TIPOS y NITRIF distintos más allá del primero) entre lotes asignados:
+      - recolocar: un lote que mezcla en su día se retira y se vuelve a insertar
+      - intercambiar: dos lotes asignados se cambian el día de ENTRADA (cada uno con su SALIDA
+        resuelta y la capacidad del 2º intento)
+    Estos movimientos solo se confirman si bajan el coste de perfil de los días afectados.
+    'insertar(k)' es la regla de asignación del motor (mejor fecha válida según el perfil);
+    solo se mueven lotes asignados en esta planificación y sin ENTRADA común de grupo.
+    """
+
+    def __init__(self, estado, lotes, insertar):
+        self.estado = estado
+        self.lotes = lotes
+        self.insertar = insertar
+        self.iteraciones = 0
+        self.recuperados = 0
+        self.mejoras_perfil = 0
+        # Índices de lotes movibles por día de ENTRADA y de SALIDA
+        self._por_entrada = defaultdict(set)
+        self._por_salida = defaultdict(set)
+        for k in np.flatnonzero((lotes.entrada_off >= 0) & ~lotes.entrada_normalizada).tolist():
+            self._indexar(k)
+        dias_max = lotes.dias_max[~np.isnan(lotes.dias_max)]
+        # Ventana máxima DIA → ENTRADA (+ margen por ajustes de hábiles)
+        self._ventana = int(dias_max.max()) + 7 if len(dias_max) else 7
+
+    # ---- Índices ----
+    def _indexar(self, k):
+        self._por_entrada[int(self.lotes.entrada_off[k])].add(k)
+        self._por_salida[int(self.lotes.salida_off[k])].add(k)
+
+    def _desindexar(self, k, entrada, salida):
+        self._por_entrada[entrada].discard(k)
+        self._por_salida[salida].discard(k)
+
+    # ---- Deltas sobre el estado ----
+    def _datos(self, k):
+        lotes = self.lotes
+        return int(lotes.dia_off[k]), int(lotes.unds[k]), int(lotes.tipo[k]), int(lotes.nitrif[k])
+
+    def _retirar(self, k):
+        entrada, salida = int(self.lotes.entrada_off[k]), int(self.lotes.salida_off[k])
+        dia_off, unds, tipo, nitr = self._datos(k)
+        self.estado.desasignar(dia_off, entrada, salida, unds, tipo, nitr)
+        self.lotes.desasignar(k)
+        return entrada, salida
+
+    def _reponer(self, k, entrada, salida):
+        dia_off, unds, tipo, nitr = self._datos(k)
+        self.lotes.asignar(k, entrada, salida)
+        self.estado.asignar(dia_off, entrada, salida, unds, tipo, nitr)
+
+    # ---- Movimientos ----
+    def _bloqueadores(self, k):
+        """Lotes asignados que ocupan la ENTRADA, la estabilización o la SALIDA posibles de k."""
+        lotes, cal, salidas = self.lotes, self.estado.cal, self.estado.salidas
+        dia_off = int(lotes.dia_off[k])
+        limite = dia_off + lotes.dias_max[k]
+        dso = int(lotes.dso[k])
+        candidatos = set()
+        # ENTRADA en la ventana de k o estabilización solapada con [DIA_k, ENTRADA_k - 1]
+        for e in range(dia_off + 1, int(limite) + self._ventana + 1):
+            for j in self._por_entrada.get(e, ()):
+                if lotes.dia_off[j] < limite:
+                    candidatos.add(j)
+        entrada = int(lotes.ini_off[k])
+        while entrada <= limite:
+            candidatos.update(self._por_entrada.get(entrada, ()))
+            for salida in salidas.opciones_i(entrada, dso):
+                candidatos.update(self._por_salida.get(salida, ()))
+            entrada = cal.siguiente_habil_i(entrada)
+        # Primero los que más hueco liberan
+        return sorted(candidatos, key=lambda j: (-int(lotes.unds[j]), j))[:MAX_BLOQUEADORES]
+
+    def _expulsar(self, k, j):
+        """Intenta encajar k retirando j y recolocándolo; True si se confirma el movimiento."""
+        entrada_j, salida_j = self._retirar(j)
+        if self.insertar(k):
+            if self.insertar(j):
+                self._desindexar(j, entrada_j, salida_j)
+                self._indexar(j)
+                self._indexar(k)
+                return True
+            self._retirar(k)
+        self._reponer(j, entrada_j, salida_j)
+        return False
+
+    # ---- Coste de perfil (TIPO/NITRIF) ----
+    def _coste_dias(self, dias):
+        """(TIPOS, NITRIF) distintos más allá del primero, sumados sobre los días de ENTRADA 'dias'."""
+        coste_tipo = coste_nitr = 0
+        for e in dias:
+            prof = self.estado.perfil.get(e)
+            if prof is not None:
+                coste_tipo += max(len(prof[0]) - 1, 0)
+                coste_nitr += max(len(prof[1]) - 1, 0)
+        return coste_tipo, coste_nitr
+
+    def _mezcla(self, k):
+        """True si el lote k es el único de su TIPO o NITRIF en un día de ENTRADA con otros (sacarlo baja el coste)."""
+        tipos, nitrifs = self.estado.perfil[int(self.lotes.entrada_off[k])]
+        _, _, tipo, nitr = self._datos(k)
+        return (
+            (tipos[tipo] == 1 and len(tipos) > 1)
+            or (nitr != SIN_NITRIF and nitrifs[nitr] == 1 and len(nitrifs) > 1)
+        )
+
+    def _en_ventana(self, k, e):
+        lotes = self.lotes
+        return (not np.isnan(lotes.dias_max[k]) and int(lotes.ini_off[k]) <= e <= lotes.dia_off[k] + lotes.dias_max[k]
+                and self.estado.cal.es_habil_i(e))
+
+    def _cabe(self, k, e):
+        """SALIDA de k con ENTRADA e si cabe con la capacidad del 2º intento, o None."""
+        est = self.estado
+        dia_off, unds, _, _ = self._datos(k)
+        if est.carga_entrada.get_i(e) + unds > est.cap_ent[2].get_i(e):
+            return None
+        if e > dia_off and not est.estab_idx.cabe_i(dia_off, e - 1, unds):
+            return None
+        salida = est.salidas.resolver_i(e, int(self.lotes.dso[k]), est.carga_salida)
+        if est.carga_salida.get_i(salida) + unds > est.cap_sal[2].get_i(salida):
+            return None
+        return salida
+
+    def _recolocar(self, k):
+        """Retira k y lo vuelve a insertar; se confirma si baja el coste de perfil de los días de su ventana."""
+        lotes = self.lotes
+        dias = {int(lotes.entrada_off[k])}
+        e = int(lotes.ini_off[k])
+        while e <= lotes.dia_off[k] + lotes.dias_max[k]:
+            dias.add(e)
+            e = self.estado.cal.siguiente_habil_i(e)
+        antes = self._coste_dias(dias)
+        entrada, salida = self._retirar(k)
+        if self.insertar(k) and self._coste_dias(dias) < antes:
+            self._desindexar(k, entrada, salida)
+            self._indexar(k)
+            return True
+        if lotes.entrada_off[k] >= 0:
+            self._retirar(k)
+        self._reponer(k, entrada, salida)
+        return False
+
+    def _intercambiar(self, k, j):
+        """Cambia los días de ENTRADA de k y j; se confirma si ambos caben y baja el coste de perfil."""
+        e_k, e_j = int(self.lotes.entrada_off[k]), int(self.lotes.entrada_off[j])
+        if e_k == e_j or not (self._en_ventana(k, e_j) and self._en_ventana(j, e_k)):
+            return False
+        antes = self._coste_dias((e_k, e_j))
+        _, salida_k = self._retirar(k)
+        _, salida_j = self._retirar(j)
+        nueva_k = self._cabe(k, e_j)
+        if nueva_k is not None:
+            self._reponer(k, e_j, nueva_k)
+            nueva_j = self._cabe(j, e_k)
+            if nueva_j is not None:
+                self._reponer(j, e_k, nueva_j)
+                if self._coste_dias((e_k, e_j)) < antes:
+                    self._desindexar(k, e_k, salida_k)
+                    self._desindexar(j, e_j, salida_j)
+                    self._indexar(k)
+                    self._indexar(j)
+                    return True
+                self._retirar(j)
+            self._retirar(k)
+        self._reponer(k, e_k, salida_k)
+        self._reponer(j, e_j, salida_j)
+        return False
+
+    def _socios(self, k):
+        """Lotes asignados de otro TIPO o NITRIF con ENTRADA en la ventana de k."""
+        lotes = self.lotes
+        _, _, tipo, nitr = self._datos(k)
+        e_k = int(lotes.entrada_off[k])
+        socios = set()
+        e = int(lotes.ini_off[k])
+        while e <= lotes.dia_off[k] + lotes.dias_max[k]:
+            if e != e_k:
+                socios.update(
+                    j for j in self._por_entrada.get(e, ())
+                    if lotes.tipo[j] != tipo or lotes.nitrif[j] != nitr
+                )
+            e = self.estado.cal.siguiente_habil_i(e)
+        return sorted(socios, key=lambda j: (int(lotes.entrada_off[j]), j))[:MAX_BLOQUEADORES]
+
+    def ejecutar(self, pendientes, limite_segundos, max_iteraciones, progreso=None):
+        """
+        Recorre los lotes 'pendientes' sin encajar hasta que una pasada completa no recupera
+        ninguno o se agota el presupuesto (segundos o movimientos evaluados); con lo que quede,
+        pasadas de recolocar/intercambiar lotes asignados que mezclan TIPO/NITRIF en su día.
+        'progreso(fraccion, texto)' se llama periódicamente si se da.
+        Devuelve la lista de lotes que siguen sin encajar.
+        """
+        t0 = time.perf_counter()
+        pendientes = [k for k in pendientes if self.lotes.entrada_off[k] < 0]
+
+        def _agotado():
+            return self.iteraciones >= max_iteraciones or time.perf_counter() - t0 >= limite_segundos
+
+        def _informar():
+            if progreso is not None and self.iteraciones % PASO_PROGRESO == 0:
+                fraccion = max(self.iteraciones / max_iteraciones, (time.perf_counter() - t0) / limite_segundos)
+                progreso(min(fraccion, 1.0), f"Mejora local: {self.recuperados} lote(s) recuperados, "
+                                             f"{self.iteraciones} movimientos evaluados")
+
+        mejora = True
+        while mejora and pendientes and not _agotado():
+            mejora = False
+            for k in list(pendientes):
+                if _agotado():
+                    break
+                self.iteraciones += 1
+                _informar()
+                encajado = self.insertar(k)
+                if encajado:
+                    self._indexar(k)
+                else:
+                    for j in self._bloqueadores(k):
+                        if _agotado():
+                            break
+                        self.iteraciones += 1
+                        _informar()
+                        if self._expulsar(k, j):
+                            encajado = True
+                            break
+                if encajado:
+                    pendientes.remove(k)
+                    self.recuperados += 1
+                    mejora = True
+
+        mejora = True
+        while mejora and not _agotado():
+            mejora = False
+            movibles = sorted(set().union(*self._por_entrada.values()))
+            for k in movibles:
+                if _agotado():
+                    break
+                if self.lotes.entrada_off[k] < 0 or not self._mezcla(k):
+                    continue
+                self.iteraciones += 1
+                _informar()
+                movido = self._recolocar(k)
+                if not movido:
+                    for j in self._socios(k):
+                        if _agotado():
+                            break
+                        self.iteraciones += 1
+                        _informar()
+                        if self._intercambiar(k, j):
+                            movido = True
+                            break
+                if movido:
+                    self.mejoras_perfil += 1
+                    mejora = True
+
+        if progreso is not None:
+            progreso(1.0, f"Mejora local: {self.recuperados} lote(s) recuperados, "
+                          f"{self.iteraciones} movimientos evaluados")
+        return pendientes
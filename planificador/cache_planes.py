@@ -0,0 +1,121 @@
+"""Caché de planificaciones por huella de la entrada (DataFrame de trabajo, parámetros y selección)."""
+import dataclasses
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .exportar import huella_df
+
+# LRU en memoria de planificaciones ya calculadas, con tope de entradas y de memoria
+MAX_ENTRADAS_PLANES = 8
+MAX_BYTES_PLANES = 512 * 1024 ** 2
+# Campos de ConfigPlanificacion que no cambian el resultado (no entran en la huella)
+CAMPOS_SIN_EFECTO = ("procesos_planificacion",)
+
+_cache_planes = OrderedDict()  # huella → (df_plan, df_sugerencias, estado, bytes)
+_cache_lock = threading.Lock()
+
+
+def _normalizar(valor):
+    """Forma canónica (hashable y con repr estable) de parámetros: dicts ordenados, fechas en ISO."""
+    if dataclasses.is_dataclass(valor):
+        return (type(valor).__name__,) + tuple(
+            (f.name, _normalizar(getattr(valor, f.name)))
+            for f in dataclasses.fields(valor) if f.name not in CAMPOS_SIN_EFECTO
+        )
+    if isinstance(valor, dict):
+        return tuple(sorted((_normalizar(k), _normalizar(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple, pd.Index)):
+        return tuple(_normalizar(v) for v in valor)
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return None
+    if hasattr(valor, "item"):  # escalares NumPy
+        return valor.item()
+    return valor
+
+
+def huella_plan(df_trabajo, config, seleccion=(), **extra):
+    """
+    Huella SHA-256 de una planificación: contenido de df_trabajo, todos los parámetros de
+    config (capacidades, overrides, festivos, días máx. por producto, reglas...), los lotes
+    seleccionados y cualquier opción de modo en 'extra' (p. ej. dias_ventana).
+    """
+    h = hashlib.sha256(huella_df(df_trabajo).encode())
+    h.update(repr(_normalizar(config)).encode())
+    h.update(repr(sorted(map(str, seleccion))).encode())
+    h.update(repr(_normalizar(extra)).encode())
+    return h.hexdigest()
+
+
+def _bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _bytes_objeto(obj, vistos=None):
+    """
+    Memoria aproximada de un objeto y de lo que referencia (arrays NumPy, listas, dicts y
+    atributos), contando una sola vez lo compartido; p. ej. un EstadoPlanificacion con sus
+    series diarias, árbol de estabilización, perfil y tablas de SALIDA.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        # Una vista cuenta el array del que sale (una vez), no sus propios bytes
+        if obj.base is not None:
+            return sys.getsizeof(obj) + _bytes_objeto(obj.base, vistos)
+        return int(obj.nbytes) + sys.getsizeof(obj)
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    tam = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        tam += sum(_bytes_objeto(k, vistos) + _bytes_objeto(v, vistos) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        tam += sum(_bytes_objeto(v, vistos) for v in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        tam += _bytes_objeto(vars(obj), vistos)
+    return tam
+
+
+def obtener_plan(huella):
+    """(df_plan, df_sugerencias, estado) ya calculados para la huella, o None; siempre copias."""
+    with _cache_lock:
+        entrada = _cache_planes.get(huella)
+        if entrada is None:
+            return None
+        _cache_planes.move_to_end(huella)
+    df_plan, df_sug, estado, _ = entrada
+    return df_plan.copy(), df_sug.copy(), (estado.copia() if estado is not None else None)
+
+
+def guardar_plan(huella, df_plan, df_sugerencias, estado=None,
+                 max_entradas=MAX_ENTRADAS_PLANES, max_bytes=MAX_BYTES_PLANES):
+    """
+    Guarda copias del resultado (y del EstadoPlanificacion, si se da) bajo la huella. Se
+    descartan las entradas menos usadas hasta quedar en 'max_entradas' y 'max_bytes' (tamaño de
+    los DataFrames más el del estado); un plan que por sí solo supera 'max_bytes' no se guarda.
+    """
+    estado = estado.copia() if estado is not None else None
+    tam = _bytes(df_plan) + _bytes(df_sugerencias) + (_bytes_objeto(estado) if estado is not None else 0)
+    if tam > max_bytes:
+        return
+    entrada = (df_plan.copy(), df_sugerencias.copy(), estado, tam)
+    with _cache_lock:
+        _cache_planes[huella] = entrada
+        _cache_planes.move_to_end(huella)
+        total = sum(e[3] for e in _cache_planes.values())
+        while len(_cache_planes) > max(int(max_entradas), 0) or total > max_bytes:
+            _, descartada = _cache_planes.popitem(last=False)
+            total -= descartada[3]
+
+
+def limpiar_cache_planes():
+    with _cache_lock:
+        _cache_planes.clear()
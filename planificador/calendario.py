@@ -0,0 +1,164 @@
+"""Calendario laborable (lunes-viernes menos festivos) y horizonte de planificación."""
+import numpy as np
+import pandas as pd
+
+
+class CalendarioHabil:
+    """
+    Calendario laborable (lunes-viernes que no son festivo) precalculado una vez por ejecución.
+    Cubre el horizonte [inicio - margen, fin + margen] con tablas de índices NumPy, de modo que
+    "es hábil", "siguiente hábil" y "anterior hábil" son consultas O(1). Fuera del horizonte
+    se recurre a np.busday_offset con el mismo calendario.
+    Las fechas devueltas conservan la hora de la fecha de entrada (igual que sumar timedelta).
+    """
+
+    def __init__(self, festivos, inicio, fin, margen=31):
+        festivos_d = np.asarray(pd.to_datetime(pd.Index(festivos)).normalize().values, dtype="datetime64[D]")
+        self.busdaycal = np.busdaycalendar(weekmask="1111100", holidays=festivos_d)
+
+        self.origen = pd.Timestamp(inicio).normalize() - pd.Timedelta(days=margen)
+        fin_ts = pd.Timestamp(fin).normalize() + pd.Timedelta(days=margen)
+        self._origen_d = np.datetime64(self.origen.date(), "D")
+        self.n = max(int((fin_ts - self.origen).days) + 1, 1)
+
+        dias = self._origen_d + np.arange(self.n)
+        self.habil = np.is_busday(dias, busdaycal=self.busdaycal)
+        self.festivo = np.isin(dias, festivos_d)
+        self._festivos_d = festivos_d
+
+        # Para cada offset i: offset del siguiente hábil (> i) y del anterior hábil (< i); -1 si no hay
+        pos = np.flatnonzero(self.habil)
+        idx = np.arange(self.n)
+        if len(pos) == 0:
+            self._sig = np.full(self.n, -1, dtype=np.int64)
+            self._ant = np.full(self.n, -1, dtype=np.int64)
+        else:
+            j = np.searchsorted(pos, idx, side="right")
+            self._sig = np.where(j < len(pos), pos[np.minimum(j, len(pos) - 1)], -1)
+            k = np.searchsorted(pos, idx, side="left") - 1
+            self._ant = np.where(k >= 0, pos[np.maximum(k, 0)], -1)
+
+    # np.busdaycalendar no se puede serializar: se rehace desde los festivos (procesos del pool)
+    def __getstate__(self):
+        estado = dict(self.__dict__)
+        del estado["busdaycal"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self.busdaycal = np.busdaycalendar(weekmask="1111100", holidays=self._festivos_d)
+
+    def _offset(self, fecha):
+        return int((fecha.normalize() - self.origen).days)
+
+    def _dias_numpy(self, fecha):
+        return np.datetime64(fecha.date(), "D")
+
+    # ---- Consultas escalares ----
+    def es_habil(self, fecha):
+        i = self._offset(fecha)
+        if 0 <= i < self.n:
+            return bool(self.habil[i])
+        return bool(np.is_busday(self._dias_numpy(fecha), busdaycal=self.busdaycal))
+
+    def es_festivo(self, fecha):
+        i = self._offset(fecha)
+        if 0 <= i < self.n:
+            return bool(self.festivo[i])
+        return bool(np.isin(self._dias_numpy(fecha), self._festivos_d))
+
+    def siguiente_habil(self, fecha):
+        i = self._offset(fecha)
+        if 0 <= i < self.n and self._sig[i] >= 0:
+            return fecha + pd.Timedelta(days=int(self._sig[i]) - i)
+        d = self._dias_numpy(fecha)
+        destino = np.busday_offset(d + 1, 0, roll="forward", busdaycal=self.busdaycal)
+        return fecha + pd.Timedelta(days=int((destino - d).astype(int)))
+
+    def anterior_habil(self, fecha):
+        i = self._offset(fecha)
+        if 0 <= i < self.n and self._ant[i] >= 0:
+            return fecha - pd.Timedelta(days=i - int(self._ant[i]))
+        d = self._dias_numpy(fecha)
+        destino = np.busday_offset(d - 1, 0, roll="backward", busdaycal=self.busdaycal)
+        return fecha - pd.Timedelta(days=int((d - destino).astype(int)))
+
+    def habil_o_siguiente(self, fecha):
+        return fecha if self.es_habil(fecha) else self.siguiente_habil(fecha)
+
+    # ---- Consultas por offset de día (respecto a 'origen') ----
+    def es_habil_i(self, i):
+        if 0 <= i < self.n:
+            return bool(self.habil[i])
+        return bool(np.is_busday(self._origen_d + i, busdaycal=self.busdaycal))
+
+    def siguiente_habil_i(self, i):
+        if 0 <= i < self.n and self._sig[i] >= 0:
+            return int(self._sig[i])
+        destino = np.busday_offset(self._origen_d + i + 1, 0, roll="forward", busdaycal=self.busdaycal)
+        return int((destino - self._origen_d).astype(np.int64))
+
+    def offsets_array(self, fechas):
+        """Offsets de día (respecto a 'origen') de una columna de fechas."""
+        s = pd.to_datetime(pd.Series(fechas))
+        return (s.dt.normalize().values.astype("datetime64[D]") - self._origen_d).astype(np.int64)
+
+    def es_habil_offsets(self, offsets):
+        """Vectorizado sobre offsets: True si el día es hábil."""
+        i = np.asarray(offsets, dtype=np.int64)
+        dentro = (i >= 0) & (i < self.n)
+        out = self.habil[np.clip(i, 0, self.n - 1)]
+        if not dentro.all():
+            out = np.where(dentro, out, np.is_busday(self._origen_d + i, busdaycal=self.busdaycal))
+        return out
+
+    def habil_o_siguiente_offsets(self, offsets):
+        """Vectorizado sobre offsets: el propio día si es hábil, si no el siguiente hábil."""
+        d = self._origen_d + np.asarray(offsets, dtype=np.int64)
+        destino = np.busday_offset(d, 0, roll="forward", busdaycal=self.busdaycal)
+        return (destino - self._origen_d).astype(np.int64)
+
+    # ---- Consultas vectorizadas (columnas completas) ----
+    def es_habil_array(self, fechas):
+        s = pd.to_datetime(pd.Series(fechas))
+        d = s.dt.normalize().values.astype("datetime64[D]")
+        return np.is_busday(d, busdaycal=self.busdaycal)
+
+    def habil_o_siguiente_array(self, fechas):
+        """Para cada fecha: ella misma si es hábil, si no el siguiente hábil (conservando la hora)."""
+        s = pd.to_datetime(pd.Series(fechas))
+        d = s.dt.normalize().values.astype("datetime64[D]")
+        destino = np.busday_offset(d, 0, roll="forward", busdaycal=self.busdaycal)
+        return (s + pd.to_timedelta((destino - d).astype(np.int64), unit="D")).values
+
+    def siguiente_habil_array(self, fechas):
+        s = pd.to_datetime(pd.Series(fechas))
+        d = s.dt.normalize().values.astype("datetime64[D]")
+        destino = np.busday_offset(d + 1, 0, roll="forward", busdaycal=self.busdaycal)
+        return (s + pd.to_timedelta((destino - d).astype(np.int64), unit="D")).values
+
+    def anterior_habil_array(self, fechas):
+        s = pd.to_datetime(pd.Series(fechas))
+        d = s.dt.normalize().values.astype("datetime64[D]")
+        destino = np.busday_offset(d - 1, 0, roll="backward", busdaycal=self.busdaycal)
+        return (s - pd.to_timedelta((d - destino).astype(np.int64), unit="D")).values
+
+
+def horizonte_plan(df_plan, dias_max_almacen_global, dias_max_por_producto):
+    """Rango de fechas [inicio, fin] que puede tocar una planificación de df_plan."""
+    fechas = []
+    for col in ("DIA", "ENTRADA_SAL", "SALIDA_SAL"):
+        if col in df_plan.columns:
+            fechas.append(pd.to_datetime(df_plan[col], errors="coerce"))
+    todas = pd.concat(fechas).dropna() if fechas else pd.Series(dtype="datetime64[ns]")
+    if todas.empty:
+        hoy = pd.Timestamp.today().normalize()
+        return hoy, hoy
+
+    dias_max = [dias_max_almacen_global] + list(dias_max_por_producto.values())
+    dias_max = pd.to_numeric(pd.Series(dias_max), errors="coerce").max()
+    dias_sal = 0
+    if "DIAS_SAL_OPTIMOS" in df_plan.columns:
+        dias_sal = pd.to_numeric(df_plan["DIAS_SAL_OPTIMOS"], errors="coerce").max()
+    extra = int(np.nan_to_num(dias_max)) + int(np.nan_to_num(dias_sal))
+    return todas.min(), todas.max() + pd.Timedelta(days=extra)
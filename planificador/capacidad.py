@@ -0,0 +1,364 @@
+"""Series diarias de carga/capacidad e índice de rango de estabilización."""
+import numpy as np
+import pandas as pd
+
+
+class LineaTemporal:
+    """
+    Serie diaria densa de unidades (array de enteros) indexada por offset de día desde 'origen'.
+    Sustituye a los dicts {fecha: unds}: las sumas en rango son sumas sobre un slice.
+    Si se escribe fuera del rango cubierto, el array crece lo necesario; el origen no cambia
+    (los offsets siguen siendo válidos) y el crecimiento por la izquierda se guarda en '_desp'.
+    """
+
+    def __init__(self, origen, n):
+        self.origen = pd.Timestamp(origen).normalize()
+        self.valores = np.zeros(max(int(n), 1), dtype=np.int64)
+        self._desp = 0
+
+    def offset(self, fecha):
+        return int((pd.Timestamp(fecha).normalize() - self.origen).days)
+
+    def fecha(self, i):
+        return self.origen + pd.Timedelta(days=int(i))
+
+    def _asegurar(self, i_ini, i_fin):
+        """Amplía el array para cubrir los offsets [i_ini, i_fin]."""
+        pre = max(0, -(i_ini + self._desp))
+        post = max(0, i_fin + self._desp - (len(self.valores) - 1))
+        if pre or post:
+            self.valores = np.concatenate([
+                np.zeros(pre, dtype=np.int64), self.valores, np.zeros(post, dtype=np.int64)
+            ])
+            self._desp += pre
+
+    # ---- Acceso por offset de día (bucles del motor) ----
+    def get_i(self, i):
+        j = i + self._desp
+        if 0 <= j < len(self.valores):
+            return int(self.valores[j])
+        return 0
+
+    def sumar_i(self, i, unds):
+        self._asegurar(i, i)
+        self.valores[i + self._desp] += unds
+
+    def sumar_rango_i(self, i, j, unds):
+        """Suma 'unds' en los offsets [i, j] (ambos incluidos)."""
+        if j < i:
+            return
+        self._asegurar(i, j)
+        self.valores[i + self._desp:j + self._desp + 1] += unds
+
+    def rango_i(self, i, j):
+        """Valores (copia) de los offsets [i, j], con 0 fuera del rango cubierto."""
+        if j < i:
+            return np.zeros(0, dtype=np.int64)
+        out = np.zeros(j - i + 1, dtype=np.int64)
+        a, b = max(i + self._desp, 0), min(j + self._desp, len(self.valores) - 1)
+        if a <= b:
+            out[a - i - self._desp:b - i - self._desp + 1] = self.valores[a:b + 1]
+        return out
+
+    def valores_en_offsets(self, offs):
+        """Vectorizado: valores en un array de offsets, con 0 fuera del rango cubierto."""
+        j = np.asarray(offs, dtype=np.int64) + self._desp
+        dentro = (j >= 0) & (j < len(self.valores))
+        return np.where(dentro, self.valores[np.clip(j, 0, len(self.valores) - 1)], 0)
+
+    # ---- Acceso por fecha ----
+    def get(self, fecha):
+        return self.get_i(self.offset(fecha))
+
+    def sumar(self, fecha, unds):
+        self.sumar_i(self.offset(fecha), unds)
+
+    def sumar_rango(self, fecha_ini, fecha_fin_inclusive, unds):
+        """Suma 'unds' en todas las fechas entre ini y fin (ambas incluidas)."""
+        if pd.isna(fecha_ini) or pd.isna(fecha_fin_inclusive):
+            return
+        self.sumar_rango_i(self.offset(fecha_ini), self.offset(fecha_fin_inclusive), unds)
+
+    def rango(self, fecha_ini, fecha_fin_inclusive):
+        """Valores (copia) de las fechas entre ini y fin, con 0 fuera del rango cubierto."""
+        return self.rango_i(self.offset(fecha_ini), self.offset(fecha_fin_inclusive))
+
+    def copia(self):
+        nueva = LineaTemporal(self.origen, len(self.valores))
+        nueva.valores = self.valores.copy()
+        nueva._desp = self._desp
+        return nueva
+
+    def sumar_en_offsets(self, offs, unds):
+        """Suma vectorizada de unds[k] en el offset offs[k]."""
+        offs = np.asarray(offs, dtype=np.int64)
+        if len(offs) == 0:
+            return
+        self._asegurar(int(offs.min()), int(offs.max()))
+        np.add.at(self.valores, offs + self._desp, np.asarray(unds, dtype=np.int64))
+
+    def sumar_intervalos_offsets(self, a, b, unds):
+        """Suma vectorizada de unds[k] en los offsets [a[k], b[k]] mediante array de diferencias."""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        u = np.asarray(unds, dtype=np.int64)
+        validos = b >= a
+        a, b, u = a[validos], b[validos], u[validos]
+        if len(a) == 0:
+            return
+        self._asegurar(int(a.min()), int(b.max()))
+        dif = np.zeros(len(self.valores) + 1, dtype=np.int64)
+        np.add.at(dif, a + self._desp, u)
+        np.add.at(dif, b + self._desp + 1, -u)
+        self.valores += np.cumsum(dif[:-1])
+
+    def sumar_en_fechas(self, fechas, unds):
+        """Suma vectorizada de unds[k] en fechas[k] (ignora fechas nulas)."""
+        fechas = pd.to_datetime(pd.Series(fechas)).reset_index(drop=True)
+        unds = pd.to_numeric(pd.Series(list(unds)), errors="coerce").fillna(0)
+        ok = fechas.notna()
+        if not ok.any():
+            return
+        offs = (fechas[ok].dt.normalize() - self.origen).dt.days.to_numpy(dtype=np.int64)
+        self.sumar_en_offsets(offs, unds[ok].to_numpy(dtype=np.int64))
+
+    def sumar_intervalos(self, inicios, fines_inclusive, unds):
+        """Suma vectorizada de unds[k] en [inicios[k], fines[k]] (ignora fechas nulas)."""
+        inicios = pd.to_datetime(pd.Series(inicios)).reset_index(drop=True)
+        fines = pd.to_datetime(pd.Series(fines_inclusive)).reset_index(drop=True)
+        unds = pd.to_numeric(pd.Series(list(unds)), errors="coerce").fillna(0)
+        ok = inicios.notna() & fines.notna()
+        if not ok.any():
+            return
+        a = (inicios[ok].dt.normalize() - self.origen).dt.days.to_numpy(dtype=np.int64)
+        b = (fines[ok].dt.normalize() - self.origen).dt.days.to_numpy(dtype=np.int64)
+        self.sumar_intervalos_offsets(a, b, unds[ok].to_numpy(dtype=np.int64))
+
+
+class CapacidadDiaria:
+    """Capacidad por día (valor base + overrides por fecha) precalculada como array sobre el horizonte."""
+
+    def __init__(self, origen, n, base, overrides):
+        self.origen = pd.Timestamp(origen).normalize()
+        self.base = int(base)
+        self.overrides = {pd.Timestamp(k).normalize(): int(v) for k, v in overrides.items()}
+        self.valores = np.full(max(int(n), 1), self.base, dtype=np.int64)
+        for fecha, v in self.overrides.items():
+            i = int((fecha - self.origen).days)
+            if 0 <= i < len(self.valores):
+                self.valores[i] = v
+
+    def offset(self, fecha):
+        return int((pd.Timestamp(fecha).normalize() - self.origen).days)
+
+    def get_i(self, i):
+        if 0 <= i < len(self.valores):
+            return int(self.valores[i])
+        return self.overrides.get(self.origen + pd.Timedelta(days=int(i)), self.base)
+
+    def rango_i(self, i, j):
+        if 0 <= i and j < len(self.valores):
+            return self.valores[i:j + 1]
+        return np.array([self.get_i(k) for k in range(i, j + 1)], dtype=np.int64)
+
+    def valores_en_offsets(self, offs):
+        """Vectorizado: capacidad en un array de offsets (fuera del horizonte, base u override)."""
+        i = np.asarray(offs, dtype=np.int64)
+        dentro = (i >= 0) & (i < len(self.valores))
+        out = np.full(i.shape, self.base, dtype=np.int64)
+        out[dentro] = self.valores[i[dentro]]
+        if self.overrides and not dentro.all():
+            out[~dentro] = [self.get_i(int(k)) for k in i[~dentro]]
+        return out
+
+    def get(self, fecha):
+        return self.get_i(self.offset(fecha))
+
+    def rango(self, fecha_ini, fecha_fin_inclusive):
+        return self.rango_i(self.offset(fecha_ini), self.offset(fecha_fin_inclusive))
+
+
+class ArbolMaxRango:
+    """
+    Árbol de segmentos (iterativo, con suma perezosa) sobre un array de enteros.
+    Soporta "sumar v en [l, r)" y "máximo en [l, r)" en O(log n).
+    """
+
+    def __init__(self, valores):
+        self.n = max(len(valores), 1)
+        self.h = self.n.bit_length()
+        self.t = [0] * self.n + [int(v) for v in valores] + [0] * (self.n - len(valores))
+        self.d = [0] * self.n
+        for p in range(self.n - 1, 0, -1):
+            self.t[p] = max(self.t[2 * p], self.t[2 * p + 1])
+
+    def _aplicar(self, p, v):
+        self.t[p] += v
+        if p < self.n:
+            self.d[p] += v
+
+    def _recalcular(self, p):
+        t, d = self.t, self.d
+        while p > 1:
+            p >>= 1
+            t[p] = max(t[2 * p], t[2 * p + 1]) + d[p]
+
+    def _propagar(self, p):
+        d = self.d
+        for s in range(self.h, 0, -1):
+            i = p >> s
+            if d[i]:
+                self._aplicar(2 * i, d[i])
+                self._aplicar(2 * i + 1, d[i])
+                d[i] = 0
+
+    def sumar(self, l, r, v):
+        if l >= r or v == 0:
+            return
+        l += self.n
+        r += self.n
+        l0, r0 = l, r
+        while l < r:
+            if l & 1:
+                self._aplicar(l, v)
+                l += 1
+            if r & 1:
+                r -= 1
+                self._aplicar(r, v)
+            l >>= 1
+            r >>= 1
+        self._recalcular(l0)
+        self._recalcular(r0 - 1)
+
+    def copia(self):
+        nuevo = ArbolMaxRango.__new__(ArbolMaxRango)
+        nuevo.n, nuevo.h = self.n, self.h
+        nuevo.t, nuevo.d = list(self.t), list(self.d)
+        return nuevo
+
+    def maximo(self, l, r):
+        l += self.n
+        r += self.n
+        self._propagar(l)
+        self._propagar(r - 1)
+        t = self.t
+        res = None
+        while l < r:
+            if l & 1:
+                res = t[l] if res is None or t[l] > res else res
+                l += 1
+            if r & 1:
+                r -= 1
+                res = t[r] if res is None or t[r] > res else res
+            l >>= 1
+            r >>= 1
+        return res
+
+
+class IndiceEstabilizacion:
+    """
+    Índice de rango sobre la holgura de la cámara de estabilización: mantiene (stock - capacidad)
+    por día en un ArbolMaxRango, de modo que "¿caben X unds todos los días del rango?" y
+    "peor déficit del rango" se responden en tiempo logarítmico y se actualiza al confirmar lotes.
+    Los rangos fuera del horizonte del índice se resuelven con los arrays de stock/capacidad.
+    """
+
+    def __init__(self, stock, capacidad):
+        self.stock = stock
+        self.capacidad = capacidad
+        self.origen = stock.origen
+        self.n = len(stock.valores) - stock._desp
+        self.arbol = ArbolMaxRango(stock.rango_i(0, self.n - 1) - capacidad.rango_i(0, self.n - 1))
+
+    def copia(self, stock):
+        """Copia del índice sobre 'stock' (copia del stock original); la capacidad se comparte."""
+        nuevo = IndiceEstabilizacion.__new__(IndiceEstabilizacion)
+        nuevo.stock, nuevo.capacidad = stock, self.capacidad
+        nuevo.origen, nuevo.n = self.origen, self.n
+        nuevo.arbol = self.arbol.copia()
+        return nuevo
+
+    def _offsets(self, fecha_ini, fecha_fin_inclusive):
+        i = int((pd.Timestamp(fecha_ini).normalize() - self.origen).days)
+        j = int((pd.Timestamp(fecha_fin_inclusive).normalize() - self.origen).days)
+        return i, j
+
+    # ---- Acceso por offset de día ----
+    def exceso_max_i(self, i, j, unds):
+        """Máximo de (stock + unds - capacidad) en los offsets [i, j]; None si el rango está vacío."""
+        if j < i:
+            return None
+        if 0 <= i and j < self.n:
+            return self.arbol.maximo(i, j + 1) + unds
+        return int((self.stock.rango_i(i, j) + unds - self.capacidad.rango_i(i, j)).max())
+
+    def cabe_i(self, i, j, unds):
+        exceso = self.exceso_max_i(i, j, unds)
+        return exceso is None or exceso <= 0
+
+    def sumar_rango_i(self, i, j, unds):
+        """Confirma 'unds' en estabilización en los offsets [i, j] (stock y árbol)."""
+        if j < i:
+            return
+        self.stock.sumar_rango_i(i, j, unds)
+        a, b = max(i, 0), min(j, self.n - 1) + 1
+        if a < b:
+            self.arbol.sumar(a, b, unds)
+
+    def sumar_intervalos_i(self, a, b, unds):
+        """Vectorizado: confirma unds[k] en los offsets [a[k], b[k]]; el árbol se rehace una vez."""
+        self.stock.sumar_intervalos_offsets(a, b, unds)
+        self.arbol = ArbolMaxRango(self.stock.rango_i(0, self.n - 1) - self.capacidad.rango_i(0, self.n - 1))
+
+    # ---- Acceso por fecha ----
+    def exceso_max(self, fecha_ini, fecha_fin_inclusive, unds):
+        return self.exceso_max_i(*self._offsets(fecha_ini, fecha_fin_inclusive), unds)
+
+    def cabe(self, fecha_ini, fecha_fin_inclusive, unds):
+        return self.cabe_i(*self._offsets(fecha_ini, fecha_fin_inclusive), unds)
+
+    def sumar_rango(self, fecha_ini, fecha_fin_inclusive, unds):
+        if pd.isna(fecha_ini) or pd.isna(fecha_fin_inclusive):
+            return
+        self.sumar_rango_i(*self._offsets(fecha_ini, fecha_fin_inclusive), unds)
+
+
+class IndiceIntervalos:
+    """
+    Índice estático de intervalos enteros [a, b) (b exclusivo; a == b = vacío): qué intervalos
+    contienen un punto, en O(log n) pasos vectorizados más el tamaño de la respuesta.
+    Intervalos ordenados por 'a' y árbol de máximos de 'b' encima: se baja solo por los nodos
+    con algún intervalo que empieza en o antes del punto y termina después.
+    """
+
+    def __init__(self, a, b):
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        self._ids = np.argsort(a, kind="stable")
+        self._a = a[self._ids]
+        n = len(a)
+        self._hoja = 1 << max(n - 1, 0).bit_length()
+        self._max = np.full(2 * self._hoja, np.iinfo(np.int64).min, dtype=np.int64)
+        self._max[self._hoja:self._hoja + n] = b[self._ids]
+        nivel = self._hoja
+        while nivel > 1:
+            nivel //= 2
+            hijos = self._max[2 * nivel:4 * nivel]
+            self._max[nivel:2 * nivel] = np.maximum(hijos[0::2], hijos[1::2])
+
+    def __len__(self):
+        return len(self._ids)
+
+    def que_contienen(self, x):
+        """Índices (posiciones originales, ordenados) de los intervalos con a <= x < b."""
+        if len(self._ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        m = int(np.searchsorted(self._a, x, side="right"))  # candidatos: posiciones ordenadas [0, m)
+        nodos = np.array([1] if m > 0 and self._max[1] > x else [], dtype=np.int64)
+        ancho = self._hoja
+        while len(nodos) and ancho > 1:
+            ancho //= 2
+            nodos = np.concatenate([2 * nodos, 2 * nodos + 1])
+            inicio = (nodos - (self._hoja // ancho)) * ancho
+            nodos = nodos[(self._max[nodos] > x) & (inicio < m)]
+        return np.sort(self._ids[nodos - self._hoja])
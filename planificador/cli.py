@@ -0,0 +1,103 @@
+"""
+Planificación por lotes desde línea de comandos (sin navegador):
+
+    python -m planificador lotes.xlsx [otro.xlsx ...] --config planta.json --salida-dir salida/
+
+Por cada Excel escribe <nombre>_planificacion.xlsx, <nombre>_estabilizacion.xlsx
+y <nombre>_sugerencias.xlsx (o un único libro de tres hojas con --un-libro).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .config import ConfigPlanificacion
+from .estabilizacion import calcular_estabilizacion_diaria
+from .exportar import generar_excel, generar_excel_multihoja
+from .horizonte import planificar_horizonte_rodante
+from .ingesta import leer_lotes_excel
+from .motor import liberar_lotes, lotes_a_replanificar, planificar_filas_na
+
+
+def _parser():
+    p = argparse.ArgumentParser(
+        prog="python -m planificador",
+        description="Planifica uno o varios Excel de lotes y escribe plan, estabilización y sugerencias."
+    )
+    p.add_argument("excels", nargs="+", type=Path, help="Excel(s) con los lotes")
+    p.add_argument("--config", type=Path, help="JSON con parámetros de ConfigPlanificacion")
+    p.add_argument("--salida-dir", type=Path, help="Carpeta de salida (por defecto, la del Excel)")
+    p.add_argument(
+        "--un-libro", action="store_true",
+        help="Escribir un único <nombre>_planificacion_completa.xlsx con tres hojas"
+    )
+    p.add_argument("--cache-dir", type=Path, help="Carpeta para sidecars Parquet de los Excel ya leídos")
+    p.add_argument(
+        "--solo-pendientes", action="store_true",
+        help="Replanificar solo filas sin ENTRADA_SAL (por defecto también las LOTE_NO_ENCAJA = 'Sí')"
+    )
+    p.add_argument(
+        "--ventana-dias", type=int,
+        help="Planificar por horizonte rodante con ventanas de N días de recepción (ficheros largos)"
+    )
+    p.add_argument(
+        "--procesos", type=int,
+        help="Procesos para las componentes independientes de lotes (0 = todos los núcleos)"
+    )
+    return p
+
+
+def planificar_excel(ruta, config, salida_dir=None, solo_pendientes=False, cache_dir=None, un_libro=False,
+                     ventana_dias=None):
+    """
+    Planifica un Excel y escribe los tres libros de salida. Devuelve (plan, estabilización, sugerencias).
+    Con 'ventana_dias' se planifica por horizonte rodante (planificar_horizonte_rodante).
+    """
+    df = leer_lotes_excel(ruta, cache_dir=cache_dir)
+    if solo_pendientes:
+        df_trabajo = df
+    else:
+        df_trabajo = liberar_lotes(df, df.index[lotes_a_replanificar(df)])
+
+    if ventana_dias:
+        df_plan, df_sug = planificar_horizonte_rodante(df_trabajo, config, ventana_dias)
+    else:
+        df_plan, df_sug = planificar_filas_na(df_trabajo, config)
+    df_estab = calcular_estabilizacion_diaria(df_plan, config.estab_cap, config.estab_cap_overrides)
+
+    salida_dir = Path(salida_dir) if salida_dir else Path(ruta).parent
+    salida_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(ruta).stem
+    if un_libro:
+        (salida_dir / f"{stem}_planificacion_completa.xlsx").write_bytes(generar_excel_multihoja({
+            "Planificación": df_plan, "Estabilización": df_estab, "Sugerencias": df_sug
+        }))
+    else:
+        for sufijo, df_out in (("planificacion", df_plan), ("estabilizacion", df_estab), ("sugerencias", df_sug)):
+            (salida_dir / f"{stem}_{sufijo}.xlsx").write_bytes(generar_excel(df_out).getvalue())
+    return df_plan, df_estab, df_sug
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+
+    config = ConfigPlanificacion()
+    if args.config:
+        config = ConfigPlanificacion.desde_dict(json.loads(args.config.read_text(encoding="utf-8")))
+    if args.procesos is not None:
+        config.procesos_planificacion = args.procesos
+
+    errores = 0
+    for ruta in args.excels:
+        try:
+            df_plan, _, df_sug = planificar_excel(
+                ruta, config, args.salida_dir, args.solo_pendientes, args.cache_dir, args.un_libro,
+                args.ventana_dias,
+            )
+        except Exception as e:
+            errores += 1
+            print(f"❌ {ruta}: {e}", file=sys.stderr)
+            continue
+        no_encajan = int((df_plan["LOTE_NO_ENCAJA"] == "Sí").sum()) if "LOTE_NO_ENCAJA" in df_plan.columns else 0
+        print(f"✅ {ruta}: {len(df_plan)} lotes, {no_encajan} no encajan, {len(df_sug)} sugerencias")
+    return 1 if errores else 0
@@ -0,0 +1,42 @@
+"""Descomposición de los lotes pendientes en componentes independientes (sin días de capacidad en común)."""
+import numpy as np
+
+from .sugerencias import ventanas_entrada
+
+
+def intervalos_lotes(estado, lotes, ks):
+    """
+    Días [inicio, fin] (offsets, ambos incluidos) en los que cada lote 'ks' puede tocar capacidad:
+    desde su DIA (estabilización) hasta la SALIDA más tardía de sus ENTRADAS posibles (con los
+    ajustes de fin de semana y festivos). Un lote sin ENTRADAS posibles se queda en [DIA, DIA].
+    """
+    ks = np.asarray(ks, dtype=np.int64)
+    inicio = lotes.dia_off[ks]
+    fin = inicio.copy()
+    r, e = ventanas_entrada(estado.cal, lotes, ks)
+    if len(r):
+        fija, _, sig, depende = estado.salidas.resolver_offsets(e, lotes.dso[ks][r])
+        np.maximum.at(fin, r, np.where(depende, np.maximum(fija, sig), fija))
+    return inicio, fin
+
+
+def componentes_independientes(estado, lotes, ks):
+    """
+    Componentes conexas del grafo de solapamiento de intervalos_lotes: lotes cuyos días nunca
+    coinciden con los de otra componente (separadas por huecos, p. ej. paradas o semanas de
+    festivos). Lista de arrays de 'ks', cada uno en el orden dado; las componentes, por su
+    primer día.
+    """
+    ks = np.asarray(ks, dtype=np.int64)
+    if len(ks) == 0:
+        return []
+    inicio, fin = intervalos_lotes(estado, lotes, ks)
+    orden = np.argsort(inicio, kind="stable")
+    fin_previo = np.maximum.accumulate(fin[orden])
+    # Empieza componente nueva el lote que arranca después de todo lo anterior
+    nueva = np.r_[True, inicio[orden][1:] > fin_previo[:-1]]
+    componente = np.empty(len(ks), dtype=np.int64)
+    componente[orden] = np.cumsum(nueva) - 1
+    por_componente = np.argsort(componente, kind="stable")
+    cortes = np.flatnonzero(np.diff(componente[por_componente])) + 1
+    return [ks[p] for p in np.split(por_componente, cortes)]
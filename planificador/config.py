@@ -0,0 +1,121 @@
+"""Parámetros de planificación (lo que en la app viene del panel lateral)."""
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+MOTORES_ASIGNACION = ("voraz", "optimizacion")
+
+FESTIVOS_DEFECTO = [
+    "2025-01-01", "2025-04-18", "2025-05-01", "2025-08-15",
+    "2025-10-12", "2025-11-01", "2025-12-25"
+]
+
+
+@dataclass(frozen=True)
+class ReglaEntradaComun:
+    """
+    Regla de ENTRADA común: todos los lotes pendientes de los PRODUCTO 'codigos' entran el
+    mismo día. Si no hay fecha común factible se aplica, por separado y en orden, cada
+    grupo de 'alternativas' (tuplas de códigos).
+    """
+    codigos: tuple
+    alternativas: tuple = ()
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Desde {"codigos": [...], "alternativas": [[...], ...]} (p. ej. un JSON de planta)."""
+        return cls(
+            tuple(str(c) for c in datos["codigos"]),
+            tuple(tuple(str(c) for c in alt) for alt in datos.get("alternativas", ())),
+        )
+
+
+# Reglas de la planta: tres códigos MEX (cada uno a un mismo día) y el par PORCISAN jamón/paleta
+# (mismo día entre ambos; si no cabe, cada código por separado)
+REGLAS_ENTRADA_COMUN_DEFECTO = (
+    ReglaEntradaComun(("JBSPRCLC-MEX",)),
+    ReglaEntradaComun(("JCIVRROD-MEX",)),
+    ReglaEntradaComun(("JBCPRCLC-MEX",)),
+    ReglaEntradaComun(
+        ("JCIVRPORCISAN", "PCIVRPORCISAN"),
+        alternativas=(("JCIVRPORCISAN",), ("PCIVRPORCISAN",)),
+    ),
+)
+
+
+@dataclass
+class ConfigPlanificacion:
+    """
+    Configuración explícita de una planificación.
+      - cap_ent_1/2, cap_sal_1/2: capacidad global por día de ENTRADA/SALIDA (1º y 2º intento)
+      - dias_max_almacen_global: días naturales máx. entre DIA y ENTRADA_SAL
+      - dias_max_por_producto: overrides {PRODUCTO: días}
+      - estab_cap: capacidad base de la cámara de estabilización
+      - cap_overrides_ent/sal: {fecha: {"CAP1": int|None, "CAP2": int|None}}
+      - estab_cap_overrides: {fecha: int}
+      - motor_asignacion: "voraz" (por defecto) u "optimizacion" (MILP global, requiere highspy)
+      - limite_segundos_optimizacion: presupuesto de tiempo del solver MILP (repartido entre sus dos
+        etapas, ver optimizacion.FRACCION_TIEMPO_ETAPA_1). El MILP no aplica la regla del menos
+        cargado en las SALIDAS de festivo martes-jueves: elige entre los dos candidatos
+      - mejora_local: búsqueda local tras la asignación para recuperar lotes que no encajan y
+        reducir mezclas TIPO/NITRIF por día (recolocar e intercambiar lotes asignados), con
+        presupuesto limite_segundos_mejora / max_iteraciones_mejora (movimientos evaluados)
+      - reglas_entrada_comun: ReglaEntradaComun que se aplican, en orden, antes de la asignación
+      - procesos_planificacion: procesos para planificar en paralelo las componentes independientes
+        de pendientes (motor voraz sin mejora local; solo las de motor.MIN_LOTES_COMPONENTE lotes
+        o más); 1 = secuencial, 0 = todos los núcleos
+    """
+    cap_ent_1: int = 3100
+    cap_ent_2: int = 3500
+    cap_sal_1: int = 3100
+    cap_sal_2: int = 3500
+    dias_max_almacen_global: int = 5
+    estab_cap: int = 4700
+    dias_festivos: list = field(default_factory=lambda: list(FESTIVOS_DEFECTO))
+    ajuste_finde: bool = True
+    ajuste_festivos: bool = True
+    dias_max_por_producto: dict = field(default_factory=dict)
+    cap_overrides_ent: dict = field(default_factory=dict)
+    cap_overrides_sal: dict = field(default_factory=dict)
+    estab_cap_overrides: dict = field(default_factory=dict)
+    motor_asignacion: str = "voraz"
+    limite_segundos_optimizacion: float = 30.0
+    mejora_local: bool = False
+    limite_segundos_mejora: float = 10.0
+    max_iteraciones_mejora: int = 20000
+    reglas_entrada_comun: list = field(default_factory=lambda: list(REGLAS_ENTRADA_COMUN_DEFECTO))
+    procesos_planificacion: int = 1
+
+    @property
+    def festivos(self):
+        return pd.to_datetime(pd.Index(list(self.dias_festivos))).normalize()
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """
+        Construye la configuración desde un dict (p. ej. un JSON de planta).
+        Las claves de fecha de los overrides pueden venir como texto "YYYY-MM-DD".
+        """
+        datos = dict(datos)
+        for clave in ("cap_overrides_ent", "cap_overrides_sal"):
+            if clave in datos:
+                datos[clave] = {
+                    pd.Timestamp(k).normalize(): {
+                        "CAP1": (int(v["CAP1"]) if v.get("CAP1") is not None else None),
+                        "CAP2": (int(v["CAP2"]) if v.get("CAP2") is not None else None),
+                    }
+                    for k, v in datos[clave].items()
+                }
+        if "estab_cap_overrides" in datos:
+            datos["estab_cap_overrides"] = {
+                pd.Timestamp(k).normalize(): int(v) for k, v in datos["estab_cap_overrides"].items()
+            }
+        if "reglas_entrada_comun" in datos:
+            datos["reglas_entrada_comun"] = [
+                r if isinstance(r, ReglaEntradaComun) else ReglaEntradaComun.desde_dict(r)
+                for r in datos["reglas_entrada_comun"]
+            ]
+        desconocidas = set(datos) - set(cls.__dataclass_fields__)
+        if desconocidas:
+            raise ValueError(f"Parámetros de planificación desconocidos: {sorted(desconocidas)}")
+        return cls(**datos)
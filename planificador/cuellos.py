@@ -0,0 +1,236 @@
+"""Cuellos de botella: aumentos mínimos de capacidad por día para encajar juntos los lotes que no encajan."""
+import numpy as np
+import pandas as pd
+
+from .estado import EstadoPlanificacion
+from .lotes import LotesCompactos
+from .optimizacion import resolver_milp, solver_disponible
+from .sugerencias import ventanas_entrada
+
+COLS_CUELLOS = [
+    "INTENTO", "RECURSO", "FECHA", "CAPACIDAD", "CARGA",
+    "AUMENTO", "CAPACIDAD_PROPUESTA", "LOTES"
+]
+RECURSOS = ("ENTRADA", "SALIDA", "ESTABILIZACIÓN")
+
+# Desempate entre soluciones con el mismo aumento total: ENTRADA más temprana
+PESO_RETRASO = 0.001
+
+
+def _opciones(estado, lotes, ks):
+    """Opciones (lote, ENTRADA, SALIDA) de cada lote: ENTRADA hábil de su ventana × SALIDA posible."""
+    r, e = ventanas_entrada(estado.cal, lotes, ks)
+    fija, ant, sig, depende = estado.salidas.resolver_offsets(e, lotes.dso[ks][r])
+    r = np.concatenate([r, r[depende]])
+    e = np.concatenate([e, e[depende]])
+    s = np.concatenate([np.where(depende, ant, fija), sig[depende]])
+    orden = np.lexsort((s, e, r))
+    return r[orden], e[orden], s[orden]
+
+
+class _Recursos:
+    """
+    Días-recurso que tocan las opciones (ENTRADA, SALIDA y días naturales de estabilización)
+    con su carga y capacidad actuales, y la incidencia opción → día-recurso (en unds).
+    """
+
+    def __init__(self, estado, lotes, ks, r, e, s):
+        dia = lotes.dia_off[ks][r]
+        u = lotes.unds[ks][r].astype(np.float64)
+        self.dias_e = np.unique(e)
+        self.dias_s = np.unique(s)
+        con_estab = e > dia
+        self.estab_ini = int(dia[con_estab].min()) if con_estab.any() else 0
+        n_estab = int(e[con_estab].max()) - self.estab_ini if con_estab.any() else 0
+        self.dias_k = self.estab_ini + np.arange(n_estab)
+        self.n_e, self.n_s = len(self.dias_e), len(self.dias_s)
+        self.n = self.n_e + self.n_s + n_estab
+
+        self.recurso = np.repeat([0, 1, 2], [self.n_e, self.n_s, n_estab])
+        self.offset = np.concatenate([self.dias_e, self.dias_s, self.dias_k])
+        self.carga = np.concatenate([
+            estado.carga_entrada.valores_en_offsets(self.dias_e),
+            estado.carga_salida.valores_en_offsets(self.dias_s),
+            estado.estab_stock.valores_en_offsets(self.dias_k),
+        ])
+        cap_k = estado.cap_estab.valores_en_offsets(self.dias_k)
+        self.capacidad = {
+            a: np.concatenate([
+                estado.cap_ent[a].valores_en_offsets(self.dias_e),
+                estado.cap_sal[a].valores_en_offsets(self.dias_s),
+                cap_k,
+            ])
+            for a in (1, 2)
+        }
+
+        # Incidencia: ENTRADA, SALIDA y cada día [DIA, ENTRADA - 1]
+        j = np.arange(len(e))
+        largo = np.clip(e - dia, 0, None)
+        dias_estab = np.repeat(dia - self.estab_ini, largo) + (
+            np.arange(largo.sum()) - np.repeat(np.cumsum(largo) - largo, largo)
+        )
+        self.filas = np.concatenate([
+            np.searchsorted(self.dias_e, e),
+            self.n_e + np.searchsorted(self.dias_s, s),
+            self.n_e + self.n_s + dias_estab,
+        ])
+        self.cols = np.concatenate([j, j, np.repeat(j, largo)])
+        self.vals = np.concatenate([u, u, np.repeat(u, largo)])
+        # Días-recurso de cada opción (CSR por opción) para la heurística
+        orden = np.argsort(self.cols, kind="stable")
+        self.por_opcion = np.split(self.filas[orden], np.cumsum(np.bincount(self.cols, minlength=len(e)))[:-1])
+        self.u = u
+
+    def holgura(self, intento):
+        """Capacidad libre por día-recurso; los días ya por encima de su capacidad cuentan con 0."""
+        return np.maximum(self.capacidad[intento] - self.carga, 0).astype(np.float64)
+
+    def exceso(self, intento):
+        """Carga actual por encima de la capacidad: hay que cubrirla si se coloca algún lote ese día."""
+        return np.maximum(self.carga - self.capacidad[intento], 0).astype(np.float64)
+
+
+def _aumento(uso, holgura, exceso):
+    """Aumento de capacidad de cada día-recurso para un uso dado (0 si no se usa)."""
+    return np.where(uso > 0, np.maximum(uso - holgura, 0) + exceso, 0)
+
+
+def _heuristica(r, n_lotes, recursos, holgura, exceso, retraso):
+    """Asignación secuencial: cada lote a la opción con menor aumento adicional sobre lo ya colocado."""
+    uso = np.zeros(recursos.n)
+    elegidas = []
+    inicio = np.searchsorted(r, np.arange(n_lotes + 1))
+    for l in range(n_lotes):
+        mejor, coste_mejor = None, np.inf
+        for j in range(inicio[l], inicio[l + 1]):
+            f = recursos.por_opcion[j]
+            antes = _aumento(uso[f], holgura[f], exceso[f]).sum()
+            despues = _aumento(uso[f] + recursos.u[j], holgura[f], exceso[f]).sum()
+            coste = despues - antes + PESO_RETRASO * retraso[j]
+            if coste < coste_mejor:
+                mejor, coste_mejor = j, coste
+        if mejor is not None:
+            uso[recursos.por_opcion[mejor]] += recursos.u[mejor]
+            elegidas.append(mejor)
+    x = np.zeros(len(r))
+    x[elegidas] = 1.0
+    return x
+
+
+def _uso(recursos, x):
+    return np.bincount(recursos.filas, weights=recursos.vals * x[recursos.cols], minlength=recursos.n)
+
+
+def _resolver(r, n_lotes, recursos, holgura, exceso, retraso, limite_segundos):
+    """
+    min sum(aumento) + sum(exceso·w) + PESO_RETRASO·retraso sujeto a: cada lote en una opción;
+    por día-recurso sum(unds·x) - aumento <= holgura; y en los días ya por encima de su capacidad
+    w >= x de cada opción que los usa (colocar algo ahí obliga a cubrir antes el exceso).
+    Se queda con la heurística si el solver no la mejora; sin highspy se usa la heurística.
+    """
+    x0 = _heuristica(r, n_lotes, recursos, holgura, exceso, retraso)
+    if not solver_disponible():
+        return x0
+    n_x = len(r)
+    con_opciones = np.unique(r)
+    fila_lote = np.searchsorted(con_opciones, r)
+    n_l = len(con_opciones)
+    # Variables: x (opciones) | w (días en exceso, binarias) | aumento (por día-recurso)
+    dias_w = np.flatnonzero(exceso > 0)
+    n_w = len(dias_w)
+    w_de = np.full(recursos.n, -1, dtype=np.int64)
+    w_de[dias_w] = np.arange(n_w)
+    en_w = w_de[recursos.filas] >= 0
+    n_xw = int(en_w.sum())
+    o_a = n_x + n_w
+    matriz = (
+        np.concatenate([
+            fila_lote, n_l + recursos.filas, n_l + np.arange(recursos.n),
+            n_l + recursos.n + np.arange(n_xw), n_l + recursos.n + np.arange(n_xw),
+        ]),
+        np.concatenate([
+            np.arange(n_x), recursos.cols, o_a + np.arange(recursos.n),
+            recursos.cols[en_w], n_x + w_de[recursos.filas[en_w]],
+        ]),
+        np.concatenate([
+            np.ones(n_x), recursos.vals, -np.ones(recursos.n), np.ones(n_xw), -np.ones(n_xw),
+        ]),
+        n_l + recursos.n + n_xw,
+    )
+    fila_min = np.concatenate([np.ones(n_l), np.full(recursos.n + n_xw, -np.inf)])
+    fila_max = np.concatenate([np.ones(n_l), holgura, np.zeros(n_xw)])
+    costes = np.concatenate([PESO_RETRASO * retraso, exceso[dias_w], np.ones(recursos.n)])
+    cota_sup = np.concatenate([np.ones(o_a), np.full(recursos.n, np.inf)])
+    uso0 = _uso(recursos, x0)
+    inicial = np.concatenate([x0, (uso0[dias_w] > 0).astype(np.float64), np.maximum(uso0 - holgura, 0)])
+    v = resolver_milp(costes, matriz, fila_min, fila_max, cota_sup, o_a, limite_segundos, inicial)
+    if v is None:
+        return x0
+    x = (v[:n_x] > 0.5).astype(np.float64)
+
+    def _clave(x):
+        return _aumento(_uso(recursos, x), holgura, exceso).sum(), float(retraso @ x)
+
+    return x if _clave(x) <= _clave(x0) else x0
+
+
+def aumentos_capacidad(estado, lotes, ks, limite_segundos=10.0):
+    """
+    Aumentos mínimos de capacidad por día que permiten colocar a la vez todos los lotes 'ks'
+    (índices del LotesCompactos) sobre el estado actual, por intento (capacidades del 1º o del
+    2º intento de ENTRADA/SALIDA; la de estabilización es la misma en ambos). Se resuelve un
+    único MILP por intento (cada lote en una de sus ENTRADA/SALIDA posibles, minimizando la
+    suma de aumentos), con 'limite_segundos' de presupuesto entre los dos.
+    Devuelve una fila por día-recurso que hay que subir (COLS_CUELLOS); LOTES es el nº de
+    lotes colocados ese día.
+    """
+    ks = np.asarray(ks, dtype=np.int64)
+    r, e, s = _opciones(estado, lotes, ks)
+    if len(r) == 0:
+        return pd.DataFrame(columns=COLS_CUELLOS)
+    recursos = _Recursos(estado, lotes, ks, r, e, s)
+    retraso = (e - lotes.ini_off[ks][r]).astype(np.float64)
+
+    tablas = []
+    for intento in (1, 2):
+        x = _resolver(
+            r, len(ks), recursos, recursos.holgura(intento), recursos.exceso(intento), retraso, limite_segundos / 2
+        )
+        en_x = x[recursos.cols] > 0
+        uso = np.bincount(recursos.filas[en_x], weights=recursos.vals[en_x], minlength=recursos.n)
+        lotes_dia = np.bincount(recursos.filas[en_x], minlength=recursos.n)
+        capacidad = recursos.capacidad[intento]
+        propuesta = np.maximum(capacidad, recursos.carga + uso.astype(np.int64))
+        subir = (uso > 0) & (propuesta > capacidad)
+        tablas.append(pd.DataFrame({
+            "INTENTO": intento,
+            "RECURSO": np.array(RECURSOS, dtype=object)[recursos.recurso[subir]],
+            "FECHA": estado.cal.origen + pd.to_timedelta(recursos.offset[subir], unit="D"),
+            "CAPACIDAD": capacidad[subir],
+            "CARGA": recursos.carga[subir],
+            "AUMENTO": (propuesta - capacidad)[subir],
+            "CAPACIDAD_PROPUESTA": propuesta[subir],
+            "LOTES": lotes_dia[subir],
+        }, columns=COLS_CUELLOS))
+    return pd.concat(tablas, ignore_index=True).sort_values(
+        ["INTENTO", "FECHA", "RECURSO"], kind="stable"
+    ).reset_index(drop=True)
+
+
+def cuellos_botella(df_plan, config, estado=None, limite_segundos=10.0):
+    """
+    Análisis conjunto sobre un plan ya calculado: aumentos de capacidad por día para colocar
+    todos los lotes que quedaron sin ENTRADA_SAL. 'estado' (EstadoPlanificacion de df_plan)
+    evita reconstruirlo; ver aumentos_capacidad.
+    """
+    if df_plan.empty or "ENTRADA_SAL" not in df_plan.columns:
+        return pd.DataFrame(columns=COLS_CUELLOS)
+    if estado is None:
+        estado = EstadoPlanificacion(df_plan, config)
+    posiciones = np.flatnonzero(df_plan["ENTRADA_SAL"].isna().to_numpy())
+    if len(posiciones) == 0:
+        return pd.DataFrame(columns=COLS_CUELLOS)
+    lotes = LotesCompactos(
+        df_plan, posiciones, estado.cal, config.dias_max_almacen_global, config.dias_max_por_producto
+    )
+    return aumentos_capacidad(estado, lotes, np.arange(len(posiciones)), limite_segundos)
@@ -0,0 +1,58 @@
+"""Reglas de ENTRADA común: factibilidad de todas las fechas candidatas de un grupo en bloque."""
+import numpy as np
+
+
+def entradas_comunes_factibles(estado, candidatos, dia, unds, dso):
+    """
+    Qué ENTRADAS 'candidatos' (offsets) caben para un grupo de lotes que entran el mismo día
+    (arrays dia/unds/dso, en orden de asignación): array bool (2, len(candidatos)) para el
+    1º y el 2º intento. Se evalúa en bloque sobre las series del estado, sin copiarlo:
+      - ENTRADA: carga + unds del grupo <= capacidad del intento
+      - estabilización: stock + ocupación acumulada del grupo <= capacidad en [primer DIA, ENTRADA - 1]
+      - SALIDA: cada lote en su salida (festivo martes-jueves → la menos cargada, contando las
+        de los lotes anteriores del grupo); por día, carga + grupo <= capacidad del intento
+    """
+    c = np.asarray(candidatos, dtype=np.int64)
+    dia = np.asarray(dia, dtype=np.int64)
+    unds = np.asarray(unds, dtype=np.int64)
+    n_c = len(c)
+
+    carga_ent = estado.carga_entrada.valores_en_offsets(c) + int(unds.sum())
+    factible = np.stack([carga_ent <= estado.cap_ent[a].valores_en_offsets(c) for a in (1, 2)])
+
+    # Estabilización: peor exceso acumulado desde el primer DIA del grupo hasta cada candidato - 1
+    ini = int(dia.min())
+    n_dias = int(c.max()) - ini
+    if n_dias > 0:
+        dias = ini + np.arange(n_dias)
+        ocupacion = np.zeros(n_dias + 1, dtype=np.int64)
+        np.add.at(ocupacion, np.minimum(dia - ini, n_dias), unds)
+        exceso = (
+            estado.estab_stock.valores_en_offsets(dias) + np.cumsum(ocupacion)[:-1]
+            - estado.cap_estab.valores_en_offsets(dias)
+        )
+        peor = np.maximum.accumulate(exceso)
+        fin = c - 1 - ini
+        factible &= (fin < 0) | (peor[np.clip(fin, 0, n_dias - 1)] <= 0)
+
+    # SALIDA: lote a lote (la elección depende de los anteriores), en bloque sobre los candidatos
+    fija, ant, sig, depende = estado.salidas.resolver_offsets(c[None, :], np.asarray(dso)[:, None])
+    base = int(min(fija.min(), ant.min()))
+    ancho = int(max(fija.max(), sig.max())) - base + 1
+    carga_sal = estado.carga_salida.valores_en_offsets(base + np.arange(ancho))
+    extra = np.zeros((n_c, ancho), dtype=np.int64)
+    usado = np.zeros((n_c, ancho), dtype=bool)
+    filas = np.arange(n_c)
+    for k in range(len(unds)):
+        salida = fija[k]
+        if depende[k].any():
+            en_ant = carga_sal[ant[k] - base] + extra[filas, ant[k] - base]
+            en_sig = carga_sal[sig[k] - base] + extra[filas, sig[k] - base]
+            salida = np.where(depende[k], np.where(en_ant <= en_sig, ant[k], sig[k]), salida)
+        extra[filas, salida - base] += unds[k]
+        usado[filas, salida - base] = True
+    uso_sal = carga_sal[None, :] + extra
+    for i, a in enumerate((1, 2)):
+        cap = estado.cap_sal[a].valores_en_offsets(base + np.arange(ancho))
+        factible[i] &= ~np.any(usado & (uso_sal > cap[None, :]), axis=1)
+    return factible
@@ -0,0 +1,105 @@
+"""Escenarios what-if: la misma planificación con variantes de parámetros, en paralelo."""
+import dataclasses
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .config import ConfigPlanificacion
+from .estabilizacion import calcular_estabilizacion_diaria
+from .motor import planificar_filas_na
+
+COLS_METRICAS = [
+    "LOTES_NO_ENCAJAN", "MEDIA_DIFERENCIA_DIAS_SAL", "PICO_UTIL_ESTAB_%", "DEFICIT_TOTAL"
+]
+
+# DataFrame compartido por los procesos del pool (se envía una vez por proceso, no por escenario)
+_df_escenarios = None
+
+
+def rejilla_escenarios(variantes):
+    """
+    Producto cartesiano de variantes {parámetro: [valores]} → lista de dicts de cambios.
+    P. ej. {"cap_ent_1": [3100, 3300], "ajuste_festivos": [True, False]} da 4 escenarios.
+    """
+    claves = list(variantes)
+    return [dict(zip(claves, valores)) for valores in itertools.product(*(variantes[k] for k in claves))]
+
+
+def aplicar_escenario(config, cambios):
+    """Copia de config con los cambios del escenario (solo campos de ConfigPlanificacion)."""
+    desconocidas = set(cambios) - set(ConfigPlanificacion.__dataclass_fields__)
+    if desconocidas:
+        raise ValueError(f"Parámetros de escenario desconocidos: {sorted(desconocidas)}")
+    return dataclasses.replace(config, **cambios)
+
+
+def metricas_plan(df_plan, df_sugerencias, df_estab):
+    """
+    Métricas de comparación de una planificación:
+      - LOTES_NO_ENCAJAN: lotes con LOTE_NO_ENCAJA = 'Sí'
+      - MEDIA_DIFERENCIA_DIAS_SAL: media de DIAS_SAL - DIAS_SAL_OPTIMOS de los lotes planificados
+      - PICO_UTIL_ESTAB_%: máxima utilización diaria de la cámara de estabilización
+      - DEFICIT_TOTAL: suma, por lote que no encaja, del menor TOTAL_DEFICIT de sus sugerencias
+    """
+    no_encajan = 0
+    if "LOTE_NO_ENCAJA" in df_plan.columns:
+        no_encajan = int((df_plan["LOTE_NO_ENCAJA"] == "Sí").sum())
+    media_dif = np.nan
+    if "DIFERENCIA_DIAS_SAL" in df_plan.columns:
+        media_dif = pd.to_numeric(df_plan["DIFERENCIA_DIAS_SAL"], errors="coerce").mean()
+    pico = float(df_estab["UTIL_%"].max()) if not df_estab.empty else 0.0
+    deficit = 0
+    if not df_sugerencias.empty:
+        deficit = int(df_sugerencias.groupby("LOTE")["TOTAL_DEFICIT"].min().sum())
+    return {
+        "LOTES_NO_ENCAJAN": no_encajan,
+        "MEDIA_DIFERENCIA_DIAS_SAL": round(float(media_dif), 2) if pd.notna(media_dif) else None,
+        "PICO_UTIL_ESTAB_%": pico,
+        "DEFICIT_TOTAL": deficit,
+    }
+
+
+def _iniciar_proceso(df_plan):
+    global _df_escenarios
+    _df_escenarios = df_plan
+
+
+def _evaluar(config, df_plan=None):
+    df_plan = _df_escenarios if df_plan is None else df_plan
+    df_res, df_sug = planificar_filas_na(df_plan, config)
+    df_estab = calcular_estabilizacion_diaria(df_res, config.estab_cap, config.estab_cap_overrides)
+    return metricas_plan(df_res, df_sug, df_estab)
+
+
+def comparar_escenarios(df_plan, config_base, escenarios, max_procesos=None):
+    """
+    Planifica df_plan con config_base modificada por cada escenario (lista de dicts de cambios, o
+    dict {nombre: cambios}) y devuelve una tabla de comparación: una fila por escenario, con sus
+    cambios y las métricas de metricas_plan. La fila 'Base' (sin cambios) va siempre primera.
+    Los escenarios se reparten en un pool de procesos (max_procesos=1 → secuencial); dentro del
+    pool cada escenario se planifica en secuencial (procesos_planificacion=1), sin pools anidados.
+    """
+    if not isinstance(escenarios, dict):
+        escenarios = {f"Escenario {i + 1}": cambios for i, cambios in enumerate(escenarios)}
+    escenarios = {"Base": {}, **escenarios}
+    configs = [aplicar_escenario(config_base, cambios) for cambios in escenarios.values()]
+
+    max_procesos = min(max_procesos or os.cpu_count() or 1, len(configs))
+    if max_procesos <= 1:
+        metricas = [_evaluar(config, df_plan) for config in configs]
+    else:
+        configs = [dataclasses.replace(config, procesos_planificacion=1) for config in configs]
+        with ProcessPoolExecutor(max_procesos, initializer=_iniciar_proceso, initargs=(df_plan,)) as pool:
+            metricas = list(pool.map(_evaluar, configs))
+
+    filas = []
+    for (nombre, cambios), m in zip(escenarios.items(), metricas):
+        filas.append({
+            "ESCENARIO": nombre,
+            "CAMBIOS": ", ".join(f"{k}={v}" for k, v in cambios.items()) or "—",
+            **m,
+        })
+    return pd.DataFrame(filas, columns=["ESCENARIO", "CAMBIOS"] + COLS_METRICAS)
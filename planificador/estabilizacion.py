@@ -0,0 +1,239 @@
+"""Ocupación diaria de la cámara de estabilización."""
+import numpy as np
+import pandas as pd
+
+from .capacidad import IndiceIntervalos, LineaTemporal
+
+
+COLS_ESTAB = [
+    "FECHA", "ESTAB_UNDS", "ESTAB_PALETA", "ESTAB_JAMON",
+    "CAPACIDAD", "UTIL_%", "EXCESO"
+]
+
+# Movimientos del detalle de un día (qué lotes ocupan estabilización, entran y salen)
+MOVIMIENTOS_DIA = ("ESTABILIZACIÓN", "ENTRADA", "SALIDA")
+COLS_DETALLE_DIA = ["MOVIMIENTO", "LOTE", "PRODUCTO", "UNDS", "DIA", "ENTRADA_SAL", "SALIDA_SAL"]
+
+# Serie de cada lote en el desglose: 0 = ninguna, 1 = paleta, 2 = jamón
+_SERIE_PALETA, _SERIE_JAMON = 1, 2
+
+
+def _intervalos(df_plan):
+    """
+    Intervalos de estabilización por fila, en días desde 1970-01-01: (a, b) con b exclusivo,
+    unds y serie. Las filas que no ocupan estabilización quedan con unds = 0.
+    """
+    n = len(df_plan)
+    inicio = pd.to_datetime(df_plan["DIA"], errors="coerce").dt.normalize()
+    fin = (pd.to_datetime(df_plan["ENTRADA_SAL"], errors="coerce") - pd.Timedelta(days=1)).dt.normalize()
+    if "UNDS" in df_plan.columns:
+        unds = pd.to_numeric(df_plan["UNDS"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+    else:
+        unds = np.zeros(n, dtype=np.int64)
+    if "PRODUCTO" in df_plan.columns:
+        prod = df_plan["PRODUCTO"].astype(str)
+    else:
+        prod = pd.Series("", index=df_plan.index)
+
+    validos = (inicio.notna() & fin.notna() & (fin >= inicio)).to_numpy() & (unds > 0)  # entra el mismo día → no pisa estabilización
+    a = np.zeros(n, dtype=np.int64)
+    b = np.zeros(n, dtype=np.int64)
+    a[validos] = inicio[validos].to_numpy().astype("datetime64[D]").astype(np.int64)
+    b[validos] = fin[validos].to_numpy().astype("datetime64[D]").astype(np.int64) + 1
+    es_paleta = prod.str.startswith("P").to_numpy()
+    es_jamon = prod.str.startswith("J").to_numpy() & ~es_paleta
+    serie = np.where(es_paleta, _SERIE_PALETA, np.where(es_jamon, _SERIE_JAMON, 0))
+    return a, b, np.where(validos, unds, 0), serie
+
+
+def _dias(fechas):
+    """Día (desde 1970-01-01) de cada fecha como intervalo de un día [d, d + 1); (0, 0) si no hay fecha."""
+    fechas = pd.to_datetime(fechas, errors="coerce")
+    validos = fechas.notna().to_numpy()
+    d = np.zeros(len(fechas), dtype=np.int64)
+    d[validos] = fechas[validos].dt.normalize().to_numpy().astype("datetime64[D]").astype(np.int64)
+    return d, np.where(validos, d + 1, 0)
+
+
+def _dia_fila(fecha):
+    """Versión escalar de _dias para una sola fecha."""
+    fecha = pd.to_datetime(fecha, errors="coerce")
+    if pd.isna(fecha):
+        return 0, 0
+    d = int(np.datetime64(fecha.date(), "D").astype(np.int64))
+    return d, d + 1
+
+
+def _intervalo_fila(fila):
+    """Versión escalar de _intervalos para una sola fila (Series o dict)."""
+    inicio = pd.to_datetime(fila.get("DIA"), errors="coerce")
+    entrada = pd.to_datetime(fila.get("ENTRADA_SAL"), errors="coerce")
+    unds = pd.to_numeric(fila.get("UNDS", 0), errors="coerce")
+    unds = 0 if pd.isna(unds) else int(unds)
+    prod = str(fila.get("PRODUCTO", ""))
+    serie = _SERIE_PALETA if prod.startswith("P") else _SERIE_JAMON if prod.startswith("J") else 0
+    if pd.isna(inicio) or pd.isna(entrada) or unds <= 0:
+        return 0, 0, 0, serie
+    a = int(np.datetime64(inicio.date(), "D").astype(np.int64))
+    b = int(np.datetime64((entrada - pd.Timedelta(days=1)).date(), "D").astype(np.int64)) + 1
+    if b <= a:
+        return 0, 0, 0, serie
+    return a, b, unds, serie
+
+
+def _tabla_estabilizacion(origen, carga_total, carga_paleta, carga_jamon, cap, estab_cap_overrides):
+    """DataFrame de ocupación (días con stock > 0) a partir de las series diarias desde 'origen'."""
+    dias_ocupados = np.flatnonzero(carga_total > 0)
+    if len(dias_ocupados) == 0:
+        return pd.DataFrame(columns=COLS_ESTAB)
+    df_estab = pd.DataFrame({
+        "FECHA": (origen + pd.to_timedelta(dias_ocupados, unit="D")).as_unit("ns"),
+        "ESTAB_UNDS": carga_total[dias_ocupados],
+        "ESTAB_PALETA": carga_paleta[dias_ocupados],
+        "ESTAB_JAMON": carga_jamon[dias_ocupados],
+    })
+
+    # Capacidad efectiva por fecha (override si existe)
+    capacidad = np.full(len(df_estab), int(cap), dtype=np.int64)
+    if estab_cap_overrides:
+        ov = pd.Series({pd.to_datetime(k).normalize(): v for k, v in estab_cap_overrides.items()}, dtype="float64")
+        ov_fecha = df_estab["FECHA"].map(ov)
+        capacidad = np.where(ov_fecha.notna(), ov_fecha.fillna(0).to_numpy(), capacidad).astype(np.int64)
+
+    df_estab["CAPACIDAD"] = capacidad
+    df_estab["UTIL_%"] = (df_estab["ESTAB_UNDS"] / df_estab["CAPACIDAD"] * 100).round(1)
+    df_estab["EXCESO"] = (df_estab["ESTAB_UNDS"] - df_estab["CAPACIDAD"]).clip(lower=0).astype(int)
+
+    return df_estab[COLS_ESTAB]
+
+
+def calcular_estabilizacion_diaria(df_plan: pd.DataFrame, cap: int, estab_cap_overrides: dict | None = None) -> pd.DataFrame:
+    """
+    Calcula la ocupación diaria de la cámara de estabilización.
+    Desglosa por tipo de producto:
+      - Paleta: PRODUCTO empieza por 'P'
+      - Jamón : PRODUCTO empieza por 'J'
+    Un lote ocupa estabilización en los días naturales [DIA, ENTRADA_SAL - 1].
+    Permite overrides de capacidad por fecha.
+    Se calcula por columnas: array de diferencias + suma acumulada sobre todos los lotes.
+    """
+    if df_plan.empty or not {"DIA", "ENTRADA_SAL"}.issubset(df_plan.columns):
+        return pd.DataFrame(columns=COLS_ESTAB)
+
+    # Intervalos [DIA, ENTRADA_SAL - 1] de todos los lotes a la vez
+    a, b, unds, serie = _intervalos(df_plan)
+    validos = unds > 0
+    if not validos.any():
+        return pd.DataFrame(columns=COLS_ESTAB)
+    a, b, unds, serie = a[validos], b[validos], unds[validos], serie[validos]
+    base = int(a.min())
+    a, b = a - base, b - base
+    n = int(b.max()) + 1
+
+    # Barrido: array de diferencias + suma acumulada por serie (total, paleta, jamón)
+    def _barrido(pesos):
+        dif = np.zeros(n, dtype=np.int64)
+        np.add.at(dif, a, pesos)
+        np.add.at(dif, b, -pesos)
+        return np.cumsum(dif)[:-1]
+
+    return _tabla_estabilizacion(
+        pd.Timestamp(base, unit="D"),
+        _barrido(unds),
+        _barrido(np.where(serie == _SERIE_PALETA, unds, 0)),
+        _barrido(np.where(serie == _SERIE_JAMON, unds, 0)),
+        cap, estab_cap_overrides,
+    )
+
+
+class OcupacionEstabilizacion:
+    """
+    Ocupación diaria de estabilización persistente y actualizable lote a lote.
+    Guarda la contribución (intervalo, unds, serie) de cada fila por posición; al editar una fila
+    se resta su intervalo anterior y se suma el nuevo, sin recorrer el resto de lotes.
+    tabla() devuelve lo mismo que calcular_estabilizacion_diaria para las filas actuales.
+    Junto a la ocupación guarda los días de ENTRADA/SALIDA de cada fila e índices de intervalos
+    (IndiceIntervalos, se rehacen tras editar) para lotes_dia(): qué lotes ocupan, entran y salen
+    un día sin filtrar todo el plan.
+    """
+
+    def __init__(self, df_plan):
+        n = len(df_plan)
+        if n and {"DIA", "ENTRADA_SAL"}.issubset(df_plan.columns):
+            self._a, self._b, self._unds, self._serie = _intervalos(df_plan)
+        else:
+            self._a = np.zeros(n, dtype=np.int64)
+            self._b = np.zeros(n, dtype=np.int64)
+            self._unds = np.zeros(n, dtype=np.int64)
+            self._serie = np.zeros(n, dtype=np.int64)
+        cols = df_plan.columns
+        vacio = pd.Series(pd.NaT, index=df_plan.index)
+        self._entrada = np.stack(_dias(df_plan["ENTRADA_SAL"] if "ENTRADA_SAL" in cols else vacio))
+        self._salida = np.stack(_dias(df_plan["SALIDA_SAL"] if "SALIDA_SAL" in cols else vacio))
+        self._indices = None
+
+        validos = self._unds > 0
+        base = int(self._a[validos].min()) if validos.any() else 0
+        self.origen = pd.Timestamp(base, unit="D")
+        n_dias = int(self._b[validos].max()) - base + 1 if validos.any() else 1
+        # Series diarias: total, paleta y jamón
+        self.series = [LineaTemporal(self.origen, n_dias) for _ in range(3)]
+        self._base = base
+        if validos.any():
+            a, b, u, serie = self._a[validos] - base, self._b[validos] - base - 1, self._unds[validos], self._serie[validos]
+            self.series[0].sumar_intervalos_offsets(a, b, u)
+            for k in (_SERIE_PALETA, _SERIE_JAMON):
+                m = serie == k
+                self.series[k].sumar_intervalos_offsets(a[m], b[m], u[m])
+
+    def _sumar(self, pos, signo):
+        u = int(self._unds[pos]) * signo
+        if u == 0:
+            return
+        i, j = int(self._a[pos]) - self._base, int(self._b[pos]) - self._base - 1
+        self.series[0].sumar_rango_i(i, j, u)
+        serie = int(self._serie[pos])
+        if serie:
+            self.series[serie].sumar_rango_i(i, j, u)
+
+    def actualizar_fila(self, pos, fila):
+        """Sustituye la contribución de la fila en la posición 'pos' por la de 'fila' (Series con DIA, ENTRADA_SAL, ...)."""
+        self._sumar(pos, -1)
+        self._a[pos], self._b[pos], self._unds[pos], self._serie[pos] = _intervalo_fila(fila)
+        self._sumar(pos, 1)
+        self._entrada[:, pos] = _dia_fila(fila.get("ENTRADA_SAL"))
+        self._salida[:, pos] = _dia_fila(fila.get("SALIDA_SAL"))
+        self._indices = None
+
+    def lotes_dia(self, fecha):
+        """
+        Posiciones de las filas que el día 'fecha' ocupan estabilización ([DIA, ENTRADA_SAL - 1]),
+        entran (ENTRADA_SAL) y salen (SALIDA_SAL): dict MOVIMIENTO → array de posiciones.
+        """
+        if self._indices is None:
+            self._indices = dict(zip(MOVIMIENTOS_DIA, (
+                IndiceIntervalos(self._a, self._b),
+                IndiceIntervalos(*self._entrada),
+                IndiceIntervalos(*self._salida),
+            )))
+        d = int(np.datetime64(pd.Timestamp(fecha).date(), "D").astype(np.int64))
+        return {mov: indice.que_contienen(d) for mov, indice in self._indices.items()}
+
+    def detalle_dia(self, df_plan, fecha):
+        """Tabla (COLS_DETALLE_DIA) de los lotes de lotes_dia(fecha); df_plan son las filas indexadas."""
+        partes = []
+        for mov, pos in self.lotes_dia(fecha).items():
+            parte = df_plan.iloc[pos][[c for c in COLS_DETALLE_DIA[1:] if c in df_plan.columns]]
+            partes.append(parte.assign(MOVIMIENTO=mov))
+        detalle = pd.concat(partes, ignore_index=True)
+        return detalle[[c for c in COLS_DETALLE_DIA if c in detalle.columns]]
+
+    def tabla(self, cap, estab_cap_overrides=None):
+        total, paleta, jamon = self.series
+        i0 = -total._desp
+        j0 = len(total.valores) - total._desp - 1
+        return _tabla_estabilizacion(
+            self.origen + pd.Timedelta(days=i0),
+            total.rango_i(i0, j0), paleta.rango_i(i0, j0), jamon.rango_i(i0, j0),
+            cap, estab_cap_overrides,
+        )
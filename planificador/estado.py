@@ -0,0 +1,182 @@
+"""Estado de capacidad de una planificación, reutilizable entre replanificaciones."""
+import copy
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .calendario import CalendarioHabil, horizonte_plan
+from .capacidad import CapacidadDiaria, IndiceEstabilizacion, LineaTemporal
+from .lotes import SIN_NITRIF, TIPO_OTRO, codificar_tipos, valores_nitrif
+from .salidas import TablaSalidas
+
+
+def _overrides_intento(overrides, campo):
+    return {k: ov[campo] for k, ov in overrides.items() if ov is not None and pd.notna(ov.get(campo))}
+
+
+class EstadoPlanificacion:
+    """
+    Todo lo que el motor deriva de las filas ya planificadas: calendario, cargas de ENTRADA y
+    SALIDA, ocupación de estabilización (con su índice de rango) y perfil TIPO/NITRIF por día
+    de ENTRADA. Se construye una vez a partir de un DataFrame y el motor lo actualiza al asignar.
+    Para replanificar unos pocos lotes basta con retirar() sus contribuciones y volver a
+    planificar solo esos, sin recorrer el resto de filas.
+    Con con_perfil=False el perfil queda vacío hasta llamar a construir_perfil() (el motor lo
+    construye aparte para medirlo como fase propia).
+    Las cargas se acumulan por día natural: la hora de DIA (que conservan ENTRADA/SALIDA) no
+    separa capacidad. La versión anterior sumaba por marca de tiempo exacta, así que lotes del
+    mismo día a horas distintas no compartían capacidad y se podía superar la capacidad diaria;
+    con DIA con hora puede haber ahora más lotes que no encajan.
+    """
+
+    def __init__(self, df_plan, config, con_perfil=True):
+        self.config = copy.deepcopy(config)
+
+        # Calendario laborable precalculado para todo el horizonte del fichero
+        horizonte_ini, horizonte_fin = horizonte_plan(
+            df_plan, config.dias_max_almacen_global, config.dias_max_por_producto
+        )
+        self.cal = CalendarioHabil(config.festivos, horizonte_ini, horizonte_fin)
+        # Resolución de SALIDA (finde/festivos) precalculada y compartida por todas las fases
+        self.salidas = TablaSalidas(self.cal, config.ajuste_finde, config.ajuste_festivos)
+
+        cal = self.cal
+        # Capacidades por día/intento separadas para ENTRADA y SALIDA (arrays sobre el horizonte)
+        self.cap_ent = {
+            1: CapacidadDiaria(cal.origen, cal.n, config.cap_ent_1, _overrides_intento(config.cap_overrides_ent, "CAP1")),
+            2: CapacidadDiaria(cal.origen, cal.n, config.cap_ent_2, _overrides_intento(config.cap_overrides_ent, "CAP2")),
+        }
+        self.cap_sal = {
+            1: CapacidadDiaria(cal.origen, cal.n, config.cap_sal_1, _overrides_intento(config.cap_overrides_sal, "CAP1")),
+            2: CapacidadDiaria(cal.origen, cal.n, config.cap_sal_2, _overrides_intento(config.cap_overrides_sal, "CAP2")),
+        }
+        # Capacidad de estabilización por día (override si existe)
+        self.cap_estab = CapacidadDiaria(
+            cal.origen, cal.n, config.estab_cap,
+            {k: v for k, v in config.estab_cap_overrides.items() if v is not None and pd.notna(v)}
+        )
+
+        # Cargas ya planificadas (se respetan), como series diarias densas sobre el horizonte
+        self.carga_entrada = LineaTemporal(cal.origen, cal.n)
+        self.carga_salida = LineaTemporal(cal.origen, cal.n)
+        self.estab_stock = LineaTemporal(cal.origen, cal.n)
+        # Perfil de ENTRADA por offset de día: (Counter de tipos, Counter de nitrif)
+        self.perfil = {}
+        self.estab_idx = None
+        self._aplicar_cargas(df_plan, 1)
+        # Índice de rango sobre la holgura de estabilización (capacidad - stock)
+        self.estab_idx = IndiceEstabilizacion(self.estab_stock, self.cap_estab)
+        if con_perfil:
+            self.construir_perfil(df_plan)
+
+    def compatible(self, config):
+        """True si el estado se construyó con la misma configuración (si no, hay que reconstruirlo)."""
+        return self.config == config
+
+    def copia(self):
+        """Copia independiente de cargas, estabilización y perfil (calendario y capacidades se comparten)."""
+        nuevo = copy.copy(self)
+        nuevo.carga_entrada = self.carga_entrada.copia()
+        nuevo.carga_salida = self.carga_salida.copia()
+        nuevo.estab_stock = self.estab_stock.copia()
+        nuevo.estab_idx = self.estab_idx.copia(nuevo.estab_stock)
+        nuevo.perfil = {k: (Counter(t), Counter(n)) for k, (t, n) in self.perfil.items()}
+        return nuevo
+
+    # ---- Contribuciones de filas planificadas ----
+    def _aplicar_filas(self, df_filas, signo):
+        """Suma (signo=1) o resta (signo=-1) las cargas, estabilización y perfil de las filas."""
+        self._aplicar_cargas(df_filas, signo)
+        self._aplicar_perfil(df_filas, signo)
+
+    def _aplicar_cargas(self, df_filas, signo):
+        """Cargas de ENTRADA/SALIDA y ocupación de estabilización de las filas (sin perfil)."""
+        cal = self.cal
+        unds = pd.to_numeric(df_filas["UNDS"], errors="coerce").fillna(0).to_numpy(dtype=np.int64) * signo
+
+        con_salida = df_filas["SALIDA_SAL"].notna().to_numpy()
+        self.carga_salida.sumar_en_offsets(cal.offsets_array(df_filas["SALIDA_SAL"][con_salida]), unds[con_salida])
+
+        con_entrada = df_filas["ENTRADA_SAL"].notna().to_numpy()
+        ya = df_filas[con_entrada]
+        u = unds[con_entrada]
+        e_off = cal.offsets_array(ya["ENTRADA_SAL"])
+        self.carga_entrada.sumar_en_offsets(e_off, u)
+
+        # Ocupación de estabilización: [DIA, ENTRADA_SAL - 1]
+        con_dia = ya["DIA"].notna().to_numpy()
+        d_off = cal.offsets_array(ya["DIA"][con_dia])
+        fin_off = e_off[con_dia] - 1
+        if self.estab_idx is None:
+            self.estab_stock.sumar_intervalos_offsets(d_off, fin_off, u[con_dia])
+        else:
+            for a, b, v in zip(d_off.tolist(), fin_off.tolist(), u[con_dia].tolist()):
+                self.estab_idx.sumar_rango_i(a, b, v)
+
+    def _aplicar_perfil(self, df_filas, signo):
+        """Perfil TIPO/NITRIF por día de ENTRADA de las filas con ENTRADA_SAL."""
+        ya = df_filas[df_filas["ENTRADA_SAL"].notna().to_numpy()]
+        e_off = self.cal.offsets_array(ya["ENTRADA_SAL"])
+        tipos = codificar_tipos(ya["TIPO NITRIF"]) if "TIPO NITRIF" in ya.columns else np.full(len(ya), TIPO_OTRO)
+        nitrifs = valores_nitrif(ya["NITRIF"]) if "NITRIF" in ya.columns else np.full(len(ya), SIN_NITRIF)
+        for e, tipo, nitr in zip(e_off.tolist(), tipos.tolist(), nitrifs.tolist()):
+            self.sumar_perfil(e, tipo, nitr, signo)
+
+    def retirar(self, df_plan, indices):
+        """Descuenta las contribuciones de las filas 'indices' de df_plan (lotes que se van a liberar)."""
+        self._aplicar_filas(df_plan.loc[indices], -1)
+
+    # ---- Perfil TIPO/NITRIF por día de ENTRADA ----
+    def construir_perfil(self, df_plan):
+        """Perfil de las filas ya planificadas de df_plan (estado creado con con_perfil=False)."""
+        self._aplicar_perfil(df_plan, 1)
+
+    def sumar_perfil(self, e_off, tipo, nitr, n=1):
+        prof = self.perfil.get(e_off)
+        if prof is None:
+            prof = self.perfil[e_off] = (Counter(), Counter())
+        claves = [(prof[0], tipo)] + ([(prof[1], nitr)] if nitr != SIN_NITRIF else [])
+        for contador, clave in claves:
+            contador[clave] += n
+            if contador[clave] <= 0:
+                del contador[clave]
+        if not prof[0] and not prof[1]:
+            del self.perfil[e_off]
+
+    def coste_perfil(self, e_off, tipo, nitr):
+        """(coste TIPO, coste NITRIF): 1 si el día ya tiene entradas y ninguna coincide con el lote."""
+        prof = self.perfil.get(e_off)
+        if prof is None:
+            return (0, 0)
+        tipo_counts, nitrif_counts = prof
+        cost_tipo = 0 if not tipo_counts or tipo_counts[tipo] > 0 else 1
+        cost_nitr = 0 if not nitrif_counts or (nitr != SIN_NITRIF and nitrif_counts[nitr] > 0) else 1
+        return (cost_tipo, cost_nitr)
+
+    # ---- Confirmación de un lote ----
+    def asignar(self, dia_off, entrada_off, salida_off, unds, tipo, nitr):
+        """Registra un lote asignado (cargas, estabilización [DIA, ENTRADA - 1] y perfil)."""
+        self.carga_entrada.sumar_i(entrada_off, unds)
+        self.carga_salida.sumar_i(salida_off, unds)
+        if entrada_off > dia_off:
+            self.estab_idx.sumar_rango_i(dia_off, entrada_off - 1, unds)
+        self.sumar_perfil(entrada_off, tipo, nitr)
+
+    def asignar_bloque(self, dia_off, entrada_off, salida_off, unds, tipo, nitr):
+        """asignar() de muchos lotes a la vez (arrays): cargas y estabilización vectorizadas."""
+        entrada_off = np.asarray(entrada_off, dtype=np.int64)
+        unds = np.asarray(unds, dtype=np.int64)
+        self.carga_entrada.sumar_en_offsets(entrada_off, unds)
+        self.carga_salida.sumar_en_offsets(salida_off, unds)
+        self.estab_idx.sumar_intervalos_i(dia_off, entrada_off - 1, unds)
+        for e, t, n in zip(entrada_off.tolist(), np.asarray(tipo).tolist(), np.asarray(nitr).tolist()):
+            self.sumar_perfil(e, t, n)
+
+    def desasignar(self, dia_off, entrada_off, salida_off, unds, tipo, nitr):
+        """Deshace asignar() de un lote (mismo coste, por deltas sobre su ventana)."""
+        self.carga_entrada.sumar_i(entrada_off, -unds)
+        self.carga_salida.sumar_i(salida_off, -unds)
+        if entrada_off > dia_off:
+            self.estab_idx.sumar_rango_i(dia_off, entrada_off - 1, -unds)
+        self.sumar_perfil(entrada_off, tipo, nitr, -1)
@@ -0,0 +1,87 @@
+"""Exportación de DataFrames a Excel (bajo demanda y memoizada por contenido)."""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Libros ya generados, por huella del contenido del DataFrame (LRU)
+MAX_ENTRADAS_MEMO = 16
+_memo_excel = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def generar_excel(df_out, filename="archivo.xlsx"):
+    output = BytesIO()
+    df_out.to_excel(output, index=False)
+    output.seek(0)
+    return output
+
+
+def huella_df(df):
+    """Huella SHA-256 del contenido (valores, índice, columnas y dtypes) de un DataFrame."""
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr(list(df.dtypes.astype(str))).encode())
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Celdas no hashables (listas, dicts...): se recurre a su representación en texto
+        h.update(df.to_csv().encode())
+    return h.hexdigest()
+
+
+def excel_bytes(df_out):
+    """Bytes del Excel de df_out; se reutiliza el último generado para el mismo contenido."""
+    clave = huella_df(df_out)
+    with _memo_lock:
+        datos = _memo_excel.get(clave)
+        if datos is not None:
+            _memo_excel.move_to_end(clave)
+            return datos
+
+    datos = generar_excel(df_out).getvalue()
+    with _memo_lock:
+        _memo_excel[clave] = datos
+        while len(_memo_excel) > MAX_ENTRADAS_MEMO:
+            _memo_excel.popitem(last=False)
+    return datos
+
+
+def exportador_excel(df_out):
+    """Callable sin argumentos que genera el Excel solo cuando se pide (p. ej. al pulsar descargar)."""
+    return lambda: excel_bytes(df_out)
+
+
+def _celda(v):
+    if v is None or v is pd.NaT:
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    if isinstance(v, np.generic):
+        return v.item()
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return v
+
+
+def generar_excel_multihoja(hojas):
+    """
+    Un único libro con una hoja por DataFrame ({nombre_hoja: df}), escrito con el modo
+    write-only de openpyxl: las filas se vuelcan en streaming sin mantener las hojas en memoria.
+    """
+    wb = Workbook(write_only=True)
+    for nombre, df in hojas.items():
+        ws = wb.create_sheet(title=str(nombre)[:31])
+        ws.append([str(c) for c in df.columns])
+        for fila in df.itertuples(index=False, name=None):
+            ws.append([_celda(v) for v in fila])
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -0,0 +1,123 @@
+"""Figuras Plotly de la planificación (sin dependencia de Streamlit)."""
+import pandas as pd
+import plotly.graph_objects as go
+
+# Por encima de este nº de lotes el gráfico de entradas/salidas deja de mostrar detalle por lote
+MAX_LOTES_DETALLE = 300
+# Por encima de este nº de fechas la agregación automática pasa a semanas
+MAX_FECHAS_DIARIAS = 120
+
+AGREGACIONES = ("auto", "lote", "dia", "semana")
+
+
+def _largo(df_plan, col_fecha):
+    """Formato largo (FECHA, LOTE, UNDS) de las filas con fecha y unidades."""
+    if col_fecha not in df_plan.columns or "UNDS" not in df_plan.columns:
+        return pd.DataFrame(columns=["FECHA", "LOTE", "UNDS"])
+    df = df_plan.dropna(subset=[col_fecha, "UNDS"])
+    lote = df["LOTE"].astype(str) if "LOTE" in df.columns else df.index.astype(str).to_series(index=df.index)
+    return pd.DataFrame({
+        "FECHA": pd.to_datetime(df[col_fecha]),
+        "LOTE": lote,
+        "UNDS": pd.to_numeric(df["UNDS"], errors="coerce").fillna(0),
+    })
+
+
+def resolver_agregacion(df_plan, agregacion="auto", max_lotes_detalle=MAX_LOTES_DETALLE):
+    """Decide el nivel de detalle: 'lote', 'dia' o 'semana'."""
+    if agregacion != "auto":
+        return agregacion
+    n_lotes = df_plan["LOTE"].nunique() if "LOTE" in df_plan.columns else len(df_plan)
+    if n_lotes <= max_lotes_detalle:
+        return "lote"
+    fechas = pd.concat([
+        pd.to_datetime(df_plan[c], errors="coerce") for c in ("ENTRADA_SAL", "SALIDA_SAL") if c in df_plan.columns
+    ] or [pd.Series(dtype="datetime64[ns]")])
+    return "semana" if fechas.dt.normalize().nunique() > MAX_FECHAS_DIARIAS else "dia"
+
+
+def _agrupar(largo, nivel):
+    """Agrupa el formato largo según el nivel; devuelve (barras, totales por fecha)."""
+    if nivel == "semana":
+        largo = largo.assign(FECHA=largo["FECHA"].dt.to_period("W-SUN").dt.start_time)
+    totales = largo.groupby("FECHA").agg(UNDS=("UNDS", "sum"), LOTES=("LOTE", "nunique")).reset_index()
+    if nivel == "lote":
+        barras = largo.groupby(["FECHA", "LOTE"], as_index=False)["UNDS"].sum()
+        barras = barras[barras["UNDS"] > 0]
+    else:
+        barras = totales
+    return barras, totales
+
+
+def figura_entradas_salidas(df_plan, agregacion="auto", max_lotes_detalle=MAX_LOTES_DETALLE):
+    """
+    Gráfico de entradas (azul) y salidas (naranja) por fecha.
+    Usa un nº constante de trazas (una por serie) en formato largo; el detalle por lote va en el
+    hover (customdata). Con muchos lotes, 'auto' agrega por día o por semana.
+    """
+    nivel = resolver_agregacion(df_plan, agregacion, max_lotes_detalle)
+    series = [
+        ("Entradas", _largo(df_plan, "ENTRADA_SAL"), "entrada", "blue"),
+        ("Salidas", _largo(df_plan, "SALIDA_SAL"), "salida", "orange"),
+    ]
+
+    fig = go.Figure()
+    agrupadas = []
+    for nombre, largo, grupo, color in series:
+        barras, totales = _agrupar(largo, nivel)
+        agrupadas.append((totales, grupo == "entrada"))
+        if barras.empty:
+            continue
+        if nivel == "lote":
+            customdata = barras[["LOTE"]].to_numpy()
+            detalle = "Lote: %{customdata[0]}"
+        else:
+            customdata = barras[["LOTES"]].to_numpy()
+            detalle = "Lotes: %{customdata[0]}"
+        fecha_fmt = "Semana del %{x|%Y-%m-%d}" if nivel == "semana" else "Fecha: %{x|%Y-%m-%d}"
+        fig.add_trace(go.Bar(
+            x=barras["FECHA"],
+            y=barras["UNDS"],
+            customdata=customdata,
+            name=nombre,
+            offsetgroup=grupo,
+            marker_color=color,
+            marker_line_color="white",
+            marker_line_width=1.2 if nivel == "lote" else 0,
+            hovertemplate=fecha_fmt + "<br>" + detalle + "<br>UNDS: %{y}<extra>" + nombre + "</extra>",
+        ))
+
+    max_y = max([int(t["UNDS"].max()) for t, _ in agrupadas if not t.empty] + [0]) or 1
+    label_shift = pd.Timedelta(days=2) if nivel == "semana" else pd.Timedelta(hours=8)
+
+    # Etiquetas de total (unds y nº de lotes) por fecha, construidas por columnas
+    annotations = []
+    for totales, is_entry in agrupadas:
+        x_pos = totales["FECHA"] - label_shift if is_entry else totales["FECHA"] + label_shift
+        y_base = totales["UNDS"].clip(lower=max_y * 0.02)
+        for x, y, u, n in zip(x_pos, y_base, totales["UNDS"], totales["LOTES"]):
+            annotations.append(dict(
+                x=x, y=y, xref="x", yref="y", text=f"<b>{int(u)}</b>",
+                showarrow=False, yshift=28, align="center", font=dict(size=13, color="black")
+            ))
+            annotations.append(dict(
+                x=x, y=y, xref="x", yref="y", text=f"{int(n)} lotes",
+                showarrow=False, yshift=12, align="center", font=dict(size=11, color="gray")
+            ))
+
+    ticks = pd.Index(sorted(set().union(*[t["FECHA"].tolist() for t, _ in agrupadas])))
+    fig.update_layout(
+        barmode="relative",
+        xaxis_title="Semana" if nivel == "semana" else "Fecha",
+        yaxis_title="Unidades",
+        xaxis=dict(
+            tickmode="array",
+            tickvals=ticks,
+            tickformat="%d %b" if nivel == "semana" else "%d %b (%a)"
+        ),
+        bargap=0.25,
+        bargroupgap=0.12,
+        annotations=annotations,
+    )
+    fig.update_yaxes(range=[0, max_y * 1.25])
+    return fig
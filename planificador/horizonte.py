@@ -0,0 +1,105 @@
+"""Planificación por horizonte rodante: ventanas de recepción planificadas en orden sobre un estado arrastrado."""
+import dataclasses
+
+import numpy as np
+import pandas as pd
+
+from .estado import EstadoPlanificacion
+from .motor import planificar_filas_na
+from .sugerencias import COLS_SUGERENCIAS, ordenar_sugerencias
+
+# Días de recepción por ventana por defecto (varias veces dias_max_almacen + DIAS_SAL_OPTIMOS)
+DIAS_VENTANA_DEFECTO = 28
+
+
+def ventanas_horizonte(df_plan, dias_ventana=DIAS_VENTANA_DEFECTO):
+    """
+    Ventanas consecutivas [inicio, fin) de 'dias_ventana' días naturales que cubren los DIA del
+    plan, desde el primer DIA. Lista de pares de Timestamps (vacía si no hay DIA).
+    """
+    dias = pd.to_datetime(df_plan["DIA"], errors="coerce").dropna().dt.normalize()
+    if dias.empty:
+        return []
+    inicio, fin = dias.min(), dias.max()
+    paso = pd.Timedelta(days=max(int(dias_ventana), 1))
+    n = (fin - inicio) // paso + 1
+    return [(inicio + i * paso, inicio + (i + 1) * paso) for i in range(n)]
+
+
+def filas_ventana(df_plan, inicio, fin):
+    """
+    Máscara de las filas cuya actividad [DIA, SALIDA_SAL] (o hasta ENTRADA_SAL/DIA si faltan)
+    se solapa con [inicio, fin): los lotes de la ventana y los de ventanas anteriores que aún
+    ocupan estabilización, entran o salen en ella. Con ellas, ocupación y cargas de los días
+    de la ventana son completas.
+    """
+    dia = pd.to_datetime(df_plan["DIA"], errors="coerce").dt.normalize()
+    ultimo = dia
+    for col in ("ENTRADA_SAL", "SALIDA_SAL"):
+        if col in df_plan.columns:
+            ultimo = pd.concat([ultimo, pd.to_datetime(df_plan[col], errors="coerce").dt.normalize()], axis=1).max(axis=1)
+    return ((dia < fin) & (ultimo >= inicio)).to_numpy()
+
+
+def planificar_horizonte_rodante(df_plan, config, dias_ventana=DIAS_VENTANA_DEFECTO,
+                                 instrumentacion=None, estado=None, progreso=None):
+    """
+    Como planificar_filas_na, pero por ventanas de recepción (ventanas_horizonte): los pendientes
+    de cada ventana se planifican solos, en orden, sobre un único EstadoPlanificacion que arrastra
+    las cargas de las ventanas ya cerradas (un lote solo interactúa con los de los
+    dias_max_almacen + DIAS_SAL_OPTIMOS días siguientes, que son los que recoge el estado).
+    Las ventanas cerradas no se vuelven a tocar. Así el coste de cada paso depende del tamaño
+    de la ventana y no del horizonte del fichero.
+    Las reglas de ENTRADA común se aplican antes, una vez y sobre todo el fichero (un grupo
+    puede abarcar varias ventanas), y las ventanas se planifican sin ellas. Con el motor voraz
+    el plan es el mismo que en una sola pasada (el orden por DIA se conserva); la optimización
+    y la mejora local actúan dentro de cada ventana, y las sugerencias se calculan contra el
+    estado al cerrar su ventana. Las filas sin DIA se planifican con la primera ventana.
+    'estado' (de df_plan completo) evita reconstruirlo y se actualiza; 'progreso(fraccion, texto)'
+    recibe el avance por ventana. Devuelve (df_planificado, df_sugerencias).
+    """
+    df_corr = df_plan.copy()
+    if "LOTE_NO_ENCAJA" not in df_corr.columns:
+        df_corr["LOTE_NO_ENCAJA"] = pd.NA
+    if estado is None:
+        estado = EstadoPlanificacion(df_corr, config)
+    if config.reglas_entrada_comun:
+        df_corr, _ = planificar_filas_na(df_corr, config, instrumentacion, estado=estado, solo_reglas=True)
+        config = dataclasses.replace(config, reglas_entrada_comun=[])
+
+    ventanas = ventanas_horizonte(df_corr, dias_ventana) or [(pd.NaT, pd.NaT)]
+    pendientes = df_corr["ENTRADA_SAL"].isna().to_numpy()
+    dia = pd.to_datetime(df_corr["DIA"], errors="coerce").dt.normalize()
+    # Ventana de cada fila (por su DIA); sin DIA → la primera
+    if pd.notna(ventanas[0][0]):
+        n_ventana = ((dia - ventanas[0][0]) // (ventanas[0][1] - ventanas[0][0])).fillna(0).to_numpy(dtype=np.int64)
+    else:
+        n_ventana = np.zeros(len(df_corr), dtype=np.int64)
+
+    posiciones = [np.flatnonzero(~pendientes)]
+    partes = [df_corr.iloc[posiciones[0]]]
+    sugerencias = []
+    for i, (inicio, fin) in enumerate(ventanas):
+        if progreso is not None:
+            texto = f"Ventana {i + 1}/{len(ventanas)}"
+            if pd.notna(inicio):
+                texto += f": {inicio:%Y-%m-%d} → {fin - pd.Timedelta(days=1):%Y-%m-%d}"
+            progreso(i / len(ventanas), texto)
+        pos = np.flatnonzero(pendientes & (n_ventana == i))
+        if len(pos) == 0:
+            continue
+        df_ventana, df_sug = planificar_filas_na(df_corr.iloc[pos], config, instrumentacion, estado=estado)
+        posiciones.append(pos)
+        partes.append(df_ventana)
+        if not df_sug.empty:
+            sugerencias.append(df_sug)
+    if progreso is not None:
+        progreso(1.0, f"{len(ventanas)} ventana(s) planificadas")
+
+    # Reensamblado en el orden original de las filas
+    df_out = pd.concat(partes).iloc[np.argsort(np.concatenate(posiciones), kind="stable")]
+    if "DIAS_SAL" in df_out.columns and "DIAS_SAL_OPTIMOS" in df_out.columns:
+        df_out["DIFERENCIA_DIAS_SAL"] = df_out["DIAS_SAL"] - df_out["DIAS_SAL_OPTIMOS"]
+    if not sugerencias:
+        return df_out, pd.DataFrame(columns=COLS_SUGERENCIAS)
+    return df_out, ordenar_sugerencias(pd.concat(sugerencias, ignore_index=True))
@@ -0,0 +1,102 @@
+"""Lectura y normalización del Excel de lotes, con caché por huella del fichero."""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+# Alias básicos por si vienen con espacios/guiones bajos
+ALIAS_COLUMNAS = {
+    "DIAS SAL OPTIMOS": "DIAS_SAL_OPTIMOS",
+    "DIAS_SAL_OPTIMOS": "DIAS_SAL_OPTIMOS",
+    "ENTRADA SAL": "ENTRADA_SAL",
+    "SALIDA SAL": "SALIDA_SAL"
+}
+
+# Caché en memoria (LRU) de DataFrames ya normalizados, por huella SHA-256 del Excel
+MAX_ENTRADAS_CACHE = 8
+_cache_lotes = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def normalizar_lotes(df):
+    """Aplica alias de columnas y normaliza tipos (fechas y UNDS) del DataFrame de lotes."""
+    for a, target in ALIAS_COLUMNAS.items():
+        if a in df.columns and target not in df.columns:
+            df.rename(columns={a: target}, inplace=True)
+
+    for col in ["DIA", "ENTRADA_SAL", "SALIDA_SAL"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    if "UNDS" in df.columns:
+        df["UNDS"] = pd.to_numeric(df["UNDS"], errors="coerce").fillna(0).astype(int)
+    return df
+
+
+def huella_bytes(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+def _leer_sidecar(ruta):
+    try:
+        return pd.read_parquet(ruta)
+    except Exception:
+        # Sidecar ilegible o sin motor Parquet (pyarrow): se vuelve a leer el Excel
+        return None
+
+
+def _escribir_sidecar(df, ruta):
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(ruta, index=False)
+    except Exception:
+        # Sin motor Parquet o columnas con tipos mixtos: el sidecar es opcional
+        pass
+
+
+def leer_lotes_bytes(datos, cache_dir=None, max_entradas=MAX_ENTRADAS_CACHE):
+    """
+    Lee y normaliza un Excel de lotes a partir de sus bytes.
+    El resultado se cachea por huella del fichero (LRU de 'max_entradas' en memoria) y, si se
+    indica 'cache_dir', también como sidecar Parquet <huella>.parquet para relecturas entre procesos.
+    Devuelve siempre una copia, el llamador puede modificarla.
+    """
+    clave = huella_bytes(datos)
+    with _cache_lock:
+        df = _cache_lotes.get(clave)
+        if df is not None:
+            _cache_lotes.move_to_end(clave)
+            return df.copy()
+
+    ruta_sidecar = Path(cache_dir) / f"{clave}.parquet" if cache_dir else None
+    if ruta_sidecar is not None and ruta_sidecar.exists():
+        df = _leer_sidecar(ruta_sidecar)
+    if df is None:
+        df = normalizar_lotes(pd.read_excel(BytesIO(datos), engine="openpyxl"))
+        if ruta_sidecar is not None:
+            _escribir_sidecar(df, ruta_sidecar)
+
+    with _cache_lock:
+        _cache_lotes[clave] = df
+        _cache_lotes.move_to_end(clave)
+        while len(_cache_lotes) > max(int(max_entradas), 0):
+            _cache_lotes.popitem(last=False)
+    return df.copy()
+
+
+def leer_lotes_excel(origen, cache_dir=None):
+    """Lee un Excel de lotes (ruta, bytes o buffer) y lo devuelve normalizado."""
+    if isinstance(origen, (bytes, bytearray)):
+        datos = bytes(origen)
+    elif hasattr(origen, "read"):
+        datos = origen.read()
+    else:
+        datos = Path(origen).read_bytes()
+    return leer_lotes_bytes(datos, cache_dir=cache_dir)
+
+
+def limpiar_cache_lotes():
+    with _cache_lock:
+        _cache_lotes.clear()
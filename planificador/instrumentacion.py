@@ -0,0 +1,85 @@
+"""Instrumentación opcional del planificador: tiempos por fase y contadores de operaciones."""
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+
+class Instrumentacion:
+    """
+    Acumula tiempo y nº de llamadas por fase y contadores de operaciones de una planificación.
+    Si el planificador recibe instrumentacion=None no se mide nada (ni se envuelve ningún método).
+    """
+
+    def __init__(self):
+        self.fases = {}
+        self.contadores = Counter()
+        self._envueltos = []
+
+    @contextmanager
+    def fase(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            f = self.fases.setdefault(nombre, {"segundos": 0.0, "llamadas": 0})
+            f["segundos"] += time.perf_counter() - t0
+            f["llamadas"] += 1
+
+    def contar(self, nombre, n=1):
+        self.contadores[nombre] += n
+
+    def contar_llamadas(self, obj, metodos, nombre):
+        """Envuelve (solo en esta instancia) los métodos indicados de obj para contar sus llamadas en 'nombre'."""
+        for metodo in metodos:
+            original = getattr(obj, metodo)
+
+            def envoltura(*args, _original=original, **kwargs):
+                self.contadores[nombre] += 1
+                return _original(*args, **kwargs)
+
+            setattr(obj, metodo, envoltura)
+            self._envueltos.append((obj, metodo))
+
+    def restaurar(self):
+        """Quita las envolturas de contar_llamadas (los objetos vuelven a sus métodos originales)."""
+        for obj, metodo in reversed(self._envueltos):
+            obj.__dict__.pop(metodo, None)
+        self._envueltos = []
+
+    def medir_funcion(self, nombre, funcion):
+        """Envuelve funcion para acumular su tiempo y nº de llamadas en la fase 'nombre'."""
+        def envoltura(*args, **kwargs):
+            with self.fase(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+
+    def informe(self):
+        """DataFrame con una fila por fase (SEGUNDOS, LLAMADAS) y por contador (LLAMADAS)."""
+        filas = [
+            {"TIPO": "fase", "NOMBRE": k, "SEGUNDOS": round(v["segundos"], 4), "LLAMADAS": v["llamadas"]}
+            for k, v in self.fases.items()
+        ]
+        filas += [
+            {"TIPO": "contador", "NOMBRE": k, "SEGUNDOS": None, "LLAMADAS": int(v)}
+            for k, v in self.contadores.items()
+        ]
+        return pd.DataFrame(filas, columns=["TIPO", "NOMBRE", "SEGUNDOS", "LLAMADAS"])
+
+    def a_dict(self):
+        return {
+            "fases": {k: {"segundos": round(v["segundos"], 6), "llamadas": v["llamadas"]} for k, v in self.fases.items()},
+            "contadores": {k: int(v) for k, v in self.contadores.items()},
+        }
+
+    def a_json(self):
+        return json.dumps(self.a_dict(), ensure_ascii=False, indent=2)
+
+
+def medidor_fases(instrumentacion):
+    """Devuelve fase(nombre) -> context manager; sin instrumentación, un contexto vacío."""
+    if instrumentacion is None:
+        return lambda nombre: nullcontext()
+    return instrumentacion.fase
@@ -0,0 +1,144 @@
+"""Almacén columnar compacto de los lotes que maneja el motor (arrays NumPy en lugar de filas)."""
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Códigos de TIPO NITRIF normalizado
+TIPOS = ("IBÉRICO", "BLANCO", "OTRO")
+TIPO_OTRO = 2
+# Código de NITRIF no numérico / ausente
+SIN_NITRIF = np.iinfo(np.int64).min
+
+
+def normalizar_tipo(v):
+    s = str(v).strip().upper()
+    if "IBER" in s:
+        return "IBÉRICO"
+    if "BLAN" in s:
+        return "BLANCO"
+    return "OTRO"
+
+
+def normalizar_nitrif(v):
+    try:
+        return int(v)
+    except Exception:
+        return None
+
+
+def codificar_tipos(serie):
+    """Código (índice en TIPOS) de cada valor de TIPO NITRIF; se normaliza una vez por valor distinto."""
+    codigos, uniques = pd.factorize(serie, use_na_sentinel=False)
+    por_valor = np.array([TIPOS.index(normalizar_tipo(v)) for v in uniques], dtype=np.int64)
+    return por_valor[codigos] if len(por_valor) else np.zeros(len(serie), dtype=np.int64)
+
+
+def valores_nitrif(serie):
+    """NITRIF normalizado (entero) de cada valor; SIN_NITRIF si no es numérico."""
+    codigos, uniques = pd.factorize(serie, use_na_sentinel=False)
+    por_valor = []
+    for v in uniques:
+        n = normalizar_nitrif(v)
+        por_valor.append(SIN_NITRIF if n is None else n)
+    por_valor = np.array(por_valor, dtype=np.int64)
+    return por_valor[codigos] if len(por_valor) else np.full(len(serie), SIN_NITRIF, dtype=np.int64)
+
+
+class LotesCompactos:
+    """
+    Lotes pendientes de df_plan como arrays paralelos (uno por atributo), con las fechas ya
+    convertidas a offsets de día del calendario. El motor trabaja sobre estos arrays y los
+    resultados (offsets de ENTRADA/SALIDA y estado) se vuelcan al DataFrame de una vez.
+    """
+
+    def __init__(self, df_corr, posiciones, cal, dias_max_almacen_global, dias_max_por_producto):
+        df = df_corr.iloc[posiciones]
+        n = len(df)
+        self.n = n
+        self.posiciones = np.asarray(posiciones, dtype=np.int64)
+        self.dia = pd.to_datetime(df["DIA"]).to_numpy()
+        self.dia_off = cal.offsets_array(df["DIA"])
+        # Primer día hábil posible de ENTRADA
+        self.ini_off = cal.habil_o_siguiente_offsets(self.dia_off)
+        self.unds = df["UNDS"].to_numpy(dtype=np.float64).astype(np.int64)
+        self.dso = df["DIAS_SAL_OPTIMOS"].to_numpy(dtype=np.float64).astype(np.int64)
+
+        if "PRODUCTO" in df.columns:
+            self.producto = df["PRODUCTO"].to_numpy(dtype=object)
+            self.producto_str = df["PRODUCTO"].astype(str).to_numpy(dtype=object)
+        else:
+            self.producto = np.full(n, None, dtype=object)
+            self.producto_str = None
+        # Días máximos de almacén por lote (float: NaN si el override del producto está vacío)
+        self.dias_max = pd.to_numeric(
+            pd.Series(self.producto).map(lambda p: dias_max_por_producto.get(p, dias_max_almacen_global)),
+            errors="coerce"
+        ).to_numpy(dtype=np.float64)
+
+        self.lote = df["LOTE"].to_numpy(dtype=object) if "LOTE" in df.columns else df.index.to_numpy(dtype=object)
+        self.tipo = codificar_tipos(df["TIPO NITRIF"]) if "TIPO NITRIF" in df.columns else np.full(n, TIPO_OTRO, dtype=np.int64)
+        self.nitrif = valores_nitrif(df["NITRIF"]) if "NITRIF" in df.columns else np.full(n, SIN_NITRIF, dtype=np.int64)
+
+        # Resultado: offsets de ENTRADA/SALIDA (-1 = sin asignar), entrada normalizada (reglas de
+        # entrada común, sin hora) y LOTE_NO_ENCAJA ("" = sin tocar)
+        self.entrada_off = np.full(n, -1, dtype=np.int64)
+        self.salida_off = np.full(n, -1, dtype=np.int64)
+        self.entrada_normalizada = np.zeros(n, dtype=bool)
+        self.no_encaja = np.full(n, "", dtype=object)
+
+    def copia(self):
+        """Copia con resultados independientes (los atributos de entrada se comparten)."""
+        nuevo = copy.copy(self)
+        nuevo.entrada_off = self.entrada_off.copy()
+        nuevo.salida_off = self.salida_off.copy()
+        nuevo.entrada_normalizada = self.entrada_normalizada.copy()
+        nuevo.no_encaja = self.no_encaja.copy()
+        return nuevo
+
+    def asignar(self, k, entrada_off, salida_off, normalizada=False):
+        self.entrada_off[k] = entrada_off
+        self.salida_off[k] = salida_off
+        self.entrada_normalizada[k] = normalizada
+        self.no_encaja[k] = "No"
+
+    def desasignar(self, k):
+        """Deshace asignar(k): el lote vuelve a quedar pendiente."""
+        self.entrada_off[k] = -1
+        self.salida_off[k] = -1
+        self.entrada_normalizada[k] = False
+        self.no_encaja[k] = ""
+
+    def pendientes(self):
+        return self.entrada_off < 0
+
+    def volcar(self, df_corr, cal):
+        """Escribe en df_corr (en bloque) ENTRADA/SALIDA, DIAS_SAL, DIAS_ALMACENADOS y LOTE_NO_ENCAJA."""
+        tocados = self.no_encaja != ""
+        if tocados.any():
+            _escribir(df_corr, self.posiciones[tocados], "LOTE_NO_ENCAJA", self.no_encaja[tocados])
+
+        asignados = np.flatnonzero(self.entrada_off >= 0)
+        if len(asignados) == 0:
+            return
+        dia = pd.DatetimeIndex(self.dia[asignados])
+        e_off = self.entrada_off[asignados]
+        # Las entradas del bucle conservan la hora de DIA; las de entrada común van a medianoche
+        entrada = (dia + pd.to_timedelta(e_off - self.dia_off[asignados], unit="D")).where(
+            ~self.entrada_normalizada[asignados],
+            cal.origen + pd.to_timedelta(e_off, unit="D"),
+        )
+        salida = entrada + pd.to_timedelta(self.salida_off[asignados] - e_off, unit="D")
+
+        pos = self.posiciones[asignados]
+        _escribir(df_corr, pos, "ENTRADA_SAL", entrada)
+        _escribir(df_corr, pos, "SALIDA_SAL", salida)
+        _escribir(df_corr, pos, "DIAS_SAL", (salida - entrada).days.to_numpy())
+        _escribir(df_corr, pos, "DIAS_ALMACENADOS", (entrada - dia).days.to_numpy())
+
+
+def _escribir(df, posiciones, col, valores):
+    """Asignación posicional en bloque; crea la columna (float, NaN) si no existe."""
+    if col not in df.columns:
+        df[col] = np.nan
+    df.iloc[posiciones, df.columns.get_loc(col)] = valores
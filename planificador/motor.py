@@ -0,0 +1,438 @@
+"""Motor de planificación de lotes (ENTRADA/SALIDA de salazón y estabilización)."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .busqueda_local import MejoraLocal
+from .componentes import componentes_independientes
+from .config import MOTORES_ASIGNACION
+from .entrada_comun import entradas_comunes_factibles
+from .estado import EstadoPlanificacion
+from .instrumentacion import Instrumentacion, medidor_fases
+from .lotes import LotesCompactos
+from .optimizacion import ModeloAsignacion, solver_disponible
+from .sugerencias import COLS_SUGERENCIAS, ordenar_sugerencias, sugerencias_no_encajan
+
+
+# Lotes mínimos de una componente independiente para mandarla al pool de procesos: arrancar los
+# procesos y aplicar sus resultados cuesta del orden del voraz sobre unos miles de lotes. Las
+# componentes menores se planifican en el proceso principal mientras trabaja el pool.
+MIN_LOTES_COMPONENTE = 5000
+# Bloques de componentes por proceso (reparto de carga entre procesos)
+BLOQUES_POR_PROCESO = 4
+
+
+def asignar_voraz(est, lts, k):
+    """
+    Intento voraz del lote k sobre (est, lts): mejor ENTRADA por TIPO/NITRIF en el 1º intento y,
+    si no cabe, en el 2º; si la hay, se asigna en ambos. Se parametriza por estado para poder
+    probarlo sobre copias o en otro proceso. Devuelve (asignado, candidatos evaluados).
+    """
+    cal, salidas = est.cal, est.salidas
+    carga_ent, carga_sal, idx_estab = est.carga_entrada, est.carga_salida, est.estab_idx
+    dia_off = int(lts.dia_off[k])
+    unds = int(lts.unds[k])
+    dias_sal_optimos = int(lts.dso[k])
+    limite = dia_off + lts.dias_max[k]
+    tipo_lote = int(lts.tipo[k])
+    nitr_lote = int(lts.nitrif[k])
+    n_candidatos = 0
+
+    for attempt in [1, 2]:
+        cap_ent_i = est.cap_ent[attempt]
+        cap_sal_i = est.cap_sal[attempt]
+        mejor = None
+        entrada = int(lts.ini_off[k])
+        while entrada <= limite:
+            n_candidatos += 1
+            if carga_ent.get_i(entrada) + unds <= cap_ent_i.get_i(entrada):
+                if entrada <= dia_off or idx_estab.cabe_i(dia_off, entrada - 1, unds):
+                    salida = salidas.resolver_i(entrada, dias_sal_optimos, carga_sal)
+                    if carga_sal.get_i(salida) + unds <= cap_sal_i.get_i(salida):
+                        # Candidato válido; score por TIPO/NITRIF y, a igualdad, la fecha más temprana
+                        coste = est.coste_perfil(entrada, tipo_lote, nitr_lote)
+                        if mejor is None or coste < mejor[0]:
+                            mejor = (coste, entrada, salida)
+                            if coste == (0, 0):
+                                # Ningún candidato posterior puede mejorar a este
+                                break
+
+            entrada = cal.siguiente_habil_i(entrada)
+
+        if mejor is not None:
+            _, entrada_sel, salida_sel = mejor
+            lts.asignar(k, entrada_sel, salida_sel)
+            est.asignar(dia_off, entrada_sel, salida_sel, unds, tipo_lote, nitr_lote)
+            return True, n_candidatos
+    return False, n_candidatos
+
+
+def _contar_llamadas_estado(instrumentacion, estado):
+    """Contadores de las operaciones del bucle voraz (calendario, SALIDA, rango de estabilización)."""
+    instrumentacion.contar_llamadas(
+        estado.cal, ["es_habil", "es_habil_i", "siguiente_habil", "siguiente_habil_i", "anterior_habil"],
+        "consultas_calendario"
+    )
+    instrumentacion.contar_llamadas(estado.salidas, ["resolver_i"], "resoluciones_salida")
+    instrumentacion.contar_llamadas(estado.estab_idx, ["cabe_i"], "chequeos_rango_estab")
+
+
+# ---- Pool de procesos para componentes independientes ----
+# Estado y lotes de cada proceso (se envían una vez por proceso, no por bloque)
+_estado_pool = None
+_lotes_pool = None
+_instrumentacion_pool = None
+
+
+def _iniciar_proceso(estado, lotes, contar=False):
+    global _estado_pool, _lotes_pool, _instrumentacion_pool
+    _estado_pool, _lotes_pool = estado, lotes
+    if contar:
+        _instrumentacion_pool = Instrumentacion()
+        _contar_llamadas_estado(_instrumentacion_pool, estado)
+
+
+def _asignar_bloque(ks):
+    """
+    Voraz sobre un bloque de componentes (en su orden); devuelve ([(k, entrada, salida)],
+    candidatos, contadores del bloque) para sumarlos en el proceso principal.
+    """
+    asignados, n_candidatos = [], 0
+    for k in ks.tolist():
+        asignado, n = asignar_voraz(_estado_pool, _lotes_pool, k)
+        n_candidatos += n
+        if asignado:
+            asignados.append((k, int(_lotes_pool.entrada_off[k]), int(_lotes_pool.salida_off[k])))
+    contadores = {}
+    if _instrumentacion_pool is not None:
+        contadores = dict(_instrumentacion_pool.contadores)
+        _instrumentacion_pool.contadores.clear()
+    return asignados, n_candidatos, contadores
+
+
+def _bloques(componentes, n_bloques):
+    """Reparte las componentes en n_bloques de tamaño parecido (la mayor al bloque más ligero)."""
+    bloques = [[] for _ in range(n_bloques)]
+    carga = np.zeros(n_bloques, dtype=np.int64)
+    for c in sorted(componentes, key=len, reverse=True):
+        b = int(np.argmin(carga))
+        bloques[b].append(c)
+        carga[b] += len(c)
+    return [np.concatenate(b) for b in bloques if b]
+
+
+# -------------------------------
+# Planificador (GLOBAL, overrides por PRODUCTO y estabilización + overrides por FECHA entrada/salida/estab)
+# -------------------------------
+def planificar_filas_na(df_plan, config, instrumentacion=None, estado=None, progreso=None, solo_reglas=False):
+    """
+    Planifica las filas sin ENTRADA_SAL de df_plan respetando las ya planificadas.
+    Devuelve (df_planificado, df_sugerencias).
+    Con 'instrumentacion' (Instrumentacion) se registran tiempos por fase y contadores.
+    'estado' (EstadoPlanificacion) permite reutilizar el estado de capacidad de una planificación
+    anterior: debe reflejar exactamente las filas ya planificadas de df_plan (p. ej. tras retirar()
+    los lotes liberados) y se actualiza con los lotes asignados.
+    Con config.motor_asignacion = "optimizacion" los pendientes se asignan con un MILP global
+    (ver optimizacion.ModeloAsignacion) en lugar del paso voraz lote a lote; sin highspy
+    instalado se usa el paso voraz.
+    Con config.mejora_local se añade una búsqueda local (busqueda_local.MejoraLocal) antes de
+    generar las sugerencias; 'progreso(fraccion, texto)' recibe su avance.
+    Con solo_reglas=True solo se aplican las reglas de ENTRADA común y el resto de pendientes
+    se queda sin planificar (sin sugerencias); así el horizonte rodante fija los grupos sobre
+    todo el fichero antes de recorrer las ventanas.
+    """
+    if config.motor_asignacion not in MOTORES_ASIGNACION:
+        raise ValueError(f"Motor de asignación desconocido: {config.motor_asignacion!r} (válidos: {MOTORES_ASIGNACION})")
+    fase = medidor_fases(instrumentacion)
+
+    dias_max_almacen_global = config.dias_max_almacen_global
+    dias_max_por_producto = config.dias_max_por_producto
+
+    df_corr = df_plan.copy()
+
+    # Asegurar columnas auxiliares
+    for col in ["LOTE_NO_ENCAJA"]:
+        if col not in df_corr.columns:
+            df_corr[col] = pd.NA
+
+    nuevo_estado = estado is None
+    with fase("preparacion"):
+        if nuevo_estado:
+            estado = EstadoPlanificacion(df_corr, config, con_perfil=False)
+        cal = estado.cal
+        salidas = estado.salidas
+        carga_entrada, carga_salida = estado.carga_entrada, estado.carga_salida
+        estab_idx = estado.estab_idx
+        cap_ent, cap_sal = estado.cap_ent, estado.cap_sal
+
+        if instrumentacion is not None:
+            _contar_llamadas_estado(instrumentacion, estado)
+
+        # Lotes pendientes como arrays compactos (offsets de día)
+        lotes = LotesCompactos(
+            df_corr, np.flatnonzero(df_corr["ENTRADA_SAL"].isna().to_numpy()),
+            cal, dias_max_almacen_global, dias_max_por_producto
+        )
+
+    # Perfil TIPO/NITRIF por día de ENTRADA de las filas ya planificadas (un estado recibido ya lo trae)
+    if nuevo_estado:
+        with fase("perfiles"):
+            estado.construir_perfil(df_corr)
+
+    # REGLAS ESPECIALES DE ENTRADA COMÚN (config.reglas_entrada_comun): todos los lotes pendientes
+    # del grupo al MISMO día de ENTRADA; si no cabe, sus alternativas por separado
+    def _aplicar_entrada_comun_para_grupo(codigos, marcar_si_falla=False):
+        if lotes.producto_str is None:
+            return False
+
+        en_grupo = np.isin(lotes.producto_str, codigos)
+        sel = np.flatnonzero(en_grupo & lotes.pendientes())
+        if len(sel) == 0:
+            return False
+
+        # Fecha ya usada por el grupo (filas planificadas o asignadas por una regla anterior)
+        ya_grupo = df_corr["ENTRADA_SAL"].notna() & df_corr["PRODUCTO"].astype(str).isin(codigos)
+        fechas_existentes = np.concatenate([
+            cal.offsets_array(df_corr.loc[ya_grupo, "ENTRADA_SAL"]),
+            lotes.entrada_off[en_grupo & ~lotes.pendientes()],
+        ])
+        fecha_preferente = int(fechas_existentes.min()) if len(fechas_existentes) else None
+
+        dia_g = lotes.dia_off[sel]
+        dias_max_g = lotes.dias_max[sel]
+
+        inicio_comun = int(lotes.ini_off[sel].max())
+        if np.isnan(dias_max_g).any():
+            limite_comun = inicio_comun - 1
+        else:
+            limite_comun = int((dia_g + dias_max_g.astype(np.int64)).min())
+        if inicio_comun > limite_comun:
+            if marcar_si_falla:
+                lotes.no_encaja[sel] = "Sí"
+            return False
+
+        # Candidatas: la fecha ya usada por el grupo (si está en la ventana) y los hábiles de la ventana
+        candidatos = np.arange(inicio_comun, limite_comun + 1)
+        candidatos = candidatos[cal.es_habil_offsets(candidatos)]
+        if fecha_preferente is not None and inicio_comun <= fecha_preferente <= limite_comun:
+            candidatos = np.concatenate([[fecha_preferente], candidatos[candidatos != fecha_preferente]])
+
+        entrada_elegida = None
+        if len(candidatos):
+            factibles = entradas_comunes_factibles(estado, candidatos, dia_g, lotes.unds[sel], lotes.dso[sel])
+            for fila in factibles:  # 1º intento y, si ninguna cabe, 2º
+                if fila.any():
+                    entrada_elegida = int(candidatos[np.argmax(fila)])
+                    break
+
+        if entrada_elegida is not None:
+            for k in sel:
+                salida = salidas.resolver_i(entrada_elegida, int(lotes.dso[k]), carga_salida)
+                lotes.asignar(k, entrada_elegida, salida, normalizada=True)
+                estado.asignar(
+                    int(lotes.dia_off[k]), entrada_elegida, salida,
+                    int(lotes.unds[k]), int(lotes.tipo[k]), int(lotes.nitrif[k])
+                )
+
+            return True
+
+        if marcar_si_falla:
+            lotes.no_encaja[sel] = "Sí"
+        return False
+
+    if instrumentacion is not None:
+        _aplicar_entrada_comun_para_grupo = instrumentacion.medir_funcion(
+            "reglas_entrada_comun", _aplicar_entrada_comun_para_grupo
+        )
+
+    # Ejecutar reglas especiales, en orden
+    for regla in config.reglas_entrada_comun:
+        if not _aplicar_entrada_comun_para_grupo(list(regla.codigos)):
+            for alternativa in regla.alternativas:
+                _aplicar_entrada_comun_para_grupo(list(alternativa))
+    if solo_reglas:
+        lotes.volcar(df_corr, cal)
+        if instrumentacion is not None:
+            instrumentacion.restaurar()
+        return df_corr, pd.DataFrame(columns=COLS_SUGERENCIAS)
+    # ===============================
+    # Asignación de pendientes minimizando cambios de TIPO/NITRIF por día
+    # ===============================
+    # Lotes que no encajan, en el orden de asignación (para las sugerencias)
+    sin_encajar = []
+    n_candidatos = 0
+    n_pendientes = int(lotes.pendientes().sum())
+
+    def _asignar_voraz(est, lts, k):
+        nonlocal n_candidatos
+        asignado, n = asignar_voraz(est, lts, k)
+        n_candidatos += n
+        return asignado
+
+    # Asignación global (MILP) de los pendientes; el resultado voraz, calculado sobre copias,
+    # es la solución de arranque del solver y solo se sustituye si el solver mejora su objetivo.
+    def _asignar_optimizado(orden):
+        pendientes = [k for k in orden if lotes.entrada_off[k] < 0]
+        modelo = ModeloAsignacion(estado, lotes, pendientes)
+        est_voraz, lotes_voraz = estado.copia(), lotes.copia()
+        for k in pendientes:
+            _asignar_voraz(est_voraz, lotes_voraz, k)
+        asignacion = {
+            k: (int(lotes_voraz.entrada_off[k]), int(lotes_voraz.salida_off[k]))
+            for k in pendientes if lotes_voraz.entrada_off[k] >= 0
+        }
+        solucion = modelo.resolver(config.limite_segundos_optimizacion, inicial=asignacion)
+        if instrumentacion is not None:
+            instrumentacion.contar("opciones_optimizacion", len(modelo.e))
+        if solucion is not None and modelo.coste(solucion) < modelo.coste(asignacion):
+            asignacion = solucion
+
+        for k in pendientes:
+            if k not in asignacion:
+                continue
+            entrada, salida = asignacion[k]
+            dia_off, unds = int(lotes.dia_off[k]), int(lotes.unds[k])
+            # Comprobación final contra el estado real (tolerancias numéricas del solver)
+            if (carga_entrada.get_i(entrada) + unds > cap_ent[2].get_i(entrada)
+                    or carga_salida.get_i(salida) + unds > cap_sal[2].get_i(salida)
+                    or (entrada > dia_off and not estab_idx.cabe_i(dia_off, entrada - 1, unds))):
+                continue
+            lotes.asignar(k, entrada, salida)
+            estado.asignar(dia_off, entrada, salida, unds, int(lotes.tipo[k]), int(lotes.nitrif[k]))
+
+    with fase("bucle_pendientes"):
+        # Orden de asignación: (DIA, PRODUCTO) estable sobre el orden del fichero
+        cols_orden = [c for c in ("DIA", "PRODUCTO") if c in df_corr.columns]
+        orden = (
+            df_corr.iloc[lotes.posiciones][cols_orden].reset_index(drop=True)
+            .sort_values(cols_orden, kind="stable").index.to_numpy()
+        )
+
+        usar_optimizacion = config.motor_asignacion == "optimizacion" and solver_disponible()
+        if usar_optimizacion or config.mejora_local:
+            if usar_optimizacion:
+                with fase("optimizacion"):
+                    _asignar_optimizado(orden)
+            else:
+                for k in orden:
+                    if lotes.entrada_off[k] < 0:
+                        _asignar_voraz(estado, lotes, k)
+            if config.mejora_local:
+                with fase("mejora_local"):
+                    mejora = MejoraLocal(estado, lotes, lambda k: _asignar_voraz(estado, lotes, k))
+                    mejora.ejecutar(
+                        [k for k in orden if lotes.entrada_off[k] < 0],
+                        config.limite_segundos_mejora, config.max_iteraciones_mejora, progreso,
+                    )
+                if instrumentacion is not None:
+                    instrumentacion.contar("movimientos_mejora", mejora.iteraciones)
+                    instrumentacion.contar("lotes_recuperados", mejora.recuperados)
+                    instrumentacion.contar("mejoras_perfil", mejora.mejoras_perfil)
+            sin_encajar = [k for k in orden if lotes.entrada_off[k] < 0]
+        else:
+            pendientes = orden[lotes.entrada_off[orden] < 0]
+            grandes, pequenas = [], []
+            procesos = config.procesos_planificacion or os.cpu_count() or 1
+            if procesos > 1 and len(pendientes) >= 2 * MIN_LOTES_COMPONENTE:
+                with fase("componentes"):
+                    componentes = componentes_independientes(estado, lotes, pendientes)
+                for c in componentes:
+                    (grandes if len(c) >= MIN_LOTES_COMPONENTE else pequenas).append(c)
+            if len(grandes) > 1:
+                # Componentes sin días en común: el voraz de cada una no depende de las demás, así
+                # que las grandes se reparten en procesos, las pequeñas se hacen aquí mientras tanto
+                # y el resultado es el mismo que en secuencial
+                if instrumentacion is not None:
+                    instrumentacion.restaurar()  # los métodos envueltos no se pueden enviar al pool
+                    instrumentacion.contar("componentes_independientes", len(grandes) + len(pequenas))
+                    instrumentacion.contar("componentes_en_paralelo", len(grandes))
+                procesos = min(procesos, len(grandes))
+                bloques = _bloques(grandes, procesos * BLOQUES_POR_PROCESO)
+                with ProcessPoolExecutor(
+                    procesos, initializer=_iniciar_proceso, initargs=(estado, lotes, instrumentacion is not None)
+                ) as pool:
+                    resultados = pool.map(_asignar_bloque, bloques)
+                    if instrumentacion is not None:
+                        _contar_llamadas_estado(instrumentacion, estado)
+                    for c in pequenas:
+                        for k in c.tolist():
+                            _asignar_voraz(estado, lotes, k)
+                    asignados = []
+                    for asignados_bloque, n, contadores in resultados:
+                        asignados += asignados_bloque
+                        n_candidatos += n
+                        if instrumentacion is not None:
+                            instrumentacion.contadores.update(contadores)
+                # Resultados del pool al estado en bloque (días disjuntos de los ya asignados aquí)
+                ks, entradas, salidas_pool = np.array(asignados, dtype=np.int64).reshape(-1, 3).T
+                lotes.asignar(ks, entradas, salidas_pool)
+                estado.asignar_bloque(
+                    lotes.dia_off[ks], entradas, salidas_pool, lotes.unds[ks], lotes.tipo[ks], lotes.nitrif[ks]
+                )
+                sin_encajar = [k for k in pendientes.tolist() if lotes.entrada_off[k] < 0]
+            else:
+                for k in pendientes.tolist():
+                    if not _asignar_voraz(estado, lotes, k):
+                        sin_encajar.append(k)
+        lotes.no_encaja[sin_encajar] = "Sí"
+
+        # Sugerencias para los que no encajan, en bloque y contra el estado final de la asignación
+        with fase("sugerencias"):
+            df_sugerencias = sugerencias_no_encajan(estado, lotes, sin_encajar)
+
+        # Resultados del almacén compacto → df_corr, en bloque
+        lotes.volcar(df_corr, cal)
+
+    if instrumentacion is not None:
+        # El estado puede reutilizarse: se retiran los contadores de llamadas de sus objetos
+        instrumentacion.restaurar()
+        instrumentacion.contar("lotes_pendientes", n_pendientes)
+        instrumentacion.contar("candidatos_evaluados", n_candidatos)
+
+    with fase("ensamblado"):
+        # Métrica final
+        if "DIAS_SAL" in df_corr.columns and "DIAS_SAL_OPTIMOS" in df_corr.columns:
+            df_corr["DIFERENCIA_DIAS_SAL"] = df_corr["DIAS_SAL"] - df_corr["DIAS_SAL_OPTIMOS"]
+
+        if not df_sugerencias.empty:
+            df_sugerencias = ordenar_sugerencias(df_sugerencias)
+
+    return df_corr, df_sugerencias
+
+
+def liberar_lotes(df_base, idx_a_replan):
+    """
+    Devuelve una copia de df_base con las filas idx_a_replan sin planificar
+    (ENTRADA/SALIDA a NaT y métricas a NA), preservando tipos para el editor.
+    """
+    df_trabajo = df_base.copy()
+
+    datetime_cols = [c for c in ["ENTRADA_SAL", "SALIDA_SAL"] if c in df_trabajo.columns]
+    numeric_cols  = [c for c in ["DIAS_SAL", "DIAS_ALMACENADOS", "DIFERENCIA_DIAS_SAL"] if c in df_trabajo.columns]
+    text_cols     = [c for c in ["LOTE_NO_ENCAJA"] if c in df_trabajo.columns]
+
+    if datetime_cols:
+        df_trabajo.loc[idx_a_replan, datetime_cols] = pd.NaT
+    for c in numeric_cols:
+        df_trabajo.loc[idx_a_replan, c] = pd.NA
+    for c in text_cols:
+        df_trabajo.loc[idx_a_replan, c] = pd.NA
+
+    # Solo se convierten las columnas que no tengan ya el tipo final
+    for c in datetime_cols:
+        if not pd.api.types.is_datetime64_any_dtype(df_trabajo[c]):
+            df_trabajo[c] = pd.to_datetime(df_trabajo[c], errors="coerce")
+    for c in numeric_cols:
+        if str(df_trabajo[c].dtype) != "Int64":
+            df_trabajo[c] = pd.to_numeric(df_trabajo[c], errors="coerce").astype("Int64")
+    return df_trabajo
+
+
+def lotes_a_replanificar(df_base):
+    """Máscara por defecto de lotes a replanificar: sin ENTRADA_SAL o con LOTE_NO_ENCAJA = 'Sí'."""
+    candidatos_mask = df_base["ENTRADA_SAL"].isna()
+    if "LOTE_NO_ENCAJA" in df_base.columns:
+        candidatos_mask = candidatos_mask | (df_base["LOTE_NO_ENCAJA"].astype(str).str.upper() == "SÍ")
+    return candidatos_mask
@@ -0,0 +1,325 @@
+"""Asignación global de lotes pendientes como MILP (alternativa opcional al paso voraz)."""
+import importlib.util
+import time
+
+import numpy as np
+
+from .lotes import SIN_NITRIF
+
+# Pesos del objetivo: no encajar un lote domina a todo lo demás; después, las unidades por
+# encima de la capacidad del 1º intento; después, los cambios de TIPO y de NITRIF por día;
+# y por último, a igualdad, la ENTRADA más temprana.
+PESO_NO_ENCAJA = 1000.0
+PESO_EXCESO_INTENTO_1 = 0.01
+PESO_TIPO = 1.0
+PESO_NITRIF = 0.1
+PESO_RETRASO = 0.001
+
+# Reparto del presupuesto de tiempo entre etapas: la 1ª (maximizar lotes asignados) recibe esta
+# fracción; la 2ª (objetivo completo) el resto, más lo que la 1ª no haya gastado.
+FRACCION_TIEMPO_ETAPA_1 = 0.6
+
+
+def solver_disponible():
+    """True si highspy (HiGHS) está instalado; sin él el motor usa el paso voraz y los análisis su heurística."""
+    return importlib.util.find_spec("highspy") is not None
+
+
+def resolver_milp(costes, matriz, fila_min, fila_max, cota_sup, n_enteras, limite_segundos, inicial=None):
+    """
+    Resuelve con HiGHS (highspy) min costes·v sujeto a fila_min <= A·v <= fila_max y
+    0 <= v <= cota_sup, con las 'n_enteras' primeras variables enteras. 'matriz' es
+    (filas, columnas, valores, n_filas) en coordenadas; 'inicial' (vector) es una solución de
+    arranque opcional. Devuelve el vector de la mejor solución en 'limite_segundos' o None.
+    """
+    import highspy
+
+    filas, cols, vals, n_filas = matriz
+    n_var = len(costes)
+    # Matriz por columnas (CSC) para HiGHS
+    orden = np.lexsort((filas, cols))
+    inicio = np.concatenate([[0], np.cumsum(np.bincount(cols, minlength=n_var))])
+    inf = highspy.kHighsInf
+
+    lp = highspy.HighsLp()
+    lp.num_col_, lp.num_row_ = n_var, n_filas
+    lp.col_cost_ = np.asarray(costes, dtype=np.float64)
+    lp.col_lower_ = np.zeros(n_var)
+    lp.col_upper_ = np.where(np.isinf(cota_sup), inf, cota_sup)
+    lp.row_lower_ = np.where(np.isinf(fila_min), -inf, fila_min)
+    lp.row_upper_ = np.where(np.isinf(fila_max), inf, fila_max)
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = inicio.astype(np.int32)
+    lp.a_matrix_.index_ = filas[orden].astype(np.int32)
+    lp.a_matrix_.value_ = vals[orden]
+    lp.integrality_ = [highspy.HighsVarType.kInteger] * n_enteras + [highspy.HighsVarType.kContinuous] * (n_var - n_enteras)
+
+    h = highspy.Highs()
+    h.setOptionValue("output_flag", False)
+    h.setOptionValue("time_limit", max(float(limite_segundos), 0.1))
+    h.passModel(lp)
+    if inicial is not None:
+        sol = highspy.HighsSolution()
+        sol.col_value = np.asarray(inicial, dtype=np.float64).tolist()
+        sol.value_valid = True
+        h.setSolution(sol)
+    h.run()
+    if h.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        return None
+    return np.asarray(h.getSolution().col_value)
+
+
+class ModeloAsignacion:
+    """
+    Modelo de asignación de los lotes 'pendientes' (índices del LotesCompactos) sobre el estado
+    actual (EstadoPlanificacion), que no se modifica.
+    Variables:
+      - x[j] binaria por opción (lote, ENTRADA hábil, SALIDA resuelta); si la SALIDA depende de
+        la carga (festivo martes-jueves) el lote tiene una opción por cada día candidato
+      - z[l] (1 - lotes asignados): lote l sin encajar
+      - exceso de ENTRADA/SALIDA sobre la capacidad del 1º intento, por día
+      - y[día, TIPO] / y[día, NITRIF]: el día recibe un TIPO/NITRIF que no tenía
+    Restricciones: un lote, una opción (o z); capacidad del 2º intento de ENTRADA y SALIDA por
+    día; capacidad de estabilización en cada día natural [DIA, ENTRADA - 1]; y >= x.
+    Relajación respecto al paso voraz: la regla de SALIDA en festivo martes-jueves (el candidato
+    menos cargado, empate → anterior) no se modela. En el voraz depende del orden de asignación
+    (la carga en el momento de asignar cada lote), así que aquí el solver elige libremente entre
+    los dos candidatos, respetando sus capacidades. Un plan optimizado puede tener por tanto
+    SALIDAS en el candidato más cargado; las capacidades se cumplen igual.
+    """
+
+    def __init__(self, estado, lotes, pendientes):
+        self.pendientes = [int(k) for k in pendientes]
+        cal, salidas = estado.cal, estado.salidas
+        ent1, ent2 = estado.cap_ent[1], estado.cap_ent[2]
+        sal2 = estado.cap_sal[2]
+        carga_ent, carga_sal, estab_idx = estado.carga_entrada, estado.carga_salida, estado.estab_idx
+
+        # ---- Opciones válidas por separado (cada una cabe sola en el estado actual) ----
+        opc_lote, opc_e, opc_s, opc_retraso = [], [], [], []
+        for l, k in enumerate(self.pendientes):
+            if np.isnan(lotes.dias_max[k]):
+                continue
+            dia_off, unds, dso = int(lotes.dia_off[k]), int(lotes.unds[k]), int(lotes.dso[k])
+            limite = dia_off + lotes.dias_max[k]
+            entrada_ini = int(lotes.ini_off[k])
+            entrada = entrada_ini
+            while entrada <= limite:
+                if (carga_ent.get_i(entrada) + unds <= ent2.get_i(entrada)
+                        and (entrada <= dia_off or estab_idx.cabe_i(dia_off, entrada - 1, unds))):
+                    for salida in salidas.opciones_i(entrada, dso):
+                        if carga_sal.get_i(salida) + unds <= sal2.get_i(salida):
+                            opc_lote.append(l)
+                            opc_e.append(entrada)
+                            opc_s.append(salida)
+                            opc_retraso.append(entrada - entrada_ini)
+                entrada = cal.siguiente_habil_i(entrada)
+
+        self.lote = np.array(opc_lote, dtype=np.int64)
+        self.e = np.array(opc_e, dtype=np.int64)
+        self.s = np.array(opc_s, dtype=np.int64)
+        self.retraso = np.array(opc_retraso, dtype=np.float64)
+        pos = np.array(self.pendientes, dtype=np.int64)[self.lote]
+        self.u = lotes.unds[pos].astype(np.float64)
+        self.d = lotes.dia_off[pos].astype(np.int64)
+        self.indice = {(int(k), int(e), int(s)): j for j, (k, e, s) in enumerate(zip(pos, self.e, self.s))}
+
+        # ---- Días de ENTRADA / SALIDA con holgura sobre el 1º intento ----
+        self.dias_e = np.unique(self.e)
+        self.dias_s = np.unique(self.s)
+        self.e_idx = np.searchsorted(self.dias_e, self.e)
+        self.s_idx = np.searchsorted(self.dias_s, self.s)
+        self.hueco_ent_1 = np.array([ent1.get_i(i) - carga_ent.get_i(i) for i in self.dias_e.tolist()], dtype=np.float64)
+        self.hueco_ent_2 = np.array([ent2.get_i(i) - carga_ent.get_i(i) for i in self.dias_e.tolist()], dtype=np.float64)
+        sal1 = estado.cap_sal[1]
+        self.hueco_sal_1 = np.array([sal1.get_i(i) - carga_sal.get_i(i) for i in self.dias_s.tolist()], dtype=np.float64)
+        self.hueco_sal_2 = np.array([sal2.get_i(i) - carga_sal.get_i(i) for i in self.dias_s.tolist()], dtype=np.float64)
+
+        # ---- Estabilización: días naturales cubiertos por alguna opción ----
+        con_estab = self.e > self.d
+        if con_estab.any():
+            self.estab_ini = int(self.d[con_estab].min())
+            n_estab = int(self.e[con_estab].max()) - self.estab_ini
+        else:
+            self.estab_ini, n_estab = 0, 0
+        self.hueco_estab = (
+            estado.cap_estab.rango_i(self.estab_ini, self.estab_ini + n_estab - 1)
+            - estado.estab_stock.rango_i(self.estab_ini, self.estab_ini + n_estab - 1)
+        ).astype(np.float64) if n_estab else np.zeros(0)
+
+        # ---- TIPO / NITRIF nuevos por día (los que el día ya tiene no cuestan) ----
+        tipos = lotes.tipo[pos].astype(np.int64)
+        nitrifs = lotes.nitrif[pos].astype(np.int64)
+        self.y_tipo, self.opc_y_tipo = self._indicadores(estado.perfil, 0, tipos, np.ones(len(pos), dtype=bool))
+        self.y_nitr, self.opc_y_nitr = self._indicadores(estado.perfil, 1, nitrifs, nitrifs != SIN_NITRIF)
+
+    def _indicadores(self, perfil, campo, claves, aplica):
+        """Pares (día, clave) nuevos → índice de indicador y, y por opción su indicador (-1 si no cuesta)."""
+        pares = {}
+        opc_y = np.full(len(self.e), -1, dtype=np.int64)
+        for j, (e, c) in enumerate(zip(self.e.tolist(), claves.tolist())):
+            if not aplica[j]:
+                continue
+            prof = perfil.get(e)
+            if prof is not None and prof[campo][c] > 0:
+                continue
+            opc_y[j] = pares.setdefault((e, c), len(pares))
+        return len(pares), opc_y
+
+    # ---- Variables y objetivo ----
+    def _dimensiones(self):
+        """Desplazamientos de cada bloque de variables: x | z | exceso ENTRADA | exceso SALIDA | y TIPO | y NITRIF."""
+        o_z = len(self.e)
+        o_oe = o_z + len(self.pendientes)
+        o_os = o_oe + len(self.dias_e)
+        o_yt = o_os + len(self.dias_s)
+        o_yn = o_yt + self.y_tipo
+        return o_z, o_oe, o_os, o_yt, o_yn, o_yn + self.y_nitr
+
+    def _costes(self, con_perfil=True):
+        o_z, o_oe, o_os, o_yt, o_yn, n_var = self._dimensiones()
+        c = np.zeros(n_var)
+        c[:o_z] = PESO_RETRASO * self.retraso
+        c[o_z:o_oe] = PESO_NO_ENCAJA
+        c[o_oe:o_yt] = PESO_EXCESO_INTENTO_1
+        if con_perfil:
+            c[o_yt:o_yn] = PESO_TIPO
+            c[o_yn:] = PESO_NITRIF
+        return c
+
+    def _vector(self, asignacion):
+        """Vector de variables de una asignación {k: (entrada, salida)}; None si usa opciones fuera del modelo."""
+        o_z, o_oe, o_os, o_yt, o_yn, n_var = self._dimensiones()
+        v = np.zeros(n_var)
+        for k, (e, s) in asignacion.items():
+            j = self.indice.get((int(k), int(e), int(s)))
+            if j is None:
+                return None
+            v[j] = 1.0
+        x = v[:o_z]
+        v[o_z:o_oe] = 1.0 - np.bincount(self.lote, weights=x, minlength=o_oe - o_z)
+        carga_e = np.bincount(self.e_idx, weights=self.u * x, minlength=len(self.dias_e))
+        carga_s = np.bincount(self.s_idx, weights=self.u * x, minlength=len(self.dias_s))
+        v[o_oe:o_os] = np.clip(carga_e - self.hueco_ent_1, 0, None)
+        v[o_os:o_yt] = np.clip(carga_s - self.hueco_sal_1, 0, None)
+        for o_y, opc_y in ((o_yt, self.opc_y_tipo), (o_yn, self.opc_y_nitr)):
+            v[o_y + opc_y[(x > 0) & (opc_y >= 0)]] = 1.0
+        return v
+
+    def coste(self, asignacion):
+        """Valor del objetivo para una asignación {k: (entrada, salida)} (p. ej. la voraz)."""
+        v = self._vector(asignacion)
+        return np.inf if v is None else float(self._costes() @ v)
+
+    # ---- Restricciones ----
+    def _restricciones(self, con_perfil=True, max_no_encaja=None):
+        """
+        Matriz de restricciones en formato (filas, columnas, valores) y cotas por fila.
+        Sin 'con_perfil' se omiten los indicadores TIPO/NITRIF; 'max_no_encaja' limita sum z.
+        """
+        o_z, o_oe, o_os, o_yt, o_yn, n_var = self._dimensiones()
+        n_x, n_l = o_z, o_oe - o_z
+        n_oe, n_os = len(self.dias_e), len(self.dias_s)
+        filas, cols, vals, lb, ub = [], [], [], [], []
+        n_filas = 0
+        j = np.arange(n_x)
+
+        def _bloque(f, c, v, lo, hi):
+            nonlocal n_filas
+            filas.append(f + n_filas)
+            cols.append(c)
+            vals.append(v)
+            lb.append(lo)
+            ub.append(hi)
+            n_filas += len(lo)
+
+        # Un lote, una opción: sum x + z = 1
+        _bloque(
+            np.concatenate([self.lote, np.arange(n_l)]), np.concatenate([j, o_z + np.arange(n_l)]),
+            np.ones(n_x + n_l), np.ones(n_l), np.ones(n_l),
+        )
+        # ENTRADA: sum u·x <= hueco 2º intento ; sum u·x - exceso <= hueco 1º intento
+        _bloque(self.e_idx, j, self.u, np.full(n_oe, -np.inf), self.hueco_ent_2)
+        _bloque(
+            np.concatenate([self.e_idx, np.arange(n_oe)]), np.concatenate([j, o_oe + np.arange(n_oe)]),
+            np.concatenate([self.u, -np.ones(n_oe)]), np.full(n_oe, -np.inf), self.hueco_ent_1,
+        )
+        # SALIDA: igual que ENTRADA
+        _bloque(self.s_idx, j, self.u, np.full(n_os, -np.inf), self.hueco_sal_2)
+        _bloque(
+            np.concatenate([self.s_idx, np.arange(n_os)]), np.concatenate([j, o_os + np.arange(n_os)]),
+            np.concatenate([self.u, -np.ones(n_os)]), np.full(n_os, -np.inf), self.hueco_sal_1,
+        )
+        # Estabilización: cada opción ocupa los días [DIA, ENTRADA - 1]
+        largo = np.clip(self.e - self.d, 0, None)
+        if largo.sum():
+            opc = np.repeat(j, largo)
+            dia = np.repeat(self.d - self.estab_ini, largo) + (
+                np.arange(largo.sum()) - np.repeat(np.cumsum(largo) - largo, largo)
+            )
+            # Los días sin ninguna opción pueden estar ya en exceso: su fila queda vacía
+            _bloque(dia, opc, self.u[opc], np.full(len(self.hueco_estab), -np.inf), np.maximum(self.hueco_estab, 0))
+        # Indicadores TIPO / NITRIF: x - y <= 0
+        for o_y, opc_y in ((o_yt, self.opc_y_tipo), (o_yn, self.opc_y_nitr)) if con_perfil else ():
+            jj = np.flatnonzero(opc_y >= 0)
+            r = np.arange(len(jj))
+            _bloque(
+                np.concatenate([r, r]), np.concatenate([jj, o_y + opc_y[jj]]),
+                np.concatenate([np.ones(len(jj)), -np.ones(len(jj))]), np.full(len(jj), -np.inf), np.zeros(len(jj)),
+            )
+        if max_no_encaja is not None:
+            _bloque(np.zeros(n_l, dtype=np.int64), o_z + np.arange(n_l), np.ones(n_l), [-np.inf], [max_no_encaja])
+        return (
+            np.concatenate(filas), np.concatenate(cols), np.concatenate(vals),
+            np.concatenate(lb), np.concatenate(ub), n_filas,
+        )
+
+    # ---- Resolución ----
+    def _resolver_highs(self, limite_segundos, inicial, con_perfil, max_no_encaja=None):
+        """Una pasada de HiGHS; devuelve el vector de variables de la mejor solución o None."""
+        o_z, o_oe, o_os, o_yt, o_yn, n_var = self._dimensiones()
+        filas, cols, vals, lb, ub, n_filas = self._restricciones(con_perfil, max_no_encaja)
+        cota_sup = np.full(n_var, np.inf)
+        cota_sup[:o_oe] = 1
+        cota_sup[o_yt:] = 1
+        return resolver_milp(
+            self._costes(con_perfil), (filas, cols, vals, n_filas), lb, ub, cota_sup, o_z,
+            limite_segundos, inicial,
+        )
+
+    def resolver(self, limite_segundos, inicial=None):
+        """
+        Resuelve el MILP con HiGHS (highspy) en 'limite_segundos' como máximo, partiendo de la
+        asignación 'inicial' {k: (entrada, salida)} si se da (p. ej. la voraz). Se resuelve por
+        etapas: primero se maximizan los lotes asignados (sin indicadores TIPO/NITRIF, mucho más
+        fácil para el solver), con FRACCION_TIEMPO_ETAPA_1 del presupuesto, y con el tiempo
+        restante se minimiza el objetivo completo sin empeorar ese número. Devuelve {k: (entrada, salida)} con la mejor solución encontrada,
+        o None si highspy no está instalado o el solver no llega a ninguna solución.
+        """
+        if not solver_disponible() or len(self.e) == 0:
+            return None
+
+        t_fin = time.perf_counter() + float(limite_segundos)
+        o_z, o_oe = self._dimensiones()[:2]
+        v0 = self._vector(inicial) if inicial else None
+        v = self._resolver_highs(FRACCION_TIEMPO_ETAPA_1 * float(limite_segundos), v0, con_perfil=False)
+        if v is None:
+            v = v0
+        restante = t_fin - time.perf_counter()
+        if v is not None and restante > 0:
+            # Los indicadores y de la solución de la 1ª etapa se recalculan para el arranque
+            x = v[:o_z] > 0.5
+            v_perfil = self._resolver_highs(
+                restante, self._vector(self._asignacion(x)), con_perfil=True,
+                max_no_encaja=float(np.round(v[o_z:o_oe].sum())),
+            )
+            if v_perfil is not None:
+                v = v_perfil
+        if v is None:
+            return None
+        return self._asignacion(v[:o_z] > 0.5)
+
+    def _asignacion(self, elegidas):
+        return {
+            self.pendientes[int(self.lote[j])]: (int(self.e[j]), int(self.s[j])) for j in np.flatnonzero(elegidas)
+        }
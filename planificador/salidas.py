@@ -0,0 +1,108 @@
+"""Resolución de la fecha de SALIDA con ajustes de fin de semana y festivos."""
+import numpy as np
+import pandas as pd
+
+
+class TablaSalidas:
+    """
+    Motor único de resolución de SALIDA = ENTRADA + DIAS_SAL_OPTIMOS con los ajustes:
+      - Fin de semana (ajuste_finde): sábado → anterior hábil, domingo → siguiente hábil.
+      - Festivo (ajuste_festivos): lunes → siguiente hábil, viernes → anterior hábil,
+        martes-jueves → el menos cargado entre anterior y siguiente hábil (empate → anterior).
+    Para cada DIAS_SAL_OPTIMOS se precalcula (vectorizado, sobre el horizonte del calendario)
+    la salida fija o el par de candidatas cuando depende de la carga; en ejecución solo se comparan cargas.
+    """
+
+    def __init__(self, cal, ajuste_finde, ajuste_festivos):
+        self.cal = cal
+        self.ajuste_finde = bool(ajuste_finde)
+        self.ajuste_festivos = bool(ajuste_festivos)
+        self._tablas = {}
+
+    def resolver_offsets(self, offsets, dias_sal_optimos):
+        """
+        Vectorizado: para offsets de entrada (respecto a cal.origen) devuelve arrays de offsets
+        (fija, anterior, siguiente, depende_carga). Si depende_carga, la salida es anterior o siguiente.
+        """
+        cal = self.cal
+        offsets = np.asarray(offsets, dtype=np.int64)
+        d = cal._origen_d + offsets + np.asarray(dias_sal_optimos, dtype=np.int64)
+
+        def _dia_semana(x):
+            return (x.astype(np.int64) + 3) % 7  # 1970-01-01 fue jueves → lunes = 0
+
+        def _sig(x):
+            return np.busday_offset(x + 1, 0, roll="forward", busdaycal=cal.busdaycal)
+
+        def _ant(x):
+            return np.busday_offset(x - 1, 0, roll="backward", busdaycal=cal.busdaycal)
+
+        if self.ajuste_finde:
+            dsem = _dia_semana(d)
+            d = np.where(dsem == 5, _ant(d), np.where(dsem == 6, _sig(d), d))
+
+        ant = d
+        sig = d
+        depende = np.zeros(d.shape, dtype=bool)
+        if self.ajuste_festivos and len(cal._festivos_d):
+            festivo = np.isin(d, cal._festivos_d)
+            dsem = _dia_semana(d)
+            ant = _ant(d)
+            sig = _sig(d)
+            d = np.where(festivo & (dsem == 0), sig, np.where(festivo & (dsem == 4), ant, d))
+            depende = festivo & (dsem >= 1) & (dsem <= 3)
+
+        def _off(x):
+            return (x - cal._origen_d).astype(np.int64)
+
+        return _off(d), _off(ant), _off(sig), depende
+
+    def _tabla(self, dias_sal_optimos):
+        tabla = self._tablas.get(dias_sal_optimos)
+        if tabla is None:
+            tabla = self.resolver_offsets(np.arange(self.cal.n), dias_sal_optimos)
+            self._tablas[dias_sal_optimos] = tabla
+        return tabla
+
+    def resolver_i(self, i, dias_sal_optimos, carga_salida, extra=None):
+        """
+        Offset de SALIDA para el offset de ENTRADA i. 'carga_salida' (LineaTemporal) y 'extra'
+        (dict offset->unds, opcional) solo se consultan en el caso dependiente de carga.
+        """
+        if 0 <= i < self.cal.n:
+            fija, ant, sig, depende = self._tabla(dias_sal_optimos)
+            if not depende[i]:
+                return int(fija[i])
+            ant, sig = int(ant[i]), int(sig[i])
+        else:
+            fija, ant, sig, depende = self.resolver_offsets([i], dias_sal_optimos)
+            if not depende[0]:
+                return int(fija[0])
+            ant, sig = int(ant[0]), int(sig[0])
+        carga_ant = carga_salida.get_i(ant)
+        carga_sig = carga_salida.get_i(sig)
+        if extra:
+            carga_ant += extra.get(ant, 0)
+            carga_sig += extra.get(sig, 0)
+        return ant if carga_ant <= carga_sig else sig
+
+    def opciones_i(self, i, dias_sal_optimos):
+        """Offsets de SALIDA posibles para la ENTRADA i: uno fijo, o (anterior, siguiente) si depende de la carga."""
+        if 0 <= i < self.cal.n:
+            fija, ant, sig, depende = self._tabla(dias_sal_optimos)
+            k = i
+        else:
+            fija, ant, sig, depende = self.resolver_offsets([i], dias_sal_optimos)
+            k = 0
+        if depende[k]:
+            return (int(ant[k]), int(sig[k]))
+        return (int(fija[k]),)
+
+    def resolver(self, entrada, dias_sal_optimos, carga_salida, extra=None):
+        """
+        Fecha de SALIDA para una ENTRADA (conserva su hora). 'extra' es un dict fecha->unds;
+        'carga_salida' debe compartir origen con el calendario.
+        """
+        i = self.cal._offset(entrada)
+        extra_i = {self.cal._offset(k): v for k, v in extra.items()} if extra else None
+        return entrada + pd.Timedelta(days=self.resolver_i(i, int(dias_sal_optimos), carga_salida, extra_i) - i)
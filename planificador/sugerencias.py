@@ -0,0 +1,147 @@
+"""Sugerencias de ajuste de capacidad para los lotes que no encajan (cálculo por bloques)."""
+import numpy as np
+import pandas as pd
+
+COLS_SUGERENCIAS = [
+    "LOTE", "PRODUCTO", "UNDS", "DIA_RECEPCION",
+    "ENTRADA_PROPUESTA", "SALIDA_PROPUESTA", "INTENTO",
+    "DEFICIT_ENTRADA", "DEFICIT_ESTAB_MAX", "DEFICIT_SALIDA",
+    "MAX_DEFICIT", "TOTAL_DEFICIT", "RECOMENDACION"
+]
+
+# Sugerencias que se conservan por lote (las de menor déficit)
+MAX_SUGERENCIAS_LOTE = 20
+# Días con déficit de estabilización que se citan en el texto (para no saturar)
+MAX_DIAS_ESTAB_TEXTO = 3
+
+
+def ventanas_entrada(cal, lotes, ks):
+    """Pares (lote, ENTRADA hábil) de la ventana [primer hábil desde DIA, DIA + días máx.] de cada lote."""
+    dias_max = lotes.dias_max[ks]
+    validos = ~np.isnan(dias_max)
+    limite = np.where(validos, lotes.dia_off[ks] + np.floor(np.nan_to_num(dias_max)), -1).astype(np.int64)
+    ini = lotes.ini_off[ks]
+    largo = np.where(validos, np.clip(limite - ini + 1, 0, None), 0)
+    r = np.repeat(np.arange(len(ks)), largo)
+    e = np.repeat(ini, largo) + (np.arange(largo.sum()) - np.repeat(np.cumsum(largo) - largo, largo))
+    habil = cal.es_habil_offsets(e)
+    return r[habil], e[habil]
+
+
+def _recomendacion(fecha_e, fecha_s, intento, d_ent, d_sal, dias_estab):
+    """Texto de recomendación rápida (fechas ya como texto YYYY-MM-DD)."""
+    recomendaciones = []
+    if d_ent > 0:
+        recomendaciones.append(f"Subir ENTRADA el {fecha_e} en +{int(d_ent)} unds (INTENTO {intento}).")
+    if d_sal > 0:
+        recomendaciones.append(f"Subir SALIDA el {fecha_s} en +{int(d_sal)} unds (INTENTO {intento}).")
+    if dias_estab:
+        recomendaciones.append("Subir ESTABILIZACIÓN en: " + ", ".join(dias_estab))
+    return " | ".join(recomendaciones) if recomendaciones else "Sin ajustes necesarios"
+
+
+def sugerencias_no_encajan(estado, lotes, ks, max_por_lote=MAX_SUGERENCIAS_LOTE):
+    """
+    Sugerencias para los lotes 'ks' (índices del LotesCompactos) que no encajan, contra el
+    estado de capacidad actual: por cada ENTRADA hábil de su ventana e intento (1º/2º), los
+    déficits de ENTRADA, SALIDA y estabilización (máximo en [DIA, ENTRADA - 1]) que habría que
+    cubrir. Se calcula en bloque (matriz lote × ENTRADA × intento sobre los arrays de cargas y
+    capacidades); por lote se conservan las 'max_por_lote' de menor (MAX, TOTAL, ENTRADA) y
+    solo para esas se redacta el texto de recomendación.
+    """
+    ks = np.asarray(ks, dtype=np.int64)
+    r, e = ventanas_entrada(estado.cal, lotes, ks)
+    if len(r) == 0:
+        return pd.DataFrame(columns=COLS_SUGERENCIAS)
+    cal = estado.cal
+    dia = lotes.dia_off[ks]
+    u = lotes.unds[ks][r]
+
+    # SALIDA resuelta (festivo martes-jueves → la menos cargada entre anterior y siguiente)
+    fija, ant, sig, depende = estado.salidas.resolver_offsets(e, lotes.dso[ks][r])
+    carga_sal = estado.carga_salida
+    s = np.where(
+        depende,
+        np.where(carga_sal.valores_en_offsets(ant) <= carga_sal.valores_en_offsets(sig), ant, sig),
+        fija,
+    )
+    uso_ent = estado.carga_entrada.valores_en_offsets(e) + u
+    uso_sal = carga_sal.valores_en_offsets(s) + u
+
+    # Estabilización: exceso diario desde DIA y su máximo acumulado hasta ENTRADA - 1
+    n_dias = max(int((e - dia[r]).max()), 1)
+    dias = dia[:, None] + np.arange(n_dias)[None, :]
+    exceso = (
+        estado.estab_stock.valores_en_offsets(dias) + lotes.unds[ks][:, None]
+        - estado.cap_estab.valores_en_offsets(dias)
+    )
+    exceso_acum = np.maximum.accumulate(exceso, axis=1)
+    fin = e - dia[r] - 1
+    d_est = np.where(fin >= 0, np.maximum(exceso_acum[r, np.maximum(fin, 0)], 0), 0)
+
+    # Filas (par, intento) en el orden de recorrido: lote, ENTRADA, intento 1 y 2
+    par = np.repeat(np.arange(len(r)), 2)
+    intento = np.tile([1, 2], len(r))
+    d_ent = np.empty(len(par), dtype=np.int64)
+    d_sal = np.empty(len(par), dtype=np.int64)
+    for a in (1, 2):
+        m = intento == a
+        d_ent[m] = np.maximum(uso_ent - estado.cap_ent[a].valores_en_offsets(e), 0)
+        d_sal[m] = np.maximum(uso_sal - estado.cap_sal[a].valores_en_offsets(s), 0)
+    d_est = d_est[par]
+    d_max = np.maximum(np.maximum(d_ent, d_est), d_sal)
+    d_total = d_ent + d_est + d_sal
+
+    # Las 'max_por_lote' mejores por lote (orden estable sobre el recorrido)
+    lote_fila = r[par]
+    orden = np.lexsort((np.arange(len(par)), e[par], d_total, d_max, lote_fila))
+    grupo = lote_fila[orden]
+    inicio = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+    rango = np.arange(len(orden)) - np.repeat(inicio, np.diff(np.r_[inicio, len(orden)]))
+    sel = orden[rango < max_por_lote]
+
+    # Texto de recomendación solo para las filas conservadas
+    p, rs = par[sel], lote_fila[sel]
+    k_sel = ks[rs]
+    # Fechas propuestas con la misma resolución que DIA
+    dia_recepcion = pd.to_datetime(lotes.dia[k_sel]).normalize()
+    fechas_e = (cal.origen + pd.to_timedelta(e[p], unit="D")).as_unit(dia_recepcion.unit)
+    fechas_s = (cal.origen + pd.to_timedelta(s[p], unit="D")).as_unit(dia_recepcion.unit)
+    texto_e = np.datetime_as_string(cal._origen_d + e[p])
+    texto_s = np.datetime_as_string(cal._origen_d + s[p])
+    textos = []
+    for i, fila in enumerate(sel.tolist()):
+        dias_estab = []
+        if d_est[fila] > 0:
+            lr = int(rs[i])
+            excesos = exceso[lr, :int(fin[p[i]]) + 1]
+            positivos = np.flatnonzero(excesos > 0)[:MAX_DIAS_ESTAB_TEXTO]
+            fechas = np.datetime_as_string(cal._origen_d + int(dia[lr]) + positivos)
+            dias_estab = [f"{f}(+{int(v)})" for f, v in zip(fechas, excesos[positivos].tolist())]
+        textos.append(_recomendacion(
+            texto_e[i], texto_s[i], int(intento[fila]), d_ent[fila], d_sal[fila], dias_estab
+        ))
+
+    return pd.DataFrame({
+        "LOTE": list(lotes.lote[k_sel]),
+        "PRODUCTO": list(lotes.producto[k_sel]),
+        "UNDS": lotes.unds[k_sel].astype(np.int64),
+        "DIA_RECEPCION": dia_recepcion,
+        "ENTRADA_PROPUESTA": fechas_e,
+        "SALIDA_PROPUESTA": fechas_s,
+        "INTENTO": intento[sel].astype(np.int64),
+        "DEFICIT_ENTRADA": d_ent[sel],
+        "DEFICIT_ESTAB_MAX": d_est[sel],
+        "DEFICIT_SALIDA": d_sal[sel],
+        "MAX_DEFICIT": d_max[sel],
+        "TOTAL_DEFICIT": d_total[sel],
+        "RECOMENDACION": textos,
+    }, columns=COLS_SUGERENCIAS)
+
+
+def ordenar_sugerencias(df_sugerencias):
+    """Orden de presentación: menor déficit máximo y total primero, luego fechas y LOTE."""
+    return df_sugerencias.sort_values(
+        by=["MAX_DEFICIT", "TOTAL_DEFICIT", "ENTRADA_PROPUESTA", "SALIDA_PROPUESTA", "LOTE"],
+        ascending=[True, True, True, True, True]
+    ).reset_index(drop=True)
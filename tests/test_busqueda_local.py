@@ -0,0 +1,70 @@
+"""Mejora local: nunca deja más lotes sin encajar, respeta capacidades y reduce mezclas TIPO/NITRIF."""
+import dataclasses
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generador import generar_lotes
+from planificador import (
+    ConfigPlanificacion, EstadoPlanificacion, LotesCompactos, MejoraLocal, asignar_voraz,
+    calcular_estabilizacion_diaria, planificar_filas_na,
+)
+
+
+def _no_encajan(df_plan):
+    return int((df_plan["LOTE_NO_ENCAJA"] == "Sí").sum())
+
+
+def _carga_por_dia(df_plan, col):
+    filas = df_plan.dropna(subset=[col])
+    return filas.groupby(filas[col].dt.normalize())["UNDS"].sum()
+
+
+@pytest.mark.parametrize("n_lotes, holgura, semilla", [(800, 0.9, 2), (1500, 0.95, 2), (600, 1.1, 3)])
+def test_mejora_local_no_empeora_y_respeta_capacidad(n_lotes, holgura, semilla):
+    df, config = generar_lotes(n_lotes, holgura_capacidad=holgura, semilla=semilla)
+    df_voraz, _ = planificar_filas_na(df, config)
+    df_mejora, _ = planificar_filas_na(df, dataclasses.replace(config, mejora_local=True))
+
+    assert _no_encajan(df_mejora) <= _no_encajan(df_voraz)
+    assert (_carga_por_dia(df_mejora, "ENTRADA_SAL") <= config.cap_ent_2).all()
+    assert (_carga_por_dia(df_mejora, "SALIDA_SAL") <= config.cap_sal_2).all()
+    df_estab = calcular_estabilizacion_diaria(df_mejora, config.estab_cap, config.estab_cap_overrides)
+    assert (df_estab["EXCESO"] == 0).all()
+
+
+@pytest.mark.parametrize("capacidad, movimientos", [(1000, 1), (2000, 2)])
+def test_mejora_local_reduce_mezclas(capacidad, movimientos):
+    # Dos días con un IBERICO y un BLANCO cada uno. Con los días llenos solo un intercambio deja
+    # cada día con un único TIPO/NITRIF; con hueco bastan dos recolocaciones
+    df = pd.DataFrame({
+        "LOTE": ["A", "B", "C", "D"],
+        "PRODUCTO": ["JIBPRCLC", "JBCPRCLC", "JIBPRCLC", "JBCPRCLC"],
+        "DIA": pd.to_datetime(["2025-01-07"] * 4),
+        "UNDS": [500] * 4,
+        "DIAS_SAL_OPTIMOS": [14] * 4,
+        "TIPO NITRIF": ["IBERICO", "BLANCO", "IBERICO", "BLANCO"],
+        "NITRIF": [1, 2, 1, 2],
+        "ENTRADA_SAL": pd.NaT,
+        "SALIDA_SAL": pd.NaT,
+    })
+    config = ConfigPlanificacion(
+        cap_ent_1=capacidad, cap_ent_2=capacidad, cap_sal_1=5000, cap_sal_2=5000, estab_cap=5000,
+        dias_max_almacen_global=1, reglas_entrada_comun=[],
+    )
+    estado = EstadoPlanificacion(df, config)
+    lotes = LotesCompactos(df, np.arange(4), estado.cal, config.dias_max_almacen_global, {})
+    dia = int(lotes.ini_off[0])
+    for k, e in enumerate([dia, dia, dia + 1, dia + 1]):
+        s = estado.salidas.resolver_i(e, int(lotes.dso[k]), estado.carga_salida)
+        lotes.asignar(k, e, s)
+        estado.asignar(int(lotes.dia_off[k]), e, s, int(lotes.unds[k]), int(lotes.tipo[k]), int(lotes.nitrif[k]))
+
+    mejora = MejoraLocal(estado, lotes, lambda k: asignar_voraz(estado, lotes, k)[0])
+    assert mejora.ejecutar([], 5.0, 1000) == []
+
+    assert mejora.mejoras_perfil == movimientos
+    assert lotes.entrada_off[0] == lotes.entrada_off[2] != lotes.entrada_off[1] == lotes.entrada_off[3]
+    assert all(len(tipos) == 1 and len(nitrifs) == 1 for tipos, nitrifs in estado.perfil.values())
+    assert (estado.carga_entrada.valores_en_offsets(np.array([dia, dia + 1])) <= capacidad).all()
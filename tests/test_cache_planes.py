@@ -0,0 +1,82 @@
+"""Caché de planificaciones: un acierto devuelve lo mismo que recalcular, sin compartir objetos."""
+import dataclasses
+
+import numpy as np
+import pytest
+
+from benchmarks.generador import generar_lotes
+from planificador import (
+    EstadoPlanificacion, guardar_plan, huella_plan, liberar_lotes, limpiar_cache_planes, obtener_plan,
+    planificar_filas_na,
+)
+from planificador.cache_planes import _bytes
+
+
+@pytest.fixture(autouse=True)
+def _cache_vacia():
+    limpiar_cache_planes()
+    yield
+    limpiar_cache_planes()
+
+
+def _planificar(df, config):
+    """Como la app: consulta la caché por huella y, si no está, planifica y guarda."""
+    huella = huella_plan(df, config)
+    en_cache = obtener_plan(huella)
+    if en_cache is not None:
+        return en_cache
+    estado = EstadoPlanificacion(df, config)
+    df_plan, df_sug = planificar_filas_na(df, config, estado=estado)
+    guardar_plan(huella, df_plan, df_sug, estado)
+    return df_plan, df_sug, estado
+
+
+def test_acierto_igual_a_recalcular():
+    df, config = generar_lotes(800, holgura_capacidad=0.9, semilla=3)
+    sin_festivos = dataclasses.replace(config, ajuste_festivos=False)
+
+    plan, sug, estado = _planificar(df, config)
+    _planificar(df, sin_festivos)
+    assert huella_plan(df, config) != huella_plan(df, sin_festivos)
+    assert huella_plan(df, config) == huella_plan(df, dataclasses.replace(config, procesos_planificacion=4))
+
+    # Lo devuelto no comparte objetos con la caché
+    plan.loc[plan.index[0], "ENTRADA_SAL"] = None
+    estado.retirar(plan, plan.index[:50])
+
+    plan_cache, sug_cache, estado_cache = obtener_plan(huella_plan(df, config))
+    plan_nuevo, sug_nuevo = planificar_filas_na(df, config)
+    assert plan_cache.equals(plan_nuevo)
+    assert sug_cache.equals(sug_nuevo)
+
+    # El estado en caché sirve para replanificar en incremental igual que uno recién construido
+    idx = plan_nuevo.index[plan_nuevo["ENTRADA_SAL"].notna()][:30]
+    df_trabajo = liberar_lotes(plan_nuevo, idx)
+    estado_cache.retirar(plan_nuevo, idx)
+    df_incr, _ = planificar_filas_na(df_trabajo, config, estado=estado_cache)
+    df_comp, _ = planificar_filas_na(df_trabajo, config)
+    assert df_incr.equals(df_comp)
+
+
+def test_tope_de_memoria_cuenta_el_estado():
+    df, config = generar_lotes(300, semilla=1)
+    estado = EstadoPlanificacion(df, config)
+    df_plan, df_sug = planificar_filas_na(df, config, estado=estado)
+    solo_tablas = _bytes(df_plan) + _bytes(df_sug)
+
+    guardar_plan("con_estado", df_plan, df_sug, estado, max_bytes=solo_tablas)
+    guardar_plan("sin_estado", df_plan, df_sug, max_bytes=solo_tablas)
+    assert obtener_plan("con_estado") is None
+    assert obtener_plan("sin_estado") is not None
+
+
+def test_lru_descarta_el_menos_usado():
+    df, config = generar_lotes(100, semilla=1)
+    df_plan, df_sug = planificar_filas_na(df, config)
+    for clave in ("a", "b", "c"):
+        guardar_plan(clave, df_plan, df_sug, max_entradas=3)
+    obtener_plan("a")
+    guardar_plan("d", df_plan, df_sug, max_entradas=3)
+
+    assert [obtener_plan(c) is not None for c in "abcd"] == [True, False, True, True]
+    assert np.array_equal(obtener_plan("a")[0]["UNDS"], df_plan["UNDS"])
@@ -0,0 +1,46 @@
+"""Cargas por día natural: la hora de DIA no separa capacidad."""
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_lotes
+from planificador import ConfigPlanificacion, planificar_filas_na
+
+
+def _con_horas(df, semilla=1):
+    rng = np.random.default_rng(semilla)
+    df = df.copy()
+    df["DIA"] = df["DIA"] + pd.to_timedelta(rng.choice([6, 8, 10, 14], len(df)), unit="h")
+    return df
+
+
+def _carga_por_dia(df_plan, col):
+    filas = df_plan.dropna(subset=[col])
+    return filas.groupby(filas[col].dt.normalize())["UNDS"].sum()
+
+
+def test_dia_con_hora_respeta_capacidad_diaria():
+    df, config = generar_lotes(600, holgura_capacidad=1.0, densidad_festivos=0)
+    df_plan, _ = planificar_filas_na(_con_horas(df), config)
+
+    assert (_carga_por_dia(df_plan, "ENTRADA_SAL") <= config.cap_ent_2).all()
+    assert (_carga_por_dia(df_plan, "SALIDA_SAL") <= config.cap_sal_2).all()
+
+
+def test_lotes_del_mismo_dia_comparten_capacidad():
+    # Dos recepciones del mismo día a horas distintas: la capacidad del día es una sola
+    df = pd.DataFrame({
+        "LOTE": ["A", "B"],
+        "PRODUCTO": ["JBCPRCLC", "JBCPRCLC"],
+        "DIA": pd.to_datetime(["2025-01-07 08:00", "2025-01-07 14:00"]),
+        "UNDS": [800, 800],
+        "DIAS_SAL_OPTIMOS": [14, 14],
+        "ENTRADA_SAL": pd.NaT,
+        "SALIDA_SAL": pd.NaT,
+    })
+    config = ConfigPlanificacion(
+        cap_ent_1=1000, cap_ent_2=1000, dias_max_almacen_global=0, reglas_entrada_comun=[]
+    )
+    df_plan, _ = planificar_filas_na(df, config)
+
+    assert df_plan["LOTE_NO_ENCAJA"].tolist() == ["No", "Sí"]
+    assert df_plan.loc[0, "ENTRADA_SAL"] == pd.Timestamp("2025-01-07 08:00")
@@ -0,0 +1,38 @@
+"""Componentes independientes en un pool de procesos: mismo plan y contadores que en secuencial."""
+import dataclasses
+
+import pandas as pd
+
+from benchmarks.generador import generar_lotes
+from planificador import Instrumentacion, motor, planificar_filas_na
+
+
+def _bloques(tamanos, separacion=120):
+    """Lotes generados en bloques separados por 'separacion' días: una componente por bloque."""
+    partes = []
+    for i, n in enumerate(tamanos):
+        df, config = generar_lotes(n, semilla=i)
+        df["DIA"] = df["DIA"] + pd.Timedelta(days=separacion * i)
+        df["LOTE"] = df["LOTE"].astype(str) + f"-{i}"
+        partes.append(df)
+    return pd.concat(partes, ignore_index=True), dataclasses.replace(config, reglas_entrada_comun=[])
+
+
+def test_pool_igual_a_secuencial(monkeypatch):
+    monkeypatch.setattr(motor, "MIN_LOTES_COMPONENTE", 200)
+    df, config = _bloques([300, 300, 250, 40, 60])
+    resultados = {}
+    for procesos in (1, 2):
+        instrumentacion = Instrumentacion()
+        df_plan, df_sug = planificar_filas_na(
+            df, dataclasses.replace(config, procesos_planificacion=procesos), instrumentacion
+        )
+        resultados[procesos] = df_plan, df_sug, dict(instrumentacion.contadores)
+
+    (plan_sec, sug_sec, cont_sec), (plan_pool, sug_pool, cont_pool) = resultados[1], resultados[2]
+    assert cont_pool["componentes_independientes"] == 5
+    assert cont_pool["componentes_en_paralelo"] == 3
+    assert plan_pool.equals(plan_sec)
+    assert sug_pool.equals(sug_sec)
+    del cont_pool["componentes_independientes"], cont_pool["componentes_en_paralelo"]
+    assert cont_pool == cont_sec
@@ -0,0 +1,71 @@
+"""Cuellos de botella: aumentos de capacidad con la heurística y con el MILP."""
+import dataclasses
+
+import numpy as np
+import pytest
+
+from benchmarks.generador import generar_lotes
+from planificador import EstadoPlanificacion, LotesCompactos, cuellos, cuellos_botella, planificar_filas_na
+from planificador.sugerencias import ventanas_entrada
+
+
+@pytest.fixture(scope="module")
+def plan_ajustado():
+    df, config = generar_lotes(700, holgura_capacidad=0.85, semilla=6)
+    df_plan, _ = planificar_filas_na(df, config)
+    return df_plan, config
+
+
+def _con_capacidad_propuesta(config, tabla, intento):
+    """config con CAPACIDAD_PROPUESTA como override de las capacidades del intento."""
+    campo = f"CAP{intento}"
+    filas = tabla[tabla["INTENTO"] == intento]
+    overrides = {"ENTRADA": {}, "SALIDA": {}, "ESTABILIZACIÓN": {}}
+    for recurso, fecha, cap in zip(filas["RECURSO"], filas["FECHA"], filas["CAPACIDAD_PROPUESTA"]):
+        overrides[recurso][fecha] = int(cap) if recurso == "ESTABILIZACIÓN" else {campo: int(cap)}
+    return dataclasses.replace(
+        config, cap_overrides_ent=overrides["ENTRADA"], cap_overrides_sal=overrides["SALIDA"],
+        estab_cap_overrides=overrides["ESTABILIZACIÓN"],
+    )
+
+
+def _tiene_opcion(estado, lotes, k, intento):
+    r, entradas = ventanas_entrada(estado.cal, lotes, np.array([k]))
+    unds, dia = int(lotes.unds[k]), int(lotes.dia_off[k])
+    for e in entradas.tolist():
+        if (estado.carga_entrada.get_i(e) + unds > estado.cap_ent[intento].get_i(e)
+                or (e > dia and not estado.estab_idx.cabe_i(dia, e - 1, unds))):
+            continue
+        if any(
+            estado.carga_salida.get_i(s) + unds <= estado.cap_sal[intento].get_i(s)
+            for s in estado.salidas.opciones_i(e, int(lotes.dso[k]))
+        ):
+            return True
+    return False
+
+
+def test_aumentos_milp_y_heuristica(plan_ajustado, monkeypatch):
+    df_plan, config = plan_ajustado
+    sin_encajar = np.flatnonzero(df_plan["ENTRADA_SAL"].isna().to_numpy())
+    assert len(sin_encajar) > 20
+
+    tabla = cuellos_botella(df_plan, config, limite_segundos=10.0)
+    monkeypatch.setattr(cuellos, "solver_disponible", lambda: False)
+    tabla_heuristica = cuellos_botella(df_plan, config)
+
+    for t in (tabla, tabla_heuristica):
+        assert (t["AUMENTO"] > 0).all()
+        assert (t["CAPACIDAD_PROPUESTA"] == t["CAPACIDAD"] + t["AUMENTO"]).all()
+    for intento in (1, 2):
+        total = tabla.loc[tabla["INTENTO"] == intento, "AUMENTO"].sum()
+        assert total <= tabla_heuristica.loc[tabla_heuristica["INTENTO"] == intento, "AUMENTO"].sum()
+
+    # Con las capacidades propuestas, cada lote que no encajaba tiene alguna opción
+    for intento in (1, 2):
+        config_prop = _con_capacidad_propuesta(config, tabla, intento)
+        estado = EstadoPlanificacion(df_plan, config_prop)
+        lotes = LotesCompactos(
+            df_plan, sin_encajar, estado.cal, config.dias_max_almacen_global, config.dias_max_por_producto
+        )
+        sin_opcion = [k for k in range(len(sin_encajar)) if not _tiene_opcion(estado, lotes, k, intento)]
+        assert sin_opcion == []
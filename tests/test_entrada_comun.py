@@ -0,0 +1,57 @@
+"""Reglas de ENTRADA común: la evaluación en bloque coincide con la comprobación fecha a fecha."""
+import dataclasses
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_lotes
+from planificador import EstadoPlanificacion, entradas_comunes_factibles, planificar_filas_na
+
+
+def _cabe(estado, entrada, intento, dia, unds, dso):
+    """Comprobación escalar de un grupo en una ENTRADA: capacidad de ENTRADA, estabilización y SALIDAS."""
+    if estado.carga_entrada.get_i(entrada) + int(unds.sum()) > estado.cap_ent[intento].get_i(entrada):
+        return False
+    antes = dia < entrada
+    if antes.any():
+        ini = int(dia[antes].min())
+        ocupacion = np.zeros(entrada - ini + 1, dtype=np.int64)
+        np.add.at(ocupacion, dia[antes] - ini, unds[antes])
+        stock = estado.estab_stock.rango_i(ini, entrada - 1) + np.cumsum(ocupacion)[:-1]
+        if np.any(stock > estado.cap_estab.rango_i(ini, entrada - 1)):
+            return False
+    extra = {}
+    for k in range(len(dia)):
+        salida = estado.salidas.resolver_i(entrada, int(dso[k]), estado.carga_salida, extra=extra)
+        extra[salida] = extra.get(salida, 0) + int(unds[k])
+    return all(
+        estado.carga_salida.get_i(s) + u <= estado.cap_sal[intento].get_i(s) for s, u in extra.items()
+    )
+
+
+def test_factibilidad_en_bloque_igual_a_escalar():
+    df, config = generar_lotes(1000, holgura_capacidad=0.9)
+    # Festivos extra para que haya SALIDAS que dependen de la carga
+    festivos = list(config.dias_festivos) + [
+        str(d.date()) for d in pd.date_range(df["DIA"].min(), df["DIA"].max(), freq="9D")
+    ]
+    config = dataclasses.replace(config, dias_festivos=festivos)
+    df_plan, _ = planificar_filas_na(df, config)
+    estado = EstadoPlanificacion(df_plan, config)
+
+    rng = np.random.default_rng(1)
+    n_factibles = 0
+    for _ in range(200):
+        n = int(rng.integers(1, 12))
+        dia0 = int(rng.integers(0, estado.cal.n - 20))
+        dia = dia0 + rng.integers(0, 4, n)
+        unds = rng.integers(0, 900, n)
+        dso = rng.choice([10, 12, 14, 15, 21], n)
+        candidatos = rng.permutation(np.arange(dia0, dia0 + 12))
+
+        factible = entradas_comunes_factibles(estado, candidatos, dia, unds, dso)
+        for fila, intento in zip(factible, (1, 2)):
+            esperado = [_cabe(estado, int(e), intento, dia, unds, dso) for e in candidatos]
+            assert fila.tolist() == esperado
+            n_factibles += sum(esperado)
+    assert 0 < n_factibles < 2 * 200 * 12
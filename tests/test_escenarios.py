@@ -0,0 +1,50 @@
+"""Escenarios what-if: la fila Base reproduce la planificación directa y más capacidad no empeora."""
+import pandas as pd
+import pytest
+
+from benchmarks.generador import generar_lotes
+from planificador import (
+    aplicar_escenario, calcular_estabilizacion_diaria, comparar_escenarios, metricas_plan, planificar_filas_na,
+)
+from planificador.escenarios import COLS_METRICAS
+
+
+@pytest.fixture(scope="module")
+def lotes_ajustados():
+    return generar_lotes(900, holgura_capacidad=0.85, semilla=8)
+
+
+def _mas_capacidad(config, factor):
+    return {
+        campo: int(getattr(config, campo) * factor)
+        for campo in ("cap_ent_1", "cap_ent_2", "cap_sal_1", "cap_sal_2", "estab_cap")
+    }
+
+
+@pytest.mark.parametrize("max_procesos", [1, 2])
+def test_base_igual_a_planificacion_directa(lotes_ajustados, max_procesos):
+    df, config = lotes_ajustados
+    df_plan, df_sug = planificar_filas_na(df, config)
+    df_estab = calcular_estabilizacion_diaria(df_plan, config.estab_cap, config.estab_cap_overrides)
+    esperadas = metricas_plan(df_plan, df_sug, df_estab)
+    assert esperadas["LOTES_NO_ENCAJAN"] > 0
+
+    # El escenario sin cambios planifica exactamente lo mismo
+    df_base, df_sug_base = planificar_filas_na(df, aplicar_escenario(config, {}))
+    pd.testing.assert_frame_equal(df_base, df_plan)
+    pd.testing.assert_frame_equal(df_sug_base, df_sug)
+
+    tabla = comparar_escenarios(df, config, [], max_procesos=max_procesos)
+    assert tabla["ESCENARIO"].tolist() == ["Base"]
+    assert tabla.iloc[0][COLS_METRICAS].to_dict() == esperadas
+
+
+@pytest.mark.parametrize("max_procesos", [1, 2])
+def test_mas_capacidad_no_deja_mas_lotes_fuera(lotes_ajustados, max_procesos):
+    df, config = lotes_ajustados
+    escenarios = {f"x{factor}": _mas_capacidad(config, factor) for factor in (1.05, 1.15, 1.3)}
+    tabla = comparar_escenarios(df, config, escenarios, max_procesos=max_procesos)
+
+    no_encajan = tabla.set_index("ESCENARIO")["LOTES_NO_ENCAJAN"]
+    assert no_encajan["Base"] > 0
+    assert no_encajan.is_monotonic_decreasing
@@ -0,0 +1,107 @@
+"""Ocupación de estabilización: barrido por columnas, actualización por ediciones y detalle por día."""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_lotes
+from planificador import OcupacionEstabilizacion, calcular_estabilizacion_diaria
+from planificador.estabilizacion import MOVIMIENTOS_DIA
+
+# Tabla del motor anterior (bucle fila a fila con _sumar_en_rango) para _plan_con_horas() con
+# capacidad ESTAB_CAP y overrides ESTAB_OVERRIDES.
+TABLA_REFERENCIA = Path(__file__).parent / "datos" / "estabilizacion_referencia.csv"
+ESTAB_CAP = 30000
+ESTAB_OVERRIDES = {pd.Timestamp("2025-01-20"): 20000, pd.Timestamp("2025-02-03"): 45000}
+
+
+def _plan_con_horas():
+    """
+    Plan de referencia (tests/datos/plan_referencia.csv) con horas en DIA y ENTRADA_SAL, lotes que
+    entran el mismo día o antes de DIA, sin unidades y de productos que no son paleta ni jamón.
+    """
+    df, _ = generar_lotes(800, holgura_capacidad=0.9, semilla=5)
+    plan = pd.read_csv(Path(__file__).parent / "datos" / "plan_referencia.csv", parse_dates=["ENTRADA_SAL", "SALIDA_SAL"])
+    df = df.drop(columns=["ENTRADA_SAL", "SALIDA_SAL"]).merge(plan, on="LOTE")
+    rng = np.random.default_rng(7)
+    df["DIA"] = df["DIA"] + pd.to_timedelta(rng.choice([0, 6, 8, 14], len(df)), unit="h")
+    df["ENTRADA_SAL"] = df["ENTRADA_SAL"] + pd.to_timedelta(rng.choice([0, 9], len(df)), unit="h")
+    pos = rng.permutation(len(df))
+    df.loc[pos[:30], "ENTRADA_SAL"] = df.loc[pos[:30], "DIA"].dt.normalize() + pd.Timedelta(hours=20)
+    df.loc[pos[30:50], "ENTRADA_SAL"] = df.loc[pos[30:50], "DIA"] - pd.Timedelta(days=2)
+    df.loc[pos[50:60], "UNDS"] = 0
+    df.loc[pos[60:80], "PRODUCTO"] = "OTRO"
+    return df
+
+
+def _editar_fila(df, pos, rng):
+    """Edición aleatoria de la fila 'pos' como en el editor: ENTRADA_SAL (a NaT o fuera del rango) o DIA."""
+    col = df.columns.get_loc
+    caso = rng.integers(5)
+    if caso == 0:
+        df.iloc[pos, col("ENTRADA_SAL")] = pd.NaT
+    elif caso == 1:  # lejos del rango actual, por delante o por detrás
+        df.iloc[pos, col("ENTRADA_SAL")] = df["DIA"].iloc[pos] + pd.Timedelta(days=int(rng.choice([-90, 200])))
+    elif caso == 2:
+        df.iloc[pos, col("ENTRADA_SAL")] = df["DIA"].iloc[pos] + pd.Timedelta(days=int(rng.integers(0, 8)), hours=7)
+    elif caso == 3:
+        df.iloc[pos, col("DIA")] = df["DIA"].iloc[pos] - pd.Timedelta(days=int(rng.integers(-3, 10)))
+    else:
+        df.iloc[pos, col("SALIDA_SAL")] = df["DIA"].iloc[pos] + pd.Timedelta(days=int(rng.integers(5, 30)))
+
+
+def test_barrido_igual_a_referencia():
+    tabla = calcular_estabilizacion_diaria(_plan_con_horas(), ESTAB_CAP, ESTAB_OVERRIDES)
+    ref = pd.read_csv(TABLA_REFERENCIA, parse_dates=["FECHA"])
+
+    assert (ref["CAPACIDAD"] != ESTAB_CAP).sum() == len(ESTAB_OVERRIDES)
+    pd.testing.assert_frame_equal(tabla.reset_index(drop=True), ref, check_dtype=False)
+
+
+def test_ediciones_igual_a_recalcular():
+    df = _plan_con_horas()
+    ocupacion = OcupacionEstabilizacion(df)
+    rng = np.random.default_rng(3)
+    for paso in range(200):
+        pos = int(rng.integers(len(df)))
+        _editar_fila(df, pos, rng)
+        ocupacion.actualizar_fila(pos, df.iloc[pos])
+        if paso % 20 == 19:
+            pd.testing.assert_frame_equal(
+                ocupacion.tabla(ESTAB_CAP, ESTAB_OVERRIDES).reset_index(drop=True),
+                calcular_estabilizacion_diaria(df, ESTAB_CAP, ESTAB_OVERRIDES).reset_index(drop=True),
+            )
+
+
+def _lotes_dia_fuerza_bruta(df, fecha):
+    dia, entrada = df["DIA"].dt.normalize(), df["ENTRADA_SAL"].dt.normalize()
+    mascaras = {
+        "ESTABILIZACIÓN": (dia <= fecha) & (fecha < entrada) & (df["UNDS"] > 0),
+        "ENTRADA": entrada == fecha,
+        "SALIDA": df["SALIDA_SAL"].dt.normalize() == fecha,
+    }
+    return {mov: np.flatnonzero(m.to_numpy()) for mov, m in mascaras.items()}
+
+
+def _comprobar_lotes_dia(df, ocupacion):
+    for fecha in pd.date_range(df["DIA"].min().normalize() - pd.Timedelta(days=2), df["SALIDA_SAL"].max(), freq="D"):
+        esperado = _lotes_dia_fuerza_bruta(df, fecha)
+        obtenido = ocupacion.lotes_dia(fecha)
+        assert list(obtenido) == list(MOVIMIENTOS_DIA)
+        for mov in MOVIMIENTOS_DIA:
+            assert obtenido[mov].tolist() == esperado[mov].tolist(), (fecha, mov)
+        detalle = ocupacion.detalle_dia(df, fecha)
+        assert detalle["MOVIMIENTO"].value_counts().to_dict() == {m: len(p) for m, p in esperado.items() if len(p)}
+
+
+def test_lotes_dia_igual_a_filtrar():
+    df = _plan_con_horas()
+    ocupacion = OcupacionEstabilizacion(df)
+    _comprobar_lotes_dia(df, ocupacion)
+
+    # Tras editar filas el índice se rehace en la siguiente consulta
+    rng = np.random.default_rng(5)
+    for pos in rng.choice(len(df), 60, replace=False).tolist():
+        _editar_fila(df, pos, rng)
+        ocupacion.actualizar_fila(pos, df.iloc[pos])
+    _comprobar_lotes_dia(df, ocupacion)
@@ -0,0 +1,53 @@
+"""Replanificación incremental: retirar lotes del estado y replanificarlos = replanificar desde cero."""
+import numpy as np
+
+from benchmarks.generador import generar_lotes
+from planificador import EstadoPlanificacion, Instrumentacion, liberar_lotes, planificar_filas_na
+
+
+def _serie(linea):
+    """{offset: unds} de los días con carga, independiente de cómo haya crecido el array."""
+    nz = np.flatnonzero(linea.valores)
+    return dict(zip((nz - linea._desp).tolist(), linea.valores[nz].tolist()))
+
+
+def test_replanificacion_incremental_igual_a_completa():
+    df, config = generar_lotes(1500, holgura_capacidad=0.95, semilla=2)
+    estado = EstadoPlanificacion(df, config)
+    df_base, _ = planificar_filas_na(df, config, estado=estado)
+
+    rng = np.random.default_rng(0)
+    planificados = df_base.index[df_base["ENTRADA_SAL"].notna()]
+    idx = rng.choice(planificados, 40, replace=False).tolist()
+    idx += df_base.index[df_base["LOTE_NO_ENCAJA"] == "Sí"].tolist()
+    df_trabajo = liberar_lotes(df_base, idx)
+
+    estado.retirar(df_base, idx)
+    df_incr, sug_incr = planificar_filas_na(df_trabajo, config, estado=estado)
+    estado_completo = EstadoPlanificacion(df_trabajo, config)
+    df_comp, sug_comp = planificar_filas_na(df_trabajo, config, estado=estado_completo)
+
+    assert df_incr.equals(df_comp)
+    assert sug_incr.equals(sug_comp)
+    for linea in ("carga_entrada", "carga_salida", "estab_stock"):
+        assert _serie(getattr(estado, linea)) == _serie(getattr(estado_completo, linea))
+    assert estado.perfil == estado_completo.perfil
+
+
+def test_perfil_en_fase_propia():
+    df, config = generar_lotes(800, holgura_capacidad=0.95, semilla=3)
+    df_base, _ = planificar_filas_na(df, config)
+    df_trabajo = liberar_lotes(df_base, df_base.index[::3])
+
+    estado = EstadoPlanificacion(df_trabajo, config, con_perfil=False)
+    assert estado.perfil == {}
+    estado.construir_perfil(df_trabajo)
+    assert estado.perfil == EstadoPlanificacion(df_trabajo, config).perfil
+
+    inst = Instrumentacion()
+    df_inst, sug_inst = planificar_filas_na(df_trabajo, config, instrumentacion=inst)
+    df_sin, sug_sin = planificar_filas_na(df_trabajo, config)
+    assert df_inst.equals(df_sin)
+    assert sug_inst.equals(sug_sin)
+    assert inst.fases["perfiles"]["llamadas"] == 1
+    assert {"preparacion", "perfiles", "bucle_pendientes", "sugerencias", "ensamblado"} <= set(inst.fases)
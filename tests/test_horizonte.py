@@ -0,0 +1,29 @@
+"""Horizonte rodante frente a una sola pasada."""
+import dataclasses
+
+import pytest
+
+from benchmarks.generador import generar_lotes
+from planificador import planificar_filas_na, planificar_horizonte_rodante
+
+
+@pytest.mark.parametrize("holgura", [1.1, 0.95])
+def test_horizonte_igual_a_una_pasada_con_reglas(holgura):
+    # Ficheros de varios meses con grupos de ENTRADA común que cruzan varias ventanas
+    df, config = generar_lotes(2000, dias_horizonte=120, holgura_capacidad=holgura)
+    assert config.reglas_entrada_comun
+
+    df_una, _ = planificar_filas_na(df, config)
+    df_rodante, _ = planificar_horizonte_rodante(df, config, dias_ventana=28)
+
+    assert df_rodante.equals(df_una)
+
+
+def test_horizonte_igual_a_una_pasada_sin_reglas():
+    df, config = generar_lotes(2000, dias_horizonte=120, holgura_capacidad=0.95)
+    config = dataclasses.replace(config, reglas_entrada_comun=[])
+
+    df_una, _ = planificar_filas_na(df, config)
+    df_rodante, _ = planificar_horizonte_rodante(df, config, dias_ventana=14)
+
+    assert df_rodante.equals(df_una)
@@ -0,0 +1,23 @@
+"""Almacén columnar de lotes: el plan coincide con el del motor fila a fila de referencia."""
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generador import generar_lotes
+from planificador import planificar_filas_na
+
+# Plan de generar_lotes(800, holgura_capacidad=0.9, semilla=5) con el motor anterior (iterrows y
+# diccionarios por fecha), con sus mismas capacidades, festivos y reglas de ENTRADA común.
+PLAN_REFERENCIA = Path(__file__).parent / "datos" / "plan_referencia.csv"
+
+
+def test_plan_coincide_con_referencia():
+    df, config = generar_lotes(800, holgura_capacidad=0.9, semilla=5)
+    df_plan, _ = planificar_filas_na(df, config)
+    ref = pd.read_csv(PLAN_REFERENCIA, dtype=str, keep_default_na=False).set_index("LOTE")
+    plan = df_plan.set_index("LOTE").loc[ref.index]
+
+    assert (ref["LOTE_NO_ENCAJA"] == "Sí").sum() > 0
+    for col in ("ENTRADA_SAL", "SALIDA_SAL"):
+        assert plan[col].dt.strftime("%Y-%m-%d").fillna("").tolist() == ref[col].tolist()
+    assert plan["LOTE_NO_ENCAJA"].tolist() == ref["LOTE_NO_ENCAJA"].tolist()
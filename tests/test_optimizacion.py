@@ -0,0 +1,40 @@
+"""Motor MILP: reparto del presupuesto entre etapas y comparación con el paso voraz."""
+import dataclasses
+
+import pytest
+
+from benchmarks.generador import generar_lotes
+from planificador import optimizacion, planificar_filas_na
+
+pytestmark = pytest.mark.skipif(not optimizacion.solver_disponible(), reason="highspy no instalado")
+
+
+def _no_encajan(df_plan):
+    return int((df_plan["LOTE_NO_ENCAJA"] == "Sí").sum())
+
+
+def test_presupuesto_repartido_entre_etapas(monkeypatch):
+    limites = []
+    resolver = optimizacion.resolver_milp
+
+    def _resolver(*args):
+        limites.append(args[6])
+        return resolver(*args)
+
+    monkeypatch.setattr(optimizacion, "resolver_milp", _resolver)
+    df, config = generar_lotes(150, holgura_capacidad=0.9)
+    config = dataclasses.replace(config, motor_asignacion="optimizacion", limite_segundos_optimizacion=5.0)
+    planificar_filas_na(df, config)
+
+    assert limites[0] == pytest.approx(optimizacion.FRACCION_TIEMPO_ETAPA_1 * 5.0)
+    assert len(limites) == 1 or sum(limites) <= 5.0
+
+
+def test_optimizacion_no_empeora_al_voraz():
+    df, config = generar_lotes(300, holgura_capacidad=0.9)
+    df_voraz, _ = planificar_filas_na(df, config)
+    df_opt, _ = planificar_filas_na(
+        df, dataclasses.replace(config, motor_asignacion="optimizacion", limite_segundos_optimizacion=10.0)
+    )
+
+    assert _no_encajan(df_opt) <= _no_encajan(df_voraz)
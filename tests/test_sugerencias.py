@@ -0,0 +1,89 @@
+"""Sugerencias en bloque: mismas filas y orden que el cálculo lote a lote sobre el estado final."""
+import dataclasses
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_lotes
+from planificador import EstadoPlanificacion, LotesCompactos, planificar_filas_na, sugerencias_no_encajan
+from planificador.sugerencias import COLS_SUGERENCIAS, MAX_SUGERENCIAS_LOTE
+
+
+def _sugerencias_lote_a_lote(estado, fila, dias_max):
+    """El bucle por lote del motor anterior (fechas, dicts y pd.date_range), leyendo del estado."""
+    cal, salidas = estado.cal, estado.salidas
+    carga_ent, carga_sal = estado.carga_entrada, estado.carga_salida
+    dia, unds, dso = fila["DIA"], int(fila["UNDS"]), int(fila["DIAS_SAL_OPTIMOS"])
+
+    filas = []
+    entrada = dia if cal.es_habil(dia) else cal.siguiente_habil(dia)
+    while (entrada - dia).days <= dias_max:
+        for intento in (1, 2):
+            i_e = carga_ent.offset(entrada)
+            deficit_ent = max(0, carga_ent.get_i(i_e) + unds - estado.cap_ent[intento].get_i(i_e))
+            def_est = {}
+            for d in pd.date_range(dia, entrada - pd.Timedelta(days=1), freq="D"):
+                i_d = estado.estab_stock.offset(d)
+                falta = estado.estab_stock.get_i(i_d) + unds - estado.cap_estab.get_i(i_d)
+                if falta > 0:
+                    def_est[d.normalize()] = int(falta)
+            deficit_estab = max(def_est.values()) if def_est else 0
+            salida = salidas.resolver(entrada, dso, carga_sal)
+            i_s = carga_sal.offset(salida)
+            deficit_sal = max(0, carga_sal.get_i(i_s) + unds - estado.cap_sal[intento].get_i(i_s))
+
+            recomendaciones = []
+            if deficit_ent > 0:
+                recomendaciones.append(f"Subir ENTRADA el {entrada.date()} en +{deficit_ent} unds (INTENTO {intento}).")
+            if deficit_sal > 0:
+                recomendaciones.append(f"Subir SALIDA el {salida.date()} en +{deficit_sal} unds (INTENTO {intento}).")
+            if deficit_estab > 0:
+                dias_estab = [f"{k.date()}(+{v})" for k, v in list(def_est.items())[:3]]
+                recomendaciones.append("Subir ESTABILIZACIÓN en: " + ", ".join(dias_estab))
+            filas.append({
+                "LOTE": fila["LOTE"], "PRODUCTO": fila["PRODUCTO"], "UNDS": unds,
+                "DIA_RECEPCION": dia.normalize(),
+                "ENTRADA_PROPUESTA": entrada.normalize(), "SALIDA_PROPUESTA": salida.normalize(),
+                "INTENTO": intento,
+                "DEFICIT_ENTRADA": deficit_ent, "DEFICIT_ESTAB_MAX": deficit_estab, "DEFICIT_SALIDA": deficit_sal,
+                "MAX_DEFICIT": max(deficit_ent, deficit_estab, deficit_sal),
+                "TOTAL_DEFICIT": deficit_ent + deficit_estab + deficit_sal,
+                "RECOMENDACION": " | ".join(recomendaciones) if recomendaciones else "Sin ajustes necesarios",
+            })
+        entrada = cal.siguiente_habil(entrada)
+    filas.sort(key=lambda r: (r["MAX_DEFICIT"], r["TOTAL_DEFICIT"], r["ENTRADA_PROPUESTA"]))
+    return filas[:MAX_SUGERENCIAS_LOTE]
+
+
+def test_bloque_igual_a_lote_a_lote():
+    df, config = generar_lotes(1200, holgura_capacidad=0.85, semilla=4)
+    rng = np.random.default_rng(2)
+    df["DIA"] = df["DIA"] + pd.to_timedelta(rng.choice([0, 7, 15], len(df)), unit="h")
+    festivos = list(config.dias_festivos) + [
+        str(d.date()) for d in pd.date_range(df["DIA"].min(), df["DIA"].max(), freq="11D")
+    ]
+    producto = df["PRODUCTO"].iloc[0]
+    config = dataclasses.replace(
+        config, dias_festivos=festivos, dias_max_por_producto={producto: 4.5}, dias_max_almacen_global=12,
+    )
+    estado = EstadoPlanificacion(df, config)
+    df_plan, _ = planificar_filas_na(df, config, estado=estado)
+
+    posiciones = np.flatnonzero(df_plan["ENTRADA_SAL"].isna().to_numpy())
+    assert len(posiciones) > 50
+    lotes = LotesCompactos(df_plan, posiciones, estado.cal, config.dias_max_almacen_global, config.dias_max_por_producto)
+    en_bloque = sugerencias_no_encajan(estado, lotes, np.arange(len(posiciones)))
+
+    filas = []
+    for pos in posiciones.tolist():
+        fila = df_plan.iloc[pos]
+        dias_max = config.dias_max_por_producto.get(fila["PRODUCTO"], config.dias_max_almacen_global)
+        filas += _sugerencias_lote_a_lote(estado, fila, dias_max)
+    referencia = pd.DataFrame(filas, columns=COLS_SUGERENCIAS)
+    for col in ("DIA_RECEPCION", "ENTRADA_PROPUESTA", "SALIDA_PROPUESTA"):
+        referencia[col] = referencia[col].astype(en_bloque[col].dtype)
+
+    # Empates en (MAX, TOTAL, ENTRADA): el orden de recorrido (intento 1 antes que 2) decide
+    assert en_bloque.duplicated(["LOTE", "MAX_DEFICIT", "TOTAL_DEFICIT", "ENTRADA_PROPUESTA"]).any()
+    assert (en_bloque.groupby("LOTE").size() == MAX_SUGERENCIAS_LOTE).any()
+    pd.testing.assert_frame_equal(en_bloque.reset_index(drop=True), referencia, check_dtype=False)